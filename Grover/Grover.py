@@ -1,33 +1,29 @@
-
 import matplotlib.pyplot as plt
 from qiskit import QuantumCircuit
 from qiskit import transpile
 from qiskit_aer import AerSimulator
-from qiskit_aer.noise import NoiseModel, depolarizing_error
 from math import floor, pi,sqrt, ceil, log2
+import os
+import sys
+
+# simulators come from the qotp registry (qotp/util/backends.py), imported
+# as a package from the repository root, built once per process
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.append(_root)
+from qotp.util.backends import get_simulator
 
 
-def get_result(qc):
-    simulator = AerSimulator()
+def get_result(qc, shots=100, **options):
+    simulator = get_simulator("aer", **options)
     compiled = transpile(qc, simulator)
-    return simulator.run(compiled, shots=100).result().get_counts()
-
-
-def get_result_with_noise(qc):
-    # https://quantum.cloud.ibm.com/docs/en/guides/build-noise-models
-    error = depolarizing_error(1e-3, 1)  # (errreur qubit,nombre de qubit impacté)
-    noise_model = NoiseModel()
-    noise_model.add_all_qubit_quantum_error(
-        error,
-        [
-            "x",
-            "h",
-            "z",
-        ],
-    )
-    simulator = AerSimulator(noise_model=noise_model)
+    return simulator.run(compiled, shots=shots).result().get_counts()
+
+
+def get_result_with_noise(qc, shots=100, **options):
+    simulator = get_simulator("depolarizing", **options)
     compiled = transpile(qc, simulator)
-    return simulator.run(compiled, shots=100).result().get_counts()
+    return simulator.run(compiled, shots=shots).result().get_counts()
 
 
 def plot_grover_results(sorted_items, target, nb_qubits):
@@ -227,7 +223,7 @@ def grover(nb_qubits: int, x: int):
 
     qc.measure_all()
 
-    simulator = AerSimulator()
+    simulator = get_simulator("aer")
     circ = transpile(qc, simulator)
     result = simulator.run(circ).result()
     counts = result.get_counts(circ)
@@ -0,0 +1,96 @@
+"""
+Throughput of the encrypted accumulator against chained adder_pipe calls.
+
+Sums k random values mod 2^n_bits in two ways: `accumulate`, one encrypted
+circuit with k-1 additions, one simulation and one decryption; and
+`accumulate_chained`, k-1 `adder_pipe`-like round trips, each decrypted
+and its most frequent outcome fed to the next addition. Both run the same
+shots on the same `--backend`. Reports the best wall time over `--repeat`
+runs, the additions per second, whether the most frequent outcome is the
+right sum and the share of shots on it (of the last round trip for the
+chain).
+
+Results go to a JSON file with `--json`.
+
+Run from qotp/:
+    python -m benchmarks.accumulator --k 2 4 6 --json accumulator.json
+"""
+
+import argparse
+import random
+import json
+import time
+
+from core.accumulator import accumulate, accumulate_chained, accumulator_server
+
+COLUMNS = ["k", "method", "wall_s", "additions_per_s", "speedup", "correct", "p_correct"]
+
+
+def timed(f, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench(k: int, n_bits: int, shots: int, backend: str, repeat: int) -> list[dict]:
+    rng = random.Random(k)
+    values = [rng.randrange(2**n_bits) for _ in range(k)]
+    expected = format(sum(values) % 2**n_bits, f"0{n_bits}b")
+    accumulator_server(n_bits, k).get_plan()  # compiled once, as for every later sum
+    runs = {
+        "accumulate": timed(
+            lambda: accumulate(values, n_bits, shots, backend=backend), repeat
+        ),
+        "chained": timed(
+            lambda: accumulate_chained(values, n_bits, shots, backend=backend), repeat
+        ),
+    }
+    rows = []
+    for method, (counts, wall_s) in runs.items():
+        rows.append(
+            {
+                "k": k,
+                "method": method,
+                "wall_s": round(wall_s, 4),
+                "additions_per_s": round((k - 1) / wall_s, 2),
+                "speedup": round(runs["chained"][1] / wall_s, 1),
+                "correct": max(counts, key=counts.get) == expected,
+                "p_correct": round(counts.get(expected, 0) / sum(counts.values()), 3),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=[2, 3, 4, 5], help="numbers of values summed"
+    )
+    parser.add_argument("--n-bits", type=int, default=2)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--backend", default="geneva")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    # builds the simulators, so that the first row does not pay for it
+    accumulate([0, 0], args.n_bits, 1, backend=args.backend)
+    accumulate_chained([0, 0], args.n_bits, 1, backend=args.backend)
+    print(" ".join(f"{c:>15}" for c in COLUMNS))
+    rows = []
+    for k in args.k:
+        for row in bench(k, args.n_bits, args.shots, args.backend, args.repeat):
+            rows.append(row)
+            print(" ".join(f"{row[c]!s:>15}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
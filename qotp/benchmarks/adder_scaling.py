@@ -0,0 +1,128 @@
+"""
+Scaling of the encrypted n-bit Draper adder.
+
+For each width, reports the size of the standardized server circuit
+(gates, T-count before and after phase folding, other non-Clifford
+rotations, depth) and the time spent
+in to_standard, in transpilation and in simulation of the encrypted circuit.
+The transpile cache is disabled, so to_standard is always timed in full;
+`to_standard_cached_s` is its time when served from a warm in-memory cache.
+
+Run from qotp/:
+    python -m benchmarks.adder_scaling --max-bits 6 --json adder_scaling.json
+"""
+
+from qiskit import transpile
+import argparse
+import json
+import time
+
+from core.client import Client
+from core.server import Server
+from core.pipe import encrypted_adder_circuit
+from util import (
+    TranspileCache,
+    draper_adder,
+    to_standard,
+    get_geneva_simulator,
+    get_simulator,
+    set_transpile_cache,
+    t_count,
+)
+
+COLUMNS = [
+    "n_bits",
+    "qubits",
+    "gates",
+    "t_count",
+    "t_folded",
+    "rotations",
+    "depth",
+    "transpiled_depth",
+    "to_standard_s",
+    "to_standard_cached_s",
+    "transpile_s",
+    "simulate_s",
+    "backend",
+]
+
+
+def rotation_count(qc) -> int:
+    """
+    Number of phase gates that are neither Clifford nor T/T_dg.
+    """
+    plan = Server(qc).get_plan()
+    return sum(gate == "p" for _, gate, _ in plan.t_gates)
+
+
+def bench(n: int, shots: int) -> dict:
+    adder = draper_adder(n)
+    start = time.perf_counter()
+    standard = to_standard(adder)
+    to_standard_s = time.perf_counter() - start
+
+    set_transpile_cache(TranspileCache())
+    to_standard(adder)
+    start = time.perf_counter()
+    to_standard(adder)
+    to_standard_cached_s = time.perf_counter() - start
+    set_transpile_cache(None)
+
+    cl = Client()
+    circuit, _ = encrypted_adder_circuit(cl, Server(standard), 2**n - 1, 1)
+
+    simulator = get_geneva_simulator()
+    backend = "FakeGeneva"
+    if circuit.num_qubits > simulator.num_qubits:
+        simulator = get_simulator("aer")
+        backend = "AerSimulator"
+    start = time.perf_counter()
+    tqc = transpile(circuit, simulator)
+    transpile_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    simulator.run(tqc, shots=shots).result()
+    simulate_s = time.perf_counter() - start
+
+    return {
+        "n_bits": n,
+        "qubits": circuit.num_qubits,
+        "gates": standard.size(),
+        "t_count": t_count(standard),
+        "t_folded": to_standard(adder, optimize_t=True).metadata["t_count"]["after"],
+        "rotations": rotation_count(standard),
+        "depth": standard.depth(),
+        "transpiled_depth": tqc.depth(),
+        "to_standard_s": round(to_standard_s, 4),
+        "to_standard_cached_s": round(to_standard_cached_s, 4),
+        "transpile_s": round(transpile_s, 4),
+        "simulate_s": round(simulate_s, 4),
+        "backend": backend,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--min-bits", type=int, default=1)
+    parser.add_argument("--max-bits", type=int, default=6)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    # to_standard is timed in full, not served by the cache of an earlier run
+    set_transpile_cache(None)
+    print(" ".join(f"{c:>16}" for c in COLUMNS))
+    rows = []
+    for n in range(args.min_bits, args.max_bits + 1):
+        row = bench(n, args.shots)
+        rows.append(row)
+        print(" ".join(f"{row[c]:>16}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
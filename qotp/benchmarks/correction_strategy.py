@@ -0,0 +1,129 @@
+"""
+Memory and runtime of the T-gate correction strategies.
+
+Builds the encrypted adder for every width with each correction strategy
+of `update_key` ("dummy": an extra ancilla, "recycle": a qubit of the
+circuit holding a classical bit) and reports the number of qubits, the
+memory of the simulated state (statevector, and density matrix on a noisy
+backend), the best build (encryption, assembly, `update_key`) and
+transpile times over `--repeat` runs, the exact simulation time, and the
+probability of the right sum.
+
+Results go to a JSON file. With `--baseline`, the command fails if a
+strategy got slower than the baseline by more than `--tolerance`.
+
+Run from qotp/:
+    python -m benchmarks.correction_strategy --max-bits 4 --json corrections.json
+    python -m benchmarks.correction_strategy --backend geneva --max-bits 2
+"""
+
+from qiskit import transpile
+import argparse
+import json
+import time
+import sys
+
+from core.client import Client
+from core.server import Server
+from core.pipe import encrypted_adder_circuit
+from core.plan import CORRECTION_STRATEGIES
+from util import draper_adder, to_standard, get_result_exact, get_simulator
+
+COLUMNS = [
+    "n_bits",
+    "correction",
+    "qubits",
+    "state_mb",
+    "build_s",
+    "transpile_s",
+    "simulate_s",
+    "p_correct",
+]
+
+
+def state_mb(qubits: int, density_matrix: bool) -> float:
+    # complex128 amplitudes
+    size = 4**qubits if density_matrix else 2**qubits
+    return round(16 * size / 2**20, 3)
+
+
+def bench(n: int, correction: str, backend: str, repeat: int) -> dict:
+    sv = Server(to_standard(draper_adder(n)))
+    sv.get_plan()  # compiled once per server, as in adder_pipe_batch
+    a, b = 2**n - 1, 1
+    build_s = transpile_s = float("inf")
+    for _ in range(repeat):
+        cl = Client()
+        start = time.perf_counter()
+        qc, offset = encrypted_adder_circuit(cl, sv, a, b, correction=correction)
+        build_s = min(build_s, time.perf_counter() - start)
+        start = time.perf_counter()
+        transpile(qc, get_simulator(backend))
+        transpile_s = min(transpile_s, time.perf_counter() - start)
+    start = time.perf_counter()
+    probabilities = cl.decrypt_probabilities(
+        get_result_exact(qc, backend=backend), offset
+    )
+    simulate_s = time.perf_counter() - start
+    return {
+        "n_bits": n,
+        "correction": correction,
+        "qubits": qc.num_qubits,
+        "state_mb": state_mb(qc.num_qubits, backend != "aer"),
+        "build_s": round(build_s, 5),
+        "transpile_s": round(transpile_s, 5),
+        "simulate_s": round(simulate_s, 5),
+        "p_correct": round(float(probabilities[(a + b) % 2**n]), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--min-bits", type=int, default=1)
+    parser.add_argument("--max-bits", type=int, default=4)
+    parser.add_argument("--backend", default="aer")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the rows to this file")
+    parser.add_argument("--baseline", help="compare to the rows of this file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # builds the simulators, so that the first row does not pay for it
+    bench(args.min_bits, CORRECTION_STRATEGIES[0], args.backend, 1)
+    print(" ".join(f"{c:>12}" for c in COLUMNS))
+    rows = []
+    for n in range(args.min_bits, args.max_bits + 1):
+        for correction in CORRECTION_STRATEGIES:
+            row = bench(n, correction, args.backend, args.repeat)
+            rows.append(row)
+            print(" ".join(f"{row[c]!s:>12}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["n_bits"], r["correction"]): r for r in json.load(f)}
+        regressions = []
+        for row in rows:
+            base = baseline.get((row["n_bits"], row["correction"]))
+            if base is None:
+                continue
+            for column in ("build_s", "simulate_s"):
+                slower = row[column] - base[column]
+                if slower > 1e-3 and slower > args.tolerance * base[column]:
+                    regressions.append(
+                        f"{column} (n_bits={row['n_bits']}, {row['correction']}):"
+                        f" {base[column]}s -> {row[column]}s"
+                    )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Decryption time of large results, compared to the simulation time.
+
+Simulates the encrypted n-bit adder with per-shot memory on an ideal
+AerSimulator, then decrypts its counts and memory bitstring by bitstring
+(`Client.decrypt`) and vectorized (`decrypt_counts`, `decrypt_memory_counts`).
+
+Run from qotp/:
+    python -m benchmarks.decrypt --n-bits 8 --shots 100000
+"""
+
+from qiskit import transpile
+from qiskit.circuit import CircuitInstruction
+from qiskit.circuit.library import HGate
+from qiskit_aer import AerSimulator
+import argparse
+import json
+import time
+
+from core.client import Client
+from core.server import Server
+from core.pipe import encrypted_adder_circuit
+from util import draper_adder, to_standard
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, round(time.perf_counter() - start, 4)
+
+
+def reference_decrypt(cl: Client, counts: dict, offset: int) -> dict:
+    decrypted = {}
+    for bitstring, count in counts.items():
+        key = cl.decrypt(bitstring, offset=offset)
+        decrypted[key] = decrypted.get(key, 0) + count
+    return decrypted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-bits", type=int, default=8)
+    parser.add_argument("--shots", type=int, default=100_000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    sv = Server(to_standard(draper_adder(args.n_bits)))
+    cl = Client()
+    circuit, offset = encrypted_adder_circuit(cl, sv, 1, 2)
+    # an H on every qubit of b gives a wide distribution to decrypt
+    for q in range(offset, 2 * offset):
+        circuit.data.insert(0, CircuitInstruction(HGate(), (circuit.qubits[q],)))
+    simulator = AerSimulator()
+    tqc = transpile(circuit, simulator)
+    result, simulate_s = timed(
+        lambda: simulator.run(tqc, shots=args.shots, memory=True).result()
+    )
+    counts, memory = result.get_counts(), result.get_memory()
+
+    reference, reference_s = timed(lambda: reference_decrypt(cl, counts, offset))
+    vectorized, counts_s = timed(lambda: cl.decrypt_counts(counts, offset))
+    from_memory, memory_s = timed(lambda: cl.decrypt_memory_counts(memory, offset))
+    if not reference == vectorized == from_memory:
+        raise RuntimeError("vectorized and reference decryption disagree")
+
+    row = {
+        "n_bits": args.n_bits,
+        "shots": args.shots,
+        "outcomes": len(counts),
+        "simulate_s": simulate_s,
+        "reference_counts_s": reference_s,
+        "decrypt_counts_s": counts_s,
+        "decrypt_memory_s": memory_s,
+    }
+    for key, value in row.items():
+        print(f"{key:>20}: {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(row, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
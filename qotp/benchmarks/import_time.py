@@ -0,0 +1,110 @@
+"""
+Cold import time of the qotp entry points.
+
+Imports each module in a fresh interpreter with `python -X importtime`
+and reports the median cumulative import time over `--repeat` runs, the
+heaviest packages it pulled in, and whether any of the packages that
+should only load on first use (fake backends, Aer, matplotlib, rich) was
+imported.
+
+Results go to a JSON file; with `--baseline`, the command fails if a
+module got slower than the baseline by more than `--tolerance`.
+
+Run from qotp/:
+    python -m benchmarks.import_time --json import_time.json
+"""
+
+import subprocess
+import statistics
+import argparse
+import json
+import sys
+import os
+
+MODULES = ["main", "core.pipe", "core.net", "util"]
+# packages deferred until first use
+LAZY = ["qiskit_ibm_runtime", "qiskit_aer", "matplotlib", "rich"]
+QOTP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """
+    {imported module: (self us, cumulative us)} of one cold import.
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=QOTP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def bench(module: str, repeat: int, top: int) -> dict:
+    runs = [import_times(module) for _ in range(repeat)]
+    totals = [run[module][1] for run in runs]
+    last = runs[-1]
+    # top-level packages, by cumulative time
+    packages = {}
+    for name, (_, cumulative_us) in last.items():
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative_us)
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "heaviest_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+        "lazy_imported": [name for name in LAZY if name in packages],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--json", help="also write the rows to this file")
+    parser.add_argument("--baseline", help="compare to the rows of this file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    rows = []
+    for module in args.modules:
+        row = bench(module, args.repeat, args.top)
+        rows.append(row)
+        heaviest = ", ".join(f"{k} {v}" for k, v in row["heaviest_ms"].items())
+        print(f"{module:>12}: {row['import_ms']:>8} ms  ({heaviest})")
+        if row["lazy_imported"]:
+            print(f"{'':>12}  imported eagerly: {', '.join(row['lazy_imported'])}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {row["module"]: row for row in json.load(f)}
+        regressions = [
+            f"{row['module']}: {baseline[row['module']]['import_ms']} ms -> {row['import_ms']} ms"
+            for row in rows
+            if row["module"] in baseline
+            and row["import_ms"]
+            > (1 + args.tolerance) * baseline[row["module"]]["import_ms"]
+        ]
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Pad generation throughput.
+
+Draws pads for `--qubits` qubits with the original per-bit
+`random.randint` loop, with the CSPRNG `PadGenerator` (one pad, then many
+pads at once) and from a pre-generated `PadPool`.
+
+Run from qotp/:
+    python -m benchmarks.keygen --qubits 1000000
+"""
+
+import argparse
+import random
+import json
+import time
+
+from core.keygen import PadGenerator, PadPool
+from core.keys import KeyState
+
+
+def reference_pad(num_qubits: int) -> KeyState:
+    """
+    The original pad generation: two Mersenne Twister draws per qubit.
+    """
+    keys = KeyState(num_qubits)
+    for k in range(num_qubits):
+        keys[k] = (random.randint(0, 1), random.randint(0, 1))
+    return keys
+
+
+def rate(f, num_qubits: int, pads: int = 1) -> float:
+    start = time.perf_counter()
+    f()
+    return round(pads * num_qubits / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--qubits", type=int, default=1_000_000)
+    parser.add_argument("--pads", type=int, default=16, help="pads per bulk draw")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    n, count = args.qubits, args.pads
+    generator = PadGenerator()
+    pool = PadPool(n, size=count, generator=generator)
+    pool.refill()
+    row = {
+        "qubits": n,
+        "reference_qubits_per_s": rate(lambda: reference_pad(n), n),
+        "csprng_qubits_per_s": rate(lambda: generator.pad(n), n),
+        "csprng_bulk_qubits_per_s": rate(lambda: generator.pads(count, n), n, count),
+        "pool_take_qubits_per_s": rate(
+            lambda: [pool.pad() for _ in range(count)], n, count
+        ),
+    }
+    row["speedup"] = round(row["csprng_qubits_per_s"] / row["reference_qubits_per_s"], 1)
+    for key, value in row.items():
+        print(f"{key:>25}: {value:,}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(row, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
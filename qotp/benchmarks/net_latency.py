@@ -0,0 +1,114 @@
+"""
+End-to-end latency and requests per second of delegated computation
+over a local socket.
+
+Starts a `QOTPServer` in this process, on a Unix socket (or TCP on
+localhost), and has clients encrypt, send, receive and decrypt adder jobs.
+Keys never leave the client side. Each job is checked against a + b.
+Reports latency percentiles with one request in flight, then the
+throughput with every request pipelined.
+
+Run from qotp/:
+    python -m benchmarks.net_latency --jobs 64 --backend aer
+"""
+
+import argparse
+import asyncio
+import tempfile
+import json
+import os
+import time
+
+import numpy as np
+
+from core.client import Client
+from core.net import QOTPClient, QOTPServer
+from core.pipe import encrypted_adder_circuit
+from core.server import Server
+from util import draper_adder, to_standard
+
+
+async def delegated_add(
+    remote: QOTPClient, sv: Server, a: int, b: int, shots: int
+) -> bool:
+    # encryption and key update are local, only the circuit is sent
+    cl = Client()
+    circuit, offset = encrypted_adder_circuit(cl, sv, a, b)
+    job = await remote.run(circuit, shots=shots)
+    counts = cl.decrypt_counts(job.counts, offset)
+    return int(max(counts, key=counts.get), 2) == (a + b) % 2 ** (sv.num_qubits // 2)
+
+
+async def bench(args) -> dict:
+    standard = to_standard(draper_adder(args.n_bits))
+    server = Server(standard, workers=args.workers, backend=args.backend)
+    # the client's copy of the public server circuit
+    local = Server(standard)
+    modulus = 2**args.n_bits
+    pairs = [(i % modulus, (i // modulus) % modulus) for i in range(args.jobs)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = None if args.tcp else os.path.join(tmp, "qotp.sock")
+        listener = QOTPServer(server, path=path)
+        await listener.start()
+        remote = QOTPClient(
+            path=path, port=listener.port, connections=args.connections
+        )
+        await remote.connect()
+        try:
+            # start the workers before timing
+            await delegated_add(remote, local, 0, 0, shots=1)
+
+            latencies = []
+            correct = 0
+            for a, b in pairs:
+                start = time.perf_counter()
+                correct += await delegated_add(remote, local, a, b, args.shots)
+                latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(delegated_add(remote, local, a, b, args.shots) for a, b in pairs)
+            )
+            pipelined_s = time.perf_counter() - start
+            correct += sum(results)
+        finally:
+            await remote.close()
+            await listener.close()
+            server.close()
+
+    return {
+        "transport": "tcp" if args.tcp else "unix",
+        "jobs": args.jobs,
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 4),
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 4),
+        "sequential_rps": round(len(latencies) / sum(latencies), 2),
+        "pipelined_rps": round(len(pairs) / pipelined_s, 2),
+        "correct": f"{correct}/{2 * len(pairs)}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--n-bits", type=int, default=2)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--connections", type=int, default=1)
+    parser.add_argument("--backend", default="geneva", choices=["geneva", "aer"])
+    parser.add_argument("--tcp", action="store_true", help="TCP on localhost")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    row = asyncio.run(bench(args))
+    for key, value in row.items():
+        print(f"{key:>16}: {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(row, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Throughput of multi-tenant packing on encrypted adder jobs.
+
+Submits the same encrypted circuits, each with its own client and keys,
+to a server either one job per circuit (`submit`) or packed side by side
+into circuits of at most `--widths` qubits (`submit_packed`), and reports
+jobs per second, the number of simulated circuits and the number of jobs
+whose decrypted most frequent outcome is the right sum. Worker start-up
+is not timed.
+
+On Aer's noisy simulators the cost of a run grows exponentially with its
+width, so wide packs get slower than separate jobs: see where the
+crossover is before raising `Server.pack_width`.
+
+Run from qotp/:
+    python -m benchmarks.packing --jobs 16 --widths 10 15
+"""
+
+import argparse
+import json
+import time
+
+from core.client import Client
+from core.server import Server
+from core.packing import pack
+from core.pipe import encrypted_adder_circuit
+from util import draper_adder, to_standard
+
+COLUMNS = ["mode", "width", "jobs", "circuits", "wall_s", "jobs_per_s", "correct"]
+
+
+def bench(jobs: list, width: int | None, workers: int, shots: int, backend: str, standard) -> dict:
+    circuits = [qc for _, _, qc, _ in jobs]
+    with Server(standard, workers=workers, backend=backend) as sv:
+        # start the workers before timing
+        sv.submit(circuits[0], shots=1).result()
+        start = time.perf_counter()
+        if width is None:
+            futures = [sv.submit(qc, shots=shots) for qc in circuits]
+        else:
+            futures = sv.submit_packed(circuits, shots=shots, max_width=width)
+        results = [future.result() for future in futures]
+        wall_s = time.perf_counter() - start
+    correct = 0
+    for (cl, expected, _, offset), result in zip(jobs, results):
+        counts = cl.decrypt_counts(result.counts, offset)
+        correct += int(max(counts, key=counts.get), 2) == expected
+    return {
+        "mode": "separate" if width is None else "packed",
+        "width": circuits[0].num_qubits if width is None else width,
+        "jobs": len(results),
+        "circuits": len(circuits) if width is None else len(pack(circuits, width)),
+        "wall_s": round(wall_s, 3),
+        "jobs_per_s": round(len(results) / wall_s, 2),
+        "correct": correct,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--widths", type=int, nargs="+", default=[10])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--n-bits", type=int, default=2)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--backend", default="geneva", choices=["geneva", "aer"])
+    parser.add_argument("--correction", default="dummy", choices=["dummy", "recycle"])
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    standard = to_standard(draper_adder(args.n_bits))
+    sv = Server(standard)
+    modulus = 2**args.n_bits
+    jobs = []
+    for i in range(args.jobs):
+        a, b = i % modulus, (i // modulus) % modulus
+        cl = Client()
+        qc, offset = encrypted_adder_circuit(cl, sv, a, b, correction=args.correction)
+        jobs.append((cl, (a + b) % modulus, qc, offset))
+
+    print(" ".join(f"{c:>12}" for c in COLUMNS))
+    rows = []
+    for width in [None, *args.widths]:
+        row = bench(jobs, width, args.workers, args.shots, args.backend, standard)
+        rows.append(row)
+        print(" ".join(f"{row[c]!s:>12}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
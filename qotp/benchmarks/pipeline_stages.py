@@ -0,0 +1,260 @@
+"""
+Stage-level benchmark of the encrypted adder pipeline.
+
+Times each stage of `adder_pipe` separately, for every adder width and
+with or without T-count reduction: to_standard, encrypt, key merge,
+circuit assembly, update_key, transpilation, simulation and decryption.
+Each row has the best wall time over `--repeat` runs, the peak resident
+memory the stage added over what was resident when it started (sampled
+in a separate, untimed run, so Aer's native statevector or density matrix
+is included), and the gate count and T-count of the stage's output circuit
+(if any). The transpile cache is disabled, so to_standard
+is always timed in full; `cached_s` is its time when served from a warm
+in-memory cache.
+
+Results go to a JSON file. With `--baseline`, every stage is compared to
+the same stage of a stored run and the command fails if one of them is
+slower than the baseline by more than `--tolerance`.
+
+Run from qotp/:
+    python -m benchmarks.pipeline_stages --max-bits 4 --json stages.json
+    python -m benchmarks.pipeline_stages --max-bits 4 --baseline stages.json
+"""
+
+from qiskit import transpile
+import argparse
+import threading
+import json
+import time
+import sys
+
+import psutil  # a dependency of qiskit-aer
+
+from core.client import Client
+from core.server import Server
+from core.pipe import encrypt_inputs, merge_keys, assemble_circuit
+from util import (
+    TranspileCache,
+    draper_adder,
+    to_standard,
+    get_geneva_simulator,
+    get_simulator,
+    set_transpile_cache,
+    t_count,
+)
+
+STAGES = [
+    "to_standard",
+    "encrypt",
+    "merge_keys",
+    "assemble",
+    "update_key",
+    "transpile",
+    "simulate",
+    "decrypt",
+]
+COLUMNS = [
+    "n_bits",
+    "optimize_t",
+    "stage",
+    "wall_s",
+    "cached_s",
+    "peak_rss_mb",
+    "gates",
+    "t_count",
+]
+
+
+class PeakRSS:
+    """
+    Peak resident set size of this process while in the `with` block,
+    sampled every `interval` seconds by a thread (Aer releases the GIL
+    while it simulates). `peak_mb` is the peak over the RSS on entry.
+    """
+
+    def __init__(self, interval: float = 1e-3):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_mb = None
+
+    def _sample(self) -> None:
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._done = threading.Event()
+        self._start = self._peak = self.process.memory_info().rss
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._sampler.join()
+        self._peak = max(self._peak, self.process.memory_info().rss)
+        self.peak_mb = (self._peak - self._start) / 2**20
+
+
+def run_stages(
+    n: int, optimize_t: bool, shots: int, simulator, memory: bool = False
+) -> dict:
+    """
+    One pass of the pipeline. Returns, by stage, (wall time, output circuit,
+    peak resident memory in MB). The peak is None unless `memory` is set.
+    """
+    times = {}
+    peaks = {}
+
+    def stage(name, f):
+        if memory:
+            with PeakRSS() as rss:
+                result = f()
+            peaks[name] = rss.peak_mb
+            return result
+        start = time.perf_counter()
+        result = f()
+        times[name] = time.perf_counter() - start
+        return result
+
+    adder = draper_adder(n)
+    standard = stage("to_standard", lambda: to_standard(adder, optimize_t=optimize_t))
+    sv = Server(standard)
+    sv.get_plan()  # compiled once per server, as in adder_pipe_batch
+    cl = Client()
+    cipher_x, cipher_y = stage("encrypt", lambda: encrypt_inputs(cl, sv, 1, 1))
+    offset = cipher_x.circuit.num_qubits
+    cl.keys = stage("merge_keys", lambda: merge_keys(cipher_x, cipher_y))
+    final_circuit, meas_reg = stage(
+        "assemble", lambda: assemble_circuit(sv, cipher_x, cipher_y)
+    )
+    circuit = stage(
+        "update_key",
+        lambda: cl.update_key(
+            sv.circuit, 2 * offset, plan=sv.get_plan(), target=final_circuit
+        ),
+    )
+    circuit.measure(range(offset, 2 * offset), meas_reg)
+    tqc = stage("transpile", lambda: transpile(circuit, simulator))
+    counts = stage(
+        "simulate", lambda: simulator.run(tqc, shots=shots).result().get_counts()
+    )
+    stage("decrypt", lambda: cl.decrypt_counts(counts, offset))
+
+    outputs = {"to_standard": standard, "update_key": circuit, "transpile": tqc}
+    return {
+        name: (times.get(name), outputs.get(name), peaks.get(name)) for name in STAGES
+    }
+
+
+def cached_to_standard_s(n: int, optimize_t: bool, repeat: int) -> float:
+    """
+    Best time of to_standard served by a warm in-memory transpile cache.
+    """
+    adder = draper_adder(n)
+    set_transpile_cache(TranspileCache())
+    try:
+        to_standard(adder, optimize_t=optimize_t)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            to_standard(adder, optimize_t=optimize_t)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        set_transpile_cache(None)
+    return best
+
+
+def bench(n: int, optimize_t: bool, shots: int, repeat: int) -> list[dict]:
+    simulator = get_geneva_simulator()
+    if 2 * n + 1 > simulator.num_qubits:
+        simulator = get_simulator("aer")
+    best = {}
+    for _ in range(repeat):
+        for name, (wall_s, circuit, _) in run_stages(n, optimize_t, shots, simulator).items():
+            if name not in best or wall_s < best[name][0]:
+                best[name] = (wall_s, circuit)
+    # the sampling thread competes for the GIL: memory gets a run of its own
+    peaks = {
+        name: peak
+        for name, (_, _, peak) in run_stages(
+            n, optimize_t, shots, simulator, memory=True
+        ).items()
+    }
+    cached = {"to_standard": cached_to_standard_s(n, optimize_t, repeat)}
+    rows = []
+    for name in STAGES:
+        wall_s, circuit = best[name]
+        rows.append(
+            {
+                "n_bits": n,
+                "optimize_t": optimize_t,
+                "stage": name,
+                "wall_s": round(wall_s, 5),
+                "cached_s": round(cached[name], 5) if name in cached else "",
+                "peak_rss_mb": round(peaks[name], 2),
+                "gates": circuit.size() if circuit is not None else "",
+                "t_count": t_count(circuit) if circuit is not None else "",
+            }
+        )
+    return rows
+
+
+def compare(rows: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    Stages slower than their baseline by more than `tolerance` (relative).
+    Differences under a millisecond are ignored as noise.
+    """
+    reference = {(r["n_bits"], r["optimize_t"], r["stage"]): r for r in baseline}
+    regressions = []
+    for row in rows:
+        base = reference.get((row["n_bits"], row["optimize_t"], row["stage"]))
+        if base is None:
+            continue
+        slower = row["wall_s"] - base["wall_s"]
+        if slower > 1e-3 and slower > tolerance * base["wall_s"]:
+            regressions.append(
+                f"{row['stage']} (n_bits={row['n_bits']}, optimize_t={row['optimize_t']}):"
+                f" {base['wall_s']}s -> {row['wall_s']}s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--min-bits", type=int, default=1)
+    parser.add_argument("--max-bits", type=int, default=4)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the rows to this file")
+    parser.add_argument("--baseline", help="compare to the rows of this file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # stages are timed in full, not served by the cache of an earlier run
+    set_transpile_cache(None)
+    print(" ".join(f"{c:>12}" for c in COLUMNS))
+    rows = []
+    for n in range(args.min_bits, args.max_bits + 1):
+        for optimize_t in (False, True):
+            for row in bench(n, optimize_t, args.shots, args.repeat):
+                rows.append(row)
+                print(" ".join(f"{row[c]!s:>12}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(rows, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Throughput of the server's worker pool on encrypted adder jobs.
+
+For each number of workers, submits the same encrypted circuits to a
+fresh server and reports jobs per second, with the mean queue and
+execution time of a job. Worker start-up is not timed.
+
+Run from qotp/:
+    python -m benchmarks.server_pool --jobs 32 --workers 1 2 4
+"""
+
+import argparse
+import json
+import time
+
+from core.client import Client
+from core.server import Server
+from core.pipe import encrypted_adder_circuit
+from util import draper_adder, to_standard
+
+COLUMNS = ["workers", "jobs", "wall_s", "jobs_per_s", "mean_queued_s", "mean_run_s"]
+
+
+def bench(circuits: list, workers: int, shots: int, backend: str, standard) -> dict:
+    with Server(standard, workers=workers, backend=backend) as sv:
+        # start the workers before timing
+        sv.submit(circuits[0], shots=1).result()
+        start = time.perf_counter()
+        futures = [sv.submit(qc, shots=shots) for qc in circuits]
+        results = [future.result() for future in futures]
+        wall_s = time.perf_counter() - start
+    return {
+        "workers": workers,
+        "jobs": len(results),
+        "wall_s": round(wall_s, 3),
+        "jobs_per_s": round(len(results) / wall_s, 2),
+        "mean_queued_s": round(sum(r.queued_s for r in results) / len(results), 4),
+        "mean_run_s": round(sum(r.run_s for r in results) / len(results), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--n-bits", type=int, default=2)
+    parser.add_argument("--shots", type=int, default=1024)
+    parser.add_argument("--backend", default="geneva", choices=["geneva", "aer"])
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    standard = to_standard(draper_adder(args.n_bits))
+    sv = Server(standard)
+    modulus = 2**args.n_bits
+    circuits = [
+        encrypted_adder_circuit(Client(), sv, i % modulus, (i // modulus) % modulus)[0]
+        for i in range(args.jobs)
+    ]
+
+    print(" ".join(f"{c:>14}" for c in COLUMNS))
+    rows = []
+    for workers in args.workers:
+        row = bench(circuits, workers, args.shots, args.backend, standard)
+        rows.append(row)
+        print(" ".join(f"{row[c]:>14}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Time saved by the transpile cache on the encrypted n-bit adder.
+
+Times `to_standard(draper_adder(n))` and the FakeGeneva transpilation of
+the adder's `EncryptedTemplate` with a cold cache, a memory hit (same
+cache) and a disk hit (a new cache on the same directory, as in a new
+process), and reports the size of the cached QPY files. The cache lives
+in a temporary directory unless `--cache-dir` is given; the simulator is
+built before timing.
+
+Run from qotp/:
+    python -m benchmarks.transpile_cache --n-bits 2 3 4 --json transpile_cache.json
+"""
+
+import argparse
+import tempfile
+import json
+import time
+import os
+
+from core.server import Server
+from core.template import EncryptedTemplate
+from util import (
+    TranspileCache,
+    draper_adder,
+    get_geneva_simulator,
+    set_transpile_cache,
+    to_standard,
+)
+
+COLUMNS = ["n_bits", "stage", "cold_s", "memory_s", "disk_s", "speedup", "disk_kb"]
+STATES = ["cold", "memory", "disk"]
+
+
+def timed(f) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def bench(n_bits: int, directory: str, simulator) -> list[dict]:
+    stages = {
+        "to_standard": lambda: to_standard(draper_adder(n_bits)),
+        "template": lambda: EncryptedTemplate(
+            Server(to_standard(draper_adder(n_bits))),
+            input_widths=[n_bits, n_bits],
+            measured=1,
+            simulator=simulator,
+        ),
+    }
+    times = {stage: {} for stage in stages}
+    cache = TranspileCache(directory)
+    cache.clear()
+    for state in STATES:
+        if state == "disk":
+            cache = TranspileCache(directory)
+        set_transpile_cache(cache)
+        for stage, f in stages.items():
+            times[stage][state] = timed(f)
+    set_transpile_cache(None)
+    disk_kb = sum(size for _, _, size in cache._files()) / 1024
+
+    rows = []
+    for stage, t in times.items():
+        row = {"n_bits": n_bits, "stage": stage}
+        row.update({f"{state}_s": round(t[state], 4) for state in STATES})
+        row["speedup"] = round(t["cold"] / t["disk"], 1)
+        row["disk_kb"] = round(disk_kb, 1)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-bits", type=int, nargs="+", default=[2, 3])
+    parser.add_argument("--cache-dir", help="directory of the cache, temporary if unset")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    simulator = get_geneva_simulator()
+    # loads the transpiler passes, uncached, so that the first row does not pay for it
+    set_transpile_cache(None)
+    EncryptedTemplate(Server(to_standard(draper_adder(1))), [1, 1], simulator=simulator)
+    print(" ".join(f"{c:>12}" for c in COLUMNS))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_bits in args.n_bits:
+            directory = os.path.join(args.cache_dir or tmp, f"adder{n_bits}")
+            for row in bench(n_bits, directory, simulator):
+                rows.append(row)
+                print(" ".join(f"{row[c]!s:>12}" for c in COLUMNS), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Throughput of the key update on large Clifford+T circuits.
+
+Compares the original gate-by-gate `update_key` loop (kept below as a
+reference) to the key update plan, cold (compile + apply + emit) and warm
+(plan cached by the server, as for every client after the first one), and
+the update of the same keys after appending `--append` gates to the
+circuit, which resumes from the last key checkpoint and only writes the
+new gates into the previously corrected circuit.
+
+The warm update is the one meant to be ten times faster than the
+reference: the cold one also compiles the plan and writes the whole
+corrected circuit, and takes about a third of the reference time.
+
+Run from qotp/:
+    python -m benchmarks.update_key --gates 100000 --qubits 50
+"""
+
+from qiskit import QuantumCircuit
+import numpy as np
+import argparse
+import random
+import json
+import time
+
+from core.client import Client
+from core.keys import KeyState
+from core.plan import KeyUpdatePlan
+from core.server import Server
+from util import is_t_gate, is_t_dg
+
+
+def random_circuit(num_gates: int, num_qubits: int, seed: int = 0) -> QuantumCircuit:
+    """
+    Random circuit in the gate set of `to_standard`: H, CX and P(k pi/4),
+    on `num_qubits` qubits plus the dummy one.
+    """
+    rng = random.Random(seed)
+    qc = QuantumCircuit(num_qubits + 1)
+    for _ in range(num_gates):
+        a, b = rng.sample(range(num_qubits), 2)
+        g = rng.random()
+        if g < 0.3:
+            qc.h(a)
+        elif g < 0.6:
+            qc.cx(a, b)
+        elif g < 0.8:
+            qc.p(rng.choice([np.pi / 2, -np.pi / 2]), a)
+        else:
+            qc.p(rng.choice([np.pi / 4, -np.pi / 4]), a)
+    return qc
+
+
+def reference_update_key(
+    keys: dict, server_qc: QuantumCircuit, dummy_qubit_idx: int
+) -> QuantumCircuit:
+    """
+    The original key update loop, without its debug output.
+    """
+    new_qc = QuantumCircuit(*server_qc.qregs, *server_qc.cregs)
+    for instruction in server_qc.data:
+        op = instruction.operation
+        qubits = instruction.qubits
+        q_indices = [server_qc.find_bit(q).index for q in qubits]
+        new_qc.append(op, qubits, instruction.clbits)
+        gate_name = op.name
+        gate_theta = op.params[0] if op.params else 0
+        if gate_name == "h":
+            a, b = keys[q_indices[0]]
+            keys[q_indices[0]] = b, a
+        elif gate_name == "cx":
+            ai, bi = keys[q_indices[0]]
+            aj, bj = keys[q_indices[1]]
+            keys[q_indices[0]] = ai, bi ^ bj
+            keys[q_indices[1]] = ai ^ aj, bj
+        elif gate_name == "p" and (
+            np.isclose(gate_theta, np.pi / 2) or np.isclose(gate_theta, -np.pi / 2)
+        ):
+            a, b = keys[q_indices[0]]
+            keys[q_indices[0]] = a, a ^ b
+        elif is_t_gate(op) or is_t_dg(op):
+            idx = q_indices[0]
+            a, b = keys[idx]
+            target_qubit_idx = idx if a == 1 else dummy_qubit_idx
+            if is_t_gate(op):
+                new_qc.s(target_qubit_idx)
+            else:
+                new_qc.sdg(target_qubit_idx)
+            if a == 1:
+                keys[idx] = (a, b ^ 1)
+    return new_qc
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+def bench(num_gates: int, num_qubits: int, repeat: int, append: int) -> dict:
+    qc = random_circuit(num_gates, num_qubits)
+    rng = random.Random(1)
+    pad = {i: (rng.randint(0, 1), rng.randint(0, 1)) for i in range(num_qubits)}
+
+    ref_keys = dict(pad)
+    ref_qc, reference_s = timed(
+        lambda: reference_update_key(ref_keys, qc, num_qubits)
+    )
+
+    sv = Server(qc)
+    cl = Client()
+    cl.keys = KeyState.from_dict(pad)
+    cold_qc, cold_s = timed(
+        lambda: cl.update_key(qc, num_qubits, plan=sv.get_plan())
+    )
+    if cl.keys.to_dict() != ref_keys or cold_qc.size() != ref_qc.size():
+        raise RuntimeError("key update plan and reference disagree")
+
+    warm_s = []
+    for _ in range(repeat):
+        cl.keys = KeyState.from_dict(pad)
+        out, elapsed = timed(lambda: cl.update_key(qc, num_qubits, plan=sv.get_plan()))
+        warm_s.append(elapsed)
+    warm = min(warm_s)
+
+    # iterative use: the keys left by the last update go through new gates
+    extra = random_circuit(append, num_qubits, seed=2)
+    append_s = []
+    for _ in range(repeat):
+        sv.circuit.compose(extra, inplace=True)
+        out, elapsed = timed(
+            lambda: cl.update_key(
+                sv.circuit, num_qubits, plan=sv.get_plan(), target=out, resume=True
+            )
+        )
+        append_s.append(elapsed)
+    fresh = KeyState.from_dict(pad)
+    KeyUpdatePlan(sv.circuit).apply(fresh)
+    written = sv.circuit.size() + sv.get_plan().t_count
+    if cl.keys.to_dict() != fresh.to_dict() or out.size() != written:
+        raise RuntimeError("resumed key update and full key update disagree")
+
+    return {
+        "gates": num_gates,
+        "qubits": num_qubits,
+        "t_count": sv.get_plan().t_count,
+        "reference_s": round(reference_s, 4),
+        "cold_s": round(cold_s, 4),
+        "warm_s": round(warm, 4),
+        "append_gates": append,
+        "append_s": round(min(append_s), 4),
+        "cold_speedup": round(reference_s / cold_s, 1),
+        "warm_speedup": round(reference_s / warm, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--gates", type=int, default=100_000)
+    parser.add_argument("--qubits", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--append", type=int, default=1000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    row = bench(args.gates, args.qubits, args.repeat, args.append)
+    for key, value in row.items():
+        print(f"{key:>14}: {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(row, f, indent=2)
+        print(f"Results saved at {args.json}")
+
+
+if __name__ == "__main__":
+    main()
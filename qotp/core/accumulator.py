@@ -0,0 +1,150 @@
+from qiskit import ClassicalRegister, QuantumCircuit, transpile
+
+from util import draper_accumulator, draper_adder, to_standard, get_simulator, span
+
+from .client import Client
+from .keys import KeyState
+from .pipe import encrypted_adder_circuit
+from .server import Server
+
+# standardized accumulator servers, by (n_bits, number of values)
+_accumulator_servers = {}
+
+
+def accumulator_server(n_bits: int, k: int) -> Server:
+    """
+    Returns the server of the standardized n-bit accumulator of k values,
+    built on first use, so that its key update plan is compiled once.
+    """
+    key = (n_bits, k)
+    if key not in _accumulator_servers:
+        _accumulator_servers[key] = Server(to_standard(draper_accumulator(n_bits, k)))
+    return _accumulator_servers[key]
+
+
+def encrypted_accumulator_circuit(
+    cl: Client,
+    sv: Server,
+    values: list[int],
+    debug_mode: bool = False,
+    correction: str = "dummy",
+) -> tuple[QuantumCircuit, int]:
+    """
+    Encrypts every value for the accumulator circuit of `sv` and returns the
+    corrected circuit, measured on the accumulator (the last register), with
+    the offset of that register.
+    The keys are tracked through all the additions by a single `update_key`
+    and left updated in the client for decryption.
+    """
+    width = sv.get_num_qubits() // len(values)
+    if width * len(values) != sv.get_num_qubits():
+        raise ValueError(
+            f"{len(values)} values do not fit the {sv.get_num_qubits()} qubits of the server"
+        )
+    with span("encrypt", values=len(values)):
+        ciphers = [
+            cl.encrypt(value, sv, i * width, width=width)
+            for i, value in enumerate(values)
+        ]
+
+    with span("merge_keys"):
+        keys = KeyState(width * len(values))
+        for i, cipher in enumerate(ciphers):
+            keys.assign(cipher.keys, i * width, (i + 1) * width)
+    cl.keys = keys
+
+    plan = sv.get_plan()
+    dummy = plan.needs_dummy(correction)
+    total_qubits = width * len(values)
+    with span("assemble"):
+        circuit = QuantumCircuit(total_qubits + dummy)  # +1 for dummy ancilla
+        inputs = ciphers[0].circuit
+        for cipher in ciphers[1:]:
+            inputs = cipher.circuit ^ inputs
+        inputs.name = "input gate"
+        circuit.append(inputs, range(total_qubits))
+
+    corrected_circuit = cl.update_key(
+        server_qc=sv.circuit,
+        dummy_qubit_idx=total_qubits if dummy else None,
+        debug_mode=debug_mode,
+        plan=plan,
+        target=circuit,
+        correction=correction,
+    )
+
+    offset = total_qubits - width
+    meas_reg = ClassicalRegister(width, "meas")
+    corrected_circuit.add_register(meas_reg)
+    corrected_circuit.measure(range(offset, total_qubits), meas_reg)
+    return corrected_circuit, offset
+
+
+def accumulate(
+    values: list[int],
+    n_bits: int = 2,
+    shots: int = 1024,
+    backend: str = "geneva",
+    debug_mode: bool = False,
+    correction: str = "dummy",
+) -> dict:
+    """
+    Computes sum(values) mod 2^n_bits on encrypted inputs, with one circuit,
+    one simulation and one decryption instead of a round trip of
+    `adder_pipe` per addition.
+
+    Returns:
+        dict: The decrypted counts of the accumulator.
+
+    Example:
+        >>> counts = accumulate([1, 2, 3, 1])
+        >>> max(counts, key=counts.get)
+        '11'
+    """
+    if len(values) < 2:
+        raise ValueError("the accumulator needs at least two values")
+    with span("to_standard"):
+        sv = accumulator_server(n_bits, len(values))
+    cl = Client()
+    circuit, offset = encrypted_accumulator_circuit(
+        cl, sv, values, debug_mode, correction
+    )
+
+    with span("simulate"):
+        simulator = get_simulator(backend)
+        counts = simulator.run(transpile(circuit, simulator), shots=shots).result().get_counts()
+    if debug_mode:
+        print("counts:", counts)
+    with span("decrypt"):
+        return cl.decrypt_counts(counts, offset)
+
+
+def accumulate_chained(
+    values: list[int],
+    n_bits: int = 2,
+    shots: int = 1024,
+    backend: str = "geneva",
+    correction: str = "dummy",
+) -> dict:
+    """
+    The baseline of `accumulate`: k - 1 encrypted additions, each a round
+    trip as in `adder_pipe` (encryption, simulation, decryption), whose
+    most frequent outcome is fed to the next addition.
+
+    Returns:
+        dict: The decrypted counts of the last addition.
+    """
+    if len(values) < 2:
+        raise ValueError("the accumulator needs at least two values")
+    sv = Server(to_standard(draper_adder(n_bits)))
+    simulator = get_simulator(backend)
+    total = values[0]
+    for value in values[1:]:
+        cl = Client()
+        circuit, offset = encrypted_adder_circuit(
+            cl, sv, value, total, correction=correction
+        )
+        counts = simulator.run(transpile(circuit, simulator), shots=shots).result().get_counts()
+        counts = cl.decrypt_counts(counts, offset)
+        total = int(max(counts, key=counts.get), 2)
+    return counts
@@ -0,0 +1,213 @@
+from concurrent.futures import ProcessPoolExecutor
+from abc import ABC, abstractmethod
+from qiskit import QuantumCircuit, qpy
+import multiprocessing
+import hashlib
+import atexit
+import json
+import io
+import os
+
+from util import circuit_digest
+
+MANIFEST = ".artifacts.json"
+
+
+def render_artifact(kind: str, payload: bytes, filename: str) -> str:
+    """
+    Renders a serialized artifact to `filename`.
+    `kind` is "circuit" (QPY payload) or "histogram" (JSON counts).
+    Importable at top level so that worker processes can run it.
+    """
+    import matplotlib.pyplot as plt
+
+    if kind == "circuit":
+        qc = qpy.load(io.BytesIO(payload))[0]
+        fig = qc.draw("mpl", fold=-1)
+        fig.savefig(filename)
+        print(f"Circuit saved at {filename}")
+    elif kind == "histogram":
+        from qiskit.visualization import plot_histogram
+
+        fig = plot_histogram(json.loads(payload))
+        fig.savefig(filename)
+        print(f"Histogram saved at {filename}")
+    else:
+        raise ValueError(f"unknown artifact kind: {kind}")
+    plt.close(fig)
+    return filename
+
+
+def _init_worker() -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+class ArtifactSink:
+    """
+    Collects the circuits and histograms produced by the pipe.
+
+    The base sink is mode "none": artifacts are dropped, nothing is
+    serialized. Subclasses serialize artifacts (QPY for circuits, JSON for
+    counts) and render them outside of the request path. A render is skipped
+    when the same content was already rendered to the same file, in this
+    process or in a previous run (see the manifest in `directory`).
+    """
+
+    mode = "none"
+
+    def __init__(self, directory: str = "./images"):
+        self.directory = directory
+
+    def circuit(self, name: str, qc: QuantumCircuit) -> None:
+        pass
+
+    def histogram(self, name: str, counts: dict) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _RenderingSink(ArtifactSink, ABC):
+    def __init__(self, directory: str = "./images"):
+        super().__init__(directory)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._manifest_path = os.path.join(directory, MANIFEST)
+        try:
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {}
+        self._queued = set()
+
+    def circuit(self, name: str, qc: QuantumCircuit) -> None:
+        filename = os.path.join(self.directory, f"{name}.png")
+        digest = circuit_digest(qc)
+        if self._is_rendered(filename, digest):
+            return
+        buffer = io.BytesIO()
+        qpy.dump(qc, buffer)
+        self._queue("circuit", buffer.getvalue(), filename, digest)
+
+    def histogram(self, name: str, counts: dict) -> None:
+        filename = os.path.join(self.directory, f"{name}.png")
+        payload = json.dumps(counts, sort_keys=True).encode()
+        digest = hashlib.sha256(payload).hexdigest()
+        if self._is_rendered(filename, digest):
+            return
+        self._queue("histogram", payload, filename, digest)
+
+    def _is_rendered(self, filename: str, digest: str) -> bool:
+        if self._manifest.get(filename) != digest:
+            return False
+        return filename in self._queued or os.path.exists(filename)
+
+    def _queue(self, kind: str, payload: bytes, filename: str, digest: str) -> None:
+        # the manifest is updated as soon as a render is queued, so that
+        # identical artifacts submitted before it runs are skipped too
+        self._manifest[filename] = digest
+        self._queued.add(filename)
+        self._submit(kind, payload, filename)
+
+    @abstractmethod
+    def _submit(self, kind: str, payload: bytes, filename: str) -> None:
+        """
+        Renders a queued artifact, now or later (see `render_artifact`).
+        """
+
+    def _save_manifest(self) -> None:
+        with open(self._manifest_path, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+
+
+class DeferredSink(_RenderingSink):
+    """
+    Mode "deferred": artifacts are serialized and queued, and only rendered
+    when the caller decides to, by calling `flush`.
+    """
+
+    mode = "deferred"
+
+    def __init__(self, directory: str = "./images"):
+        super().__init__(directory)
+        self._pending = {}
+
+    def _submit(self, kind: str, payload: bytes, filename: str) -> None:
+        # a later artifact for the same file replaces the queued one
+        self._pending[filename] = (kind, payload)
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        for filename, (kind, payload) in pending.items():
+            render_artifact(kind, payload, filename)
+        self._queued = set()
+        self._save_manifest()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class BackgroundSink(_RenderingSink):
+    """
+    Mode "background": artifacts are rendered by a worker process as soon
+    as they are submitted. The caller never waits, except in `flush`.
+    """
+
+    mode = "background"
+
+    def __init__(self, directory: str = "./images"):
+        super().__init__(directory)
+        # spawn: the worker must not inherit the simulator's OpenMP state
+        self._executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self._pending = []
+
+    def _submit(self, kind: str, payload: bytes, filename: str) -> None:
+        future = self._executor.submit(render_artifact, kind, payload, filename)
+        self._pending.append(future)
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+        self._queued = set()
+        self._save_manifest()
+
+    def close(self) -> None:
+        self.flush()
+        self._executor.shutdown()
+
+
+SINKS = {
+    "none": ArtifactSink,
+    "deferred": DeferredSink,
+    "background": BackgroundSink,
+}
+
+_default_sinks = {}
+
+
+def get_sink(mode: str = "background", directory: str = "./images") -> ArtifactSink:
+    """
+    Returns the process-wide sink of a mode, created on first use and
+    closed at interpreter exit.
+    """
+    if mode not in SINKS:
+        raise ValueError(
+            f"unknown artifact mode: {mode}, expected one of {list(SINKS)}"
+        )
+    key = (mode, directory)
+    if key not in _default_sinks:
+        sink = SINKS[mode](directory)
+        atexit.register(sink.close)
+        _default_sinks[key] = sink
+    return _default_sinks[key]
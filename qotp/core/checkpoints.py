@@ -0,0 +1,130 @@
+from qiskit import QuantumCircuit
+import numpy as np
+
+from .keys import KeyState
+from .plan import KeyUpdatePlan
+
+
+class KeyCheckpoints:
+    """
+    Key states of one pad along the steps of a `KeyUpdatePlan`, so that
+    updating the pad through a grown circuit only runs the new steps.
+
+    The first checkpoint holds the pad before the circuit. `update` resumes
+    from the last checkpoint whose steps are still those of the plan:
+    `KeyUpdatePlan.extend` keeps every checkpoint, `KeyUpdatePlan.invalidate`
+    makes the ones after the edit unreachable, and they are dropped. A
+    checkpoint is taken every `every` steps and at the end of each update.
+
+    `emit` follows the same way: when asked to write into the circuit it
+    returned last, it only rewrites the instructions from the first one
+    whose keys were run again.
+
+    Args:
+        plan (KeyUpdatePlan): Plan of the circuit.
+        keys (KeyState): Pad before the circuit.
+        every (int): Steps between two checkpoints, which bounds the steps
+            run again after an edit.
+    """
+
+    def __init__(self, plan: KeyUpdatePlan, keys: KeyState, every: int = 64):
+        self.plan = plan
+        self.every = every
+        # corrections of the non-Clifford gates run so far, in order
+        self.corrections = []
+        # (steps run, last step run, packed masks, number of corrections)
+        self.checkpoints = [(0, None, plan.pack(keys), 0)]
+        # key state written by the last update, and its packed masks
+        self._written = None
+        # first instruction whose keys the last update ran again
+        self._resumed = 0
+        # (target, dummy qubit, strategy, index of the first instruction
+        # written, instructions of the circuit written, target size) of the
+        # last emit
+        self._emitted = None
+
+    def holds(self, keys: KeyState) -> bool:
+        """
+        Whether `keys` is the key state written by the last `update`, left
+        unchanged since, so that the next update can resume.
+        """
+        return (
+            self._written is not None
+            and self._written[0] is keys
+            and self.plan.pack(keys) == self._written[1]
+        )
+
+    def _resume(self) -> tuple[int, int, int]:
+        steps = self.plan.steps
+        while True:
+            done, last, v, count = self.checkpoints[-1]
+            if done == 0 or (done <= len(steps) and steps[done - 1] is last):
+                return done, v, count
+            self.checkpoints.pop()
+
+    def update(self, keys: KeyState) -> np.ndarray:
+        """
+        Writes the pad after the whole circuit of the plan to `keys`, in
+        place, running only the steps after the last valid checkpoint.
+        The circuit runs on the pad given at construction, not on `keys`:
+        only call it on the keys written by the previous update (see
+        `holds`).
+        Returns the corrections of every non-Clifford gate of the circuit
+        (see `KeyUpdatePlan.apply`).
+        """
+        plan = self.plan
+        plan.extend()
+        done, v, count = self._resume()
+        self._resumed = plan.ends[done - 1] if done else 0
+        del self.corrections[count:]
+        stop = len(plan.steps)
+        while done < stop:
+            end = min(done - done % self.every + self.every, stop)
+            v = plan.run(v, done, end, self.corrections)
+            done = end
+            self.checkpoints.append(
+                (done, plan.steps[done - 1], v, len(self.corrections))
+            )
+        plan.unpack(v, keys)
+        self._written = (keys, plan.pack(keys))
+        return np.array(self.corrections, dtype=bool)
+
+    def emit(
+        self,
+        corrections: np.ndarray,
+        dummy_qubit_idx: int | None,
+        target: QuantumCircuit | None = None,
+        correction: str = "dummy",
+    ) -> QuantumCircuit:
+        """
+        `KeyUpdatePlan.emit` of the corrections returned by the last
+        `update`. If `target` is the circuit returned by the previous emit,
+        with the same dummy qubit and strategy and left unchanged since,
+        only the instructions after the last unchanged one are written again.
+        """
+        plan = self.plan
+        emitted = self._emitted
+        if (
+            emitted is not None
+            and target is emitted[0]
+            and emitted[1:3] == (dummy_qubit_idx, correction)
+            and len(target.data) == emitted[5]
+        ):
+            offset = emitted[3]
+            start = min(self._resumed, emitted[4])
+        else:
+            if target is None:
+                target = plan.circuit.copy_empty_like()
+            offset, start = len(target.data), 0
+        target = plan.emit(
+            corrections, dummy_qubit_idx, target, correction, start, offset
+        )
+        self._emitted = (
+            target,
+            dummy_qubit_idx,
+            correction,
+            offset,
+            plan.num_instructions,
+            len(target.data),
+        )
+        return target
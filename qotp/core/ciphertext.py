@@ -1,4 +1,9 @@
+from qiskit import QuantumCircuit
+
+from .keys import KeyState
+
+
 class Ciphertext:
-    def __init__(self, circuit, keys):
+    def __init__(self, circuit: QuantumCircuit, keys: KeyState):
         self.circuit = circuit
         self.keys = keys
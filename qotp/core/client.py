@@ -1,16 +1,28 @@
 from qiskit import QuantumCircuit
-import random as random
 import numpy as np
 
-from util import is_t_gate, is_t_dg
+from util import get_tracer, span
 
+from .checkpoints import KeyCheckpoints
 from .ciphertext import Ciphertext
+from .keygen import PadGenerator, PadPool, default_generator
+from .keys import KeyState
+from .plan import KeyUpdatePlan
 from .server import Server
 
 
 class Client:
-    def __init__(self):
-        self.keys = {}
+    """
+    Args:
+        pads (PadGenerator | PadPool): Source of the client's pads,
+            the shared CSPRNG generator if None.
+    """
+
+    def __init__(self, pads: PadGenerator | PadPool | None = None):
+        self.keys = KeyState()
+        self.pads = pads if pads is not None else default_generator
+        # key states along the last updated circuit, see `update_key`
+        self.checkpoints = None
 
     def load_int(self, val: int) -> QuantumCircuit:
         """
@@ -24,21 +36,24 @@ class Client:
                 qc.x(i)
         return qc
 
-    def encrypt(self, psi: int, server: Server, offset: int = 0) -> Ciphertext:
+    def encrypt(
+        self, psi: int, server: Server, offset: int = 0, width: int | None = None
+    ) -> Ciphertext:
         """
-        Returns Cipher(physical: QuantumCircuit, keys: dict)
+        Returns Cipher(physical: QuantumCircuit, keys: KeyState)
+        `width` is the number of qubits of the input register,
+        by default the number of bits of psi (at least 2).
         """
-        bin_len = max(2, psi.bit_length())
+        bin_len = max(2, psi.bit_length()) if width is None else width
+        if psi < 0 or psi.bit_length() > bin_len:
+            raise ValueError(f"input {psi} does not fit in {bin_len} qubits")
         val_bin = format(psi, f"0{bin_len}b")[::-1]
         num_qubits = server.get_num_qubits()
         physical = QuantumCircuit(bin_len)
-        keys = {}
+        keys = self.new_pad(num_qubits)
         for i, bit in enumerate(val_bin):
             if bit == "1" and offset + i < num_qubits:
                 physical.x(i)
-        for k in range(num_qubits):
-            a, b = random.randint(0, 1), random.randint(0, 1)
-            keys[k] = (a, b)
         for i in range(bin_len):
             a, b = keys[i + offset]
             if a == 1:
@@ -47,6 +62,12 @@ class Client:
                 physical.z(i)
         return Ciphertext(physical, keys)
 
+    def new_pad(self, num_qubits: int) -> KeyState:
+        """
+        Draws a fresh random pad for `num_qubits` qubits.
+        """
+        return self.pads.pad(num_qubits)
+
     def decrypt(self, psi_tilde: str, offset: int = 0) -> str:
         """
         Decrypts a measured state.
@@ -55,123 +76,187 @@ class Client:
         """
         res = []
         for i, bit in enumerate(psi_tilde[::-1]):
-            a = self.keys[i + offset][0]
+            a = self.keys.x[i + offset]
             decrypted_bit = str(a ^ int(bit))
             res.append(decrypted_bit)
         return "".join(res)[::-1]
 
+    def _x_mask(self, width: int, offset: int) -> np.ndarray:
+        # bits of the register in bitstring order, most significant first
+        return self.keys.x[offset : offset + width][::-1]
+
+    def decrypt_memory(self, memory: list[str], offset: int = 0) -> np.ndarray:
+        """
+        Decrypts per-shot outcomes (`memory=True` results) at once.
+        Returns the decrypted bits, one row per shot, in bitstring order.
+        """
+        bits = _bit_matrix(memory)
+        return bits ^ self._x_mask(bits.shape[1], offset)
+
+    def decrypt_counts(self, counts: dict, offset: int = 0) -> dict:
+        """
+        Decrypts a whole count distribution at once: bitstrings are turned
+        into a bit matrix, XOR-ed with the X mask, and equal outcomes are
+        merged (a bincount for dense counts, a sort otherwise).
+        Same result as `decrypt` applied to every bitstring.
+        """
+        if not counts:
+            return {}
+        bits = self.decrypt_memory(list(counts), offset)
+        return _aggregate(bits, np.fromiter(counts.values(), dtype=np.int64))
+
+    def decrypt_probabilities(self, probabilities: np.ndarray, offset: int = 0) -> np.ndarray:
+        """
+        Decrypts an outcome probability vector (see `get_result_exact`) of
+        the register at `offset`: the X mask only permutes the outcomes,
+        so outcome v decrypts to v ^ mask.
+        """
+        width = int(np.log2(len(probabilities)))
+        x = self.keys.x[offset : offset + width]
+        mask = int(x @ (1 << np.arange(width))) if width else 0
+        return probabilities[np.arange(len(probabilities)) ^ mask]
+
+    def decrypt_memory_counts(self, memory: list[str], offset: int = 0) -> dict:
+        """
+        Counts of the decrypted per-shot outcomes.
+        """
+        if not len(memory):
+            return {}
+        return _aggregate(self.decrypt_memory(memory, offset))
+
     def update_key(
-        self, server_qc: QuantumCircuit, dummy_qubit_idx: int, debug_mode: bool = False
+        self,
+        server_qc: QuantumCircuit,
+        dummy_qubit_idx: int | None,
+        debug_mode: bool = False,
+        plan: KeyUpdatePlan | None = None,
+        target: QuantumCircuit | None = None,
+        correction: str = "dummy",
+        resume: bool = False,
     ) -> QuantumCircuit:
         """
         Updates QOTP private keys for circuits containing only Clifford gates.
-        Handles: h, s (p), and cx gates.
-        """
-        names = []
-        new_qc = QuantumCircuit(*server_qc.qregs, *server_qc.cregs)
-        # print(f"Before update, current state:\n{self.keys}")
-        for instruction in server_qc.data:
-            op = instruction.operation
-            qubits = instruction.qubits
-            clbits = instruction.clbits
-            q_indices = [server_qc.find_bit(q).index for q in qubits]
-            new_qc.append(op, qubits, clbits)
-            gate_name = op.name
-            gate_params = op.params
-            gate_theta = gate_params[0] if gate_params else 0
-            names.append(gate_name)
-
-            # -------------------- #
-            #
-            # CLIFFORD GATES
-            #
-            # -------------------- #
-
-            # Hadamard gate
-            if gate_name == "h":
-                idx = q_indices[0]
-                a, b = self.keys[idx]
-                self.keys[idx] = b, a
-                if debug_mode:
-                    print(f"🟢 update key: encountered H gate at index {idx}\n\n")
-
-            # CNOT gate
-            elif gate_name == "cx":
-                idx_1, idx_2 = q_indices[0], q_indices[1]
-                ai, bi = self.keys[idx_1]
-                aj, bj = self.keys[idx_2]
-                self.keys[idx_1] = ai, bi ^ bj
-                self.keys[idx_2] = ai ^ aj, bj
-                if debug_mode:
-                    print(
-                        f"🟢 update key: encountered CNOT gate at indices control: {idx_1}, target = {idx_2}\n\n"
-                    )
+        Handles: h, s (p), and cx gates, plus T/T_dg and other phase gates
+        with a correction (see `KeyUpdatePlan`).
 
-            # S or P gate / S_dg or P_dg
-            elif gate_name == "p" and (
-                np.isclose(gate_theta, np.pi / 2) or np.isclose(gate_theta, -np.pi / 2)
-            ):
-                idx = q_indices[0]
-                a, b = self.keys[idx]
-                self.keys[idx] = a, a ^ b
-                if debug_mode:
-                    print(
-                        f"🟢 update key: encountered P({gate_theta}) gate (pi/2) or (-pi/2) at index {idx}\n\n"
-                    )
+        `plan` is the precompiled key update of `server_qc`, compiled on the
+        fly if not given (see `Server.get_plan`). The corrected circuit is
+        appended to `target` if given, otherwise to a new circuit.
 
-            # -------------------- #
-            #
-            # NON-CLIFFORD GATES
-            #
-            # -------------------- #
+        The keys go through the whole circuit on every call, so updating
+        twice with the same circuit is the same as updating once with the
+        circuit applied twice. Key states are checkpointed along the circuit
+        (see `KeyCheckpoints`): with `resume=True`, `server_qc` is instead
+        the grown version of the circuit of the previous update, whose keys
+        must be those that update wrote. Only the instructions appended
+        since are compiled, run and, with the previous circuit as `target`,
+        written. Edits other than appends must be reported with
+        `plan.invalidate(position)` (`self.checkpoints.plan` if no plan was
+        given). If the keys changed since, the whole circuit is run on the
+        current keys.
 
-            elif is_t_gate(op):
-                idx = q_indices[0]
-                a, b = self.keys[idx]
-
-                needs_correction = a == 1
-                if needs_correction:
-                    target_qubit_idx = idx
+        `correction` picks where the correction of a gate whose X mask is 0
+        goes: "dummy" (the qubit at `dummy_qubit_idx`) or "recycle" (a qubit
+        of the circuit holding a classical bit, see
+        `KeyUpdatePlan.spare_qubits`). With "recycle", `dummy_qubit_idx` may
+        be None when `plan.needs_dummy("recycle")` is False.
+        """
+        with span("update_key", qubits=server_qc.num_qubits):
+            checkpoints = self.checkpoints if resume else None
+            if plan is None:
+                if checkpoints is not None and checkpoints.plan.circuit is server_qc:
+                    plan = checkpoints.plan
                 else:
-                    target_qubit_idx = dummy_qubit_idx
-
-                new_qc.s(target_qubit_idx)
-
-                if needs_correction:
-                    self.keys[idx] = (a, b ^ 1)
+                    plan = KeyUpdatePlan(server_qc)
+            if (
+                checkpoints is None
+                or checkpoints.plan is not plan
+                or not checkpoints.holds(self.keys)
+            ):
+                checkpoints = self.checkpoints = KeyCheckpoints(plan, self.keys)
+            corrections = checkpoints.update(self.keys)
+            _count_gates(plan, corrections, correction)
 
-                if debug_mode:
+            if debug_mode:
+                for position, gate_name, gate_theta in plan.unverified:
                     print(
-                        f"🔴 t gate at {idx}. a={a}. Correction applied to {target_qubit_idx}\n\n"
+                        f"🟡 unverified gate encountered: {gate_name} theta={gate_theta}\n\n"
                     )
-
-            elif is_t_dg(op):
-                idx = q_indices[0]
-                a, b = self.keys[idx]
-
-                needs_correction = a == 1
-                if needs_correction:
-                    target_qubit_idx = idx
+                if correction == "recycle":
+                    spares = plan.spare_qubits()
                 else:
-                    target_qubit_idx = dummy_qubit_idx
+                    spares = [None] * plan.t_count
+                for (idx, gate, angle), spare, corrected in zip(
+                    plan.t_gates, spares, corrections
+                ):
+                    if corrected:
+                        target_qubit_idx = idx
+                    else:
+                        target_qubit_idx = dummy_qubit_idx if spare is None else spare
+                    print(
+                        f"🔴 non-Clifford gate at {idx}. a={int(corrected)}. {gate}({angle}) correction applied to {target_qubit_idx}\n\n"
+                    )
+                print("names: ", [instruction.name for instruction in server_qc.data])
+            return checkpoints.emit(corrections, dummy_qubit_idx, target, correction)
 
-                new_qc.sdg(target_qubit_idx)
 
-                if needs_correction:
-                    self.keys[idx] = (a, b ^ 1)
+def _count_gates(plan: KeyUpdatePlan, corrections: np.ndarray, correction: str) -> None:
+    """
+    Adds the gate classes of the plan and where its corrections went (the
+    gate's qubit, a spare qubit or the dummy, see `KeyUpdatePlan.emit`) to
+    the active tracer. Free when tracing is disabled.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    for name, n in plan.gate_counts().items():
+        tracer.count(f"update_key.{name}", n)
+    on_qubit = int(np.count_nonzero(corrections))
+    on_spare = 0
+    if correction == "recycle":
+        spares = plan.spare_qubits()
+        on_spare = sum(
+            1 for corrected, spare in zip(corrections, spares)
+            if not corrected and spare is not None
+        )
+    tracer.count("update_key.corrections.qubit", on_qubit)
+    tracer.count("update_key.corrections.spare", on_spare)
+    tracer.count("update_key.corrections.dummy", len(corrections) - on_qubit - on_spare)
 
-                if debug_mode:
-                    print(
-                        f"🔴 tdg Gate at {idx}. a={a}. Correction applied to {target_qubit_idx}\n\n"
-                    )
 
-            else:
-                if debug_mode:
-                    print(
-                        f"🟡 unverified gate encountered: {gate_name} theta={gate_theta}\n\n"
-                    )
-                continue
+def _bit_matrix(bitstrings: list[str]) -> np.ndarray:
+    """
+    Equal-length bitstrings as a (len, width) uint8 matrix of 0/1.
+    Spaces between registers are dropped.
+    """
+    data = "".join(bitstrings).replace(" ", "").encode()
+    bits = np.frombuffer(data, dtype=np.uint8) - ord("0")
+    return bits.reshape(len(bitstrings), -1)
+
 
-        if debug_mode:
-            print("names: ", names)
-        return new_qc
+def _aggregate(bits: np.ndarray, weights: np.ndarray | None = None) -> dict:
+    """
+    Counts of the distinct rows of a bit matrix, as {bitstring: count}.
+    """
+    width = bits.shape[1]
+    if width <= 62:
+        values = bits.astype(np.int64) @ (1 << np.arange(width - 1, -1, -1))
+        # a bincount allocates 2^width totals: only worth it for dense counts
+        if 1 << width <= 4 * len(bits):
+            totals = np.bincount(values, weights=weights)
+            outcomes = np.flatnonzero(totals)
+            totals = totals[outcomes]
+        else:
+            outcomes, inverse = np.unique(values, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights)
+        return {
+            format(v, f"0{width}b"): int(c)
+            for v, c in zip(outcomes.tolist(), totals.tolist())
+        }
+    # too wide for an integer: merge equal rows
+    rows, inverse = np.unique(bits, axis=0, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=weights)
+    return {
+        (row + ord("0")).tobytes().decode(): int(c)
+        for row, c in zip(rows.astype(np.uint8), totals.tolist())
+    }
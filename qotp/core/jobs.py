@@ -0,0 +1,130 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from qiskit import QuantumCircuit, transpile
+import multiprocessing
+import pickle
+import time
+import os
+
+from util import get_simulator
+from util.backends import BACKENDS, register_backend
+
+# backend of the worker process, built once by `_init_worker`
+_simulator = None
+
+
+def _init_worker(backend: str, factory) -> None:
+    """
+    Builds the worker's simulator and runs a 1-qubit circuit through
+    transpile and run, so that the first job does not pay for the imports
+    and caches of either.
+    `factory` is the parent's: spawned workers import a fresh registry,
+    without the backends registered at runtime.
+    """
+    global _simulator
+    register_backend(backend, factory)
+    # one worker per core: Aer must not spawn its own threads on top of it
+    _simulator = get_simulator(backend, max_parallel_threads=1)
+    warmup = QuantumCircuit(1, 1)
+    warmup.h(0)
+    warmup.measure(0, 0)
+    _simulator.run(transpile(warmup, _simulator), shots=1).result()
+
+
+def _run_job(circuit: QuantumCircuit, shots: int, submitted_at: float) -> dict:
+    started_at = time.time()
+    start = time.perf_counter()
+    tcirc = transpile(circuit, _simulator)
+    counts = _simulator.run(tcirc, shots=shots).result().get_counts(0)
+    return {
+        "counts": counts,
+        "queued_s": started_at - submitted_at,
+        "run_s": time.perf_counter() - start,
+        "worker": os.getpid(),
+    }
+
+
+class JobResult:
+    """
+    Outcome of a job run by a `JobPool`.
+
+    Attributes:
+        counts (dict): Measured (still encrypted) counts, ready for
+            `Client.decrypt`.
+        queued_s (float): Time between submission and the start of the job.
+        run_s (float): Transpilation and simulation time in the worker.
+        worker (int): Process id of the worker that ran the job.
+    """
+
+    def __init__(self, counts: dict, queued_s: float, run_s: float, worker: int):
+        self.counts = counts
+        self.queued_s = queued_s
+        self.run_s = run_s
+        self.worker = worker
+
+    def __repr__(self):
+        return (
+            f"JobResult(queued_s={self.queued_s:.4f}, run_s={self.run_s:.4f}, "
+            f"worker={self.worker}, counts={self.counts})"
+        )
+
+
+class JobPool:
+    """
+    Runs measured circuits on a pool of worker processes, each with its
+    own simulator built and warmed up once.
+    Only circuits are sent to the workers, never keys.
+
+    Args:
+        workers (int): Number of worker processes, one per core if None.
+        backend (str): Simulator of the workers, see `get_simulator`. A
+            backend added with `register_backend` needs a picklable factory,
+            i.e. a function defined at module level.
+    """
+
+    def __init__(self, workers: int | None = None, backend: str = "geneva"):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"unknown backend: {backend}, expected one of {list(BACKENDS)}"
+            )
+        factory = BACKENDS[backend]
+        try:
+            pickle.dumps(factory)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(
+                f"the factory of backend {backend} cannot be sent to the workers:"
+                " register a function defined at module level"
+            ) from e
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.backend = backend
+        # spawn: workers must not inherit the parent's OpenMP state
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend, factory),
+        )
+
+    def submit(self, circuit: QuantumCircuit, shots: int = 1024) -> Future:
+        """
+        Queues a circuit. Returns a future of its `JobResult`.
+        """
+        job = self._executor.submit(_run_job, circuit, shots, time.time())
+        result = Future()
+
+        def done(job: Future) -> None:
+            if job.exception() is not None:
+                result.set_exception(job.exception())
+            else:
+                result.set_result(JobResult(**job.result()))
+
+        job.add_done_callback(done)
+        return result
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
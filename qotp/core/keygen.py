@@ -0,0 +1,86 @@
+import numpy as np
+import os
+
+from .keys import KeyState
+
+
+class PadGenerator:
+    """
+    Draws QOTP pads in bulk from the operating system's CSPRNG
+    (`os.urandom`), as packed bits: one random byte gives the masks of
+    4 qubits.
+
+    A seeded, deterministic generator is only accepted with `test_mode=True`:
+    its pads are reproducible, hence not secret.
+    """
+
+    def __init__(self, seed: int | None = None, test_mode: bool = False):
+        if seed is not None and not test_mode:
+            raise ValueError("a seeded pad generator is only allowed in test mode")
+        self.test_mode = test_mode
+        self._rng = np.random.default_rng(seed) if test_mode else None
+
+    def random_bytes(self, size: int) -> bytes:
+        if self._rng is not None:
+            return self._rng.bytes(size)
+        return os.urandom(size)
+
+    def random_bits(self, size: int) -> np.ndarray:
+        """
+        `size` random bits, as a uint8 array of 0/1.
+        """
+        raw = np.frombuffer(self.random_bytes((size + 7) // 8), dtype=np.uint8)
+        return np.unpackbits(raw, count=size, bitorder="little")
+
+    def pad(self, num_qubits: int) -> KeyState:
+        bits = self.random_bits(2 * num_qubits)
+        return KeyState.from_arrays(bits[:num_qubits], bits[num_qubits:])
+
+    def pads(self, count: int, num_qubits: int) -> list[KeyState]:
+        """
+        `count` pads drawn at once.
+        """
+        bits = self.random_bits(2 * count * num_qubits).reshape(count, 2, num_qubits)
+        return [KeyState.from_arrays(x, z) for x, z in bits]
+
+
+class PadPool:
+    """
+    Pads of a fixed width, pre-generated `size` at a time for the
+    upcoming ciphertexts. A pad is handed out once: taking a pad removes it
+    from the pool, and an empty pool refills itself in one draw.
+    """
+
+    def __init__(
+        self, num_qubits: int, size: int = 1024, generator: PadGenerator | None = None
+    ):
+        self.num_qubits = num_qubits
+        self.size = size
+        self.generator = generator if generator is not None else PadGenerator()
+        self._bits = np.empty((0, 2, num_qubits), dtype=np.uint8)
+        self._next = 0
+
+    def refill(self) -> None:
+        bits = self.generator.random_bits(2 * self.size * self.num_qubits)
+        self._bits = bits.reshape(self.size, 2, self.num_qubits)
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._bits) - self._next
+
+    def pad(self, num_qubits: int | None = None) -> KeyState:
+        if num_qubits is not None and num_qubits != self.num_qubits:
+            raise ValueError(
+                f"pool of {self.num_qubits}-qubit pads, asked for {num_qubits} qubits"
+            )
+        if not len(self):
+            self.refill()
+        keys = KeyState.from_arrays(*self._bits[self._next])
+        # the pool does not keep a copy of the pads it handed out
+        self._bits[self._next] = 0
+        self._next += 1
+        return keys
+
+
+# shared by the clients that do not bring their own generator or pool
+default_generator = PadGenerator()
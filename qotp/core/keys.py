@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class KeyState:
+    """
+    QOTP pad of a register, stored as two bit arrays.
+    `x[i]` is the X-mask bit (a) and `z[i]` the Z-mask bit (b) of qubit i,
+    so qubit i is encrypted as X^a Z^b.
+
+    The update primitives mirror the conjugation rules of the gates
+    applied by the server and work in place in O(1).
+    """
+
+    __slots__ = ("x", "z")
+
+    def __init__(self, num_qubits: int = 0):
+        self.x = np.zeros(num_qubits, dtype=np.uint8)
+        self.z = np.zeros(num_qubits, dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, x, z) -> "KeyState":
+        if len(x) != len(z):
+            raise ValueError("x and z masks must have the same length")
+        keys = cls()
+        keys.x = np.array(x, dtype=np.uint8)
+        keys.z = np.array(z, dtype=np.uint8)
+        return keys
+
+    @classmethod
+    def from_dict(cls, keys: dict[int, tuple[int, int]]) -> "KeyState":
+        """
+        Builds a key state from the debug form {qubit: (a, b)}.
+        Missing qubits get the identity pad (0, 0).
+        """
+        state = cls(max(keys) + 1 if keys else 0)
+        for i, (a, b) in keys.items():
+            state.x[i] = a
+            state.z[i] = b
+        return state
+
+    def to_dict(self) -> dict[int, tuple[int, int]]:
+        """
+        Returns the debug form {qubit: (a, b)}.
+        """
+        return {i: (int(a), int(b)) for i, (a, b) in enumerate(zip(self.x, self.z))}
+
+    def copy(self) -> "KeyState":
+        return KeyState.from_arrays(self.x, self.z)
+
+    def assign(self, other: "KeyState", start: int, stop: int) -> None:
+        """
+        Copies the pads of qubits [start, stop) from another key state.
+        """
+        self.x[start:stop] = other.x[start:stop]
+        self.z[start:stop] = other.z[start:stop]
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, i: int) -> tuple[int, int]:
+        return int(self.x[i]), int(self.z[i])
+
+    def __setitem__(self, i: int, pad: tuple[int, int]) -> None:
+        self.x[i], self.z[i] = pad
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, KeyState):
+            return NotImplemented
+        return np.array_equal(self.x, other.x) and np.array_equal(self.z, other.z)
+
+    def __str__(self) -> str:
+        return str(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"KeyState({self.to_dict()})"
+
+    # -------------------- #
+    #
+    # UPDATE RULES
+    #
+    # -------------------- #
+
+    def h(self, i: int) -> None:
+        # H X H = Z and H Z H = X: the masks swap
+        self.x[i], self.z[i] = self.z[i], self.x[i]
+
+    def cx(self, control: int, target: int) -> None:
+        # X on the control spreads to the target, Z on the target to the control
+        self.x[target] ^= self.x[control]
+        self.z[control] ^= self.z[target]
+
+    def s(self, i: int) -> None:
+        # S X S_dg = Y (up to a phase): the X mask leaks into the Z mask
+        self.z[i] ^= self.x[i]
+
+    def t_correction(self, i: int) -> bool:
+        """
+        Updates the pad after a T/T_dg gate followed by its S/S_dg correction.
+        Returns True if the correction must hit qubit i, i.e. if its X mask is set.
+        """
+        a = self.x[i]
+        self.z[i] ^= a
+        return bool(a)
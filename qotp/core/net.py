@@ -0,0 +1,277 @@
+from qiskit import QuantumCircuit, qpy
+import argparse
+import asyncio
+import struct
+import json
+import io
+import itertools
+
+from .jobs import JobResult
+from .server import Server, job_circuit
+
+HEADER = struct.Struct(">IQ")
+SHOTS = struct.Struct(">I")
+
+
+def encode_request(circuit: QuantumCircuit, shots: int) -> bytes:
+    buffer = io.BytesIO()
+    qpy.dump(circuit, buffer)
+    return SHOTS.pack(shots) + buffer.getvalue()
+
+
+def decode_request(payload: bytes) -> tuple[QuantumCircuit, int]:
+    (shots,) = SHOTS.unpack_from(payload)
+    circuit = qpy.load(io.BytesIO(payload[SHOTS.size :]))[0]
+    return circuit, shots
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    length, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return request_id, await reader.readexactly(length)
+
+
+def write_frame(writer: asyncio.StreamWriter, request_id: int, payload: bytes) -> None:
+    writer.write(HEADER.pack(len(payload), request_id) + payload)
+
+
+class QOTPServer:
+    """
+    Serves a `Server` on a Unix socket (`path`) or a TCP socket
+    (`host`, `port`; port 0 picks a free one, see `port` once started).
+
+    Frames are a header (payload length, request id) and a payload:
+    - request: shots (4 bytes) and a QPY-serialized circuit,
+    - response: JSON with the encrypted counts and the job timings,
+      or an error.
+    Responses carry the id of their request, so a connection can pipeline
+    many requests and get their responses in completion order.
+    """
+
+    def __init__(
+        self,
+        server: Server,
+        path: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.server = server
+        self.path = path
+        self.host = host
+        self.port = port
+        self._listener = None
+
+    async def start(self) -> None:
+        if self.path is not None:
+            self._listener = await asyncio.start_unix_server(self._handle, self.path)
+        else:
+            self._listener = await asyncio.start_server(
+                self._handle, self.host, self.port
+            )
+            self.port = self._listener.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._listener is None:
+            await self.start()
+        async with self._listener:
+            await self._listener.serve_forever()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+            await self._listener.wait_closed()
+            self._listener = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        jobs = set()
+        try:
+            while True:
+                try:
+                    request_id, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                job = asyncio.create_task(self._run(request_id, payload, writer))
+                jobs.add(job)
+                job.add_done_callback(jobs.discard)
+            await asyncio.gather(*jobs)
+        finally:
+            writer.close()
+
+    async def _run(
+        self, request_id: int, payload: bytes, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            circuit, shots = decode_request(payload)
+            job = await asyncio.wrap_future(self.server.submit(circuit, shots))
+            response = {
+                "counts": job.counts,
+                "queued_s": job.queued_s,
+                "run_s": job.run_s,
+                "worker": job.worker,
+            }
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        if not writer.is_closing():
+            write_frame(writer, request_id, json.dumps(response).encode())
+            await writer.drain()
+
+
+class RemoteError(Exception):
+    """
+    A job failed on the server side.
+    """
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        # why the receiver stopped, raised by later sends
+        self.error = None
+        self.receiver = asyncio.create_task(self._receive())
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                request_id, payload = await read_frame(self.reader)
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    # unknown id, or a request the caller stopped waiting for
+                    continue
+                try:
+                    response = json.loads(payload)
+                    if "error" in response:
+                        future.set_exception(RemoteError(response["error"]))
+                    else:
+                        future.set_result(JobResult(**response))
+                except Exception as e:
+                    future.set_exception(
+                        RemoteError(f"bad response: {type(e).__name__}: {e}")
+                    )
+        except BaseException as e:
+            # end of stream, read error or close(): no response will come
+            self.error = ConnectionError(f"connection lost: {type(e).__name__}: {e}")
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(self.error)
+            self.pending.clear()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+    async def send(self, request_id: int, payload: bytes) -> asyncio.Future:
+        if self.error is not None:
+            raise self.error
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        write_frame(self.writer, request_id, payload)
+        await self.writer.drain()
+        return future
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+
+class QOTPClient:
+    """
+    Sends circuits to a `QOTPServer` over a pool of `connections`
+    persistent connections, used in turn. Requests are pipelined: `submit`
+    returns once the circuit is sent, with a future of its `JobResult`.
+
+    Only circuits are sent. Keep the `Client` (keys) in this process and
+    decrypt the returned counts locally.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        connections: int = 1,
+    ):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.num_connections = connections
+        self._connections = []
+        self._next = itertools.cycle(range(connections))
+        self._ids = itertools.count()
+
+    async def connect(self) -> "QOTPClient":
+        for _ in range(self.num_connections):
+            if self.path is not None:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            self._connections.append(_Connection(reader, writer))
+        return self
+
+    async def submit(
+        self, job: QuantumCircuit, shots: int = 1024
+    ) -> asyncio.Future:
+        """
+        Sends a measured circuit, never keys (a `Ciphertext` is rejected,
+        see `job_circuit`). Returns a future of its `JobResult`.
+        """
+        if not self._connections:
+            await self.connect()
+        circuit = job_circuit(job)
+        connection = self._connections[next(self._next)]
+        return await connection.send(next(self._ids), encode_request(circuit, shots))
+
+    async def run(self, job: QuantumCircuit, shots: int = 1024) -> JobResult:
+        """
+        Sends a circuit and waits for its result.
+        """
+        return await (await self.submit(job, shots))
+
+    async def close(self) -> None:
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a QOTP adder server.")
+    parser.add_argument("--unix", help="Unix socket path (TCP if not given)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--n-bits", type=int, default=2)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--backend", default="geneva", choices=["geneva", "aer"])
+    args = parser.parse_args()
+
+    from util import draper_adder, to_standard
+
+    sv = Server(
+        to_standard(draper_adder(args.n_bits)),
+        workers=args.workers,
+        backend=args.backend,
+    )
+    listener = QOTPServer(sv, path=args.unix, host=args.host, port=args.port)
+
+    async def serve():
+        await listener.start()
+        where = args.unix or f"{args.host}:{listener.port}"
+        print(f"Serving the {args.n_bits}-bit adder on {where}")
+        await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sv.close()
+
+
+if __name__ == "__main__":
+    main()
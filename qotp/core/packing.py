@@ -0,0 +1,90 @@
+from qiskit import ClassicalRegister, QuantumCircuit
+
+
+class PackedCircuit:
+    """
+    Independent circuits side by side on one wider circuit, each on its own
+    qubits and classical registers, so that a single run serves all of them.
+
+    Args:
+        circuits (list[QuantumCircuit]): Measured circuits, in order.
+        indices (list[int]): Position of each circuit in the list given to
+            `pack`, `range(len(circuits))` if None.
+    """
+
+    def __init__(self, circuits: list[QuantumCircuit], indices: list[int] | None = None):
+        self.circuits = list(circuits)
+        self.indices = list(range(len(self.circuits)) if indices is None else indices)
+        self.circuit = QuantumCircuit(sum(c.num_qubits for c in self.circuits))
+        self.circuit.name = f"packed {len(self.circuits)}"
+        # (first clbit, number of clbits, register sizes) of each circuit
+        self.slots = []
+        first_qubit = 0
+        for j, circuit in enumerate(self.circuits):
+            first_clbit = self.circuit.num_clbits
+            sizes = _register_sizes(circuit)
+            for i, size in enumerate(sizes):
+                self.circuit.add_register(ClassicalRegister(size, f"job{j}_{i}"))
+            self.circuit.compose(
+                circuit,
+                qubits=range(first_qubit, first_qubit + circuit.num_qubits),
+                clbits=range(first_clbit, first_clbit + circuit.num_clbits),
+                inplace=True,
+            )
+            self.slots.append((first_clbit, circuit.num_clbits, sizes))
+            first_qubit += circuit.num_qubits
+
+    def split(self, counts: dict) -> list[dict]:
+        """
+        Counts of each circuit, in order, from the counts of the packed
+        circuit. Bitstrings are formatted as if each circuit ran alone.
+        """
+        results = [{} for _ in self.slots]
+        for outcome, n in counts.items():
+            bits = outcome.replace(" ", "")
+            total = len(bits)
+            for (start, width, sizes), result in zip(self.slots, results):
+                key = _join(bits[total - start - width : total - start], sizes)
+                result[key] = result.get(key, 0) + n
+        return results
+
+
+def pack(circuits: list[QuantumCircuit], max_width: int) -> list[PackedCircuit]:
+    """
+    Packs circuits in order, first fit, into packed circuits of at most
+    `max_width` qubits. A circuit wider than that gets one on its own.
+    A later circuit can fill an earlier packed circuit: `indices` tells
+    where each of its circuits was in `circuits`.
+    """
+    bins = []
+    widths = []
+    for i, circuit in enumerate(circuits):
+        for b, width in enumerate(widths):
+            if width + circuit.num_qubits <= max_width:
+                bins[b].append(i)
+                widths[b] += circuit.num_qubits
+                break
+        else:
+            bins.append([i])
+            widths.append(circuit.num_qubits)
+    return [PackedCircuit([circuits[i] for i in b], b) for b in bins]
+
+
+def _register_sizes(circuit: QuantumCircuit) -> list[int]:
+    # clbits outside of registers, or out of register order, share one register
+    in_registers = [bit for register in circuit.cregs for bit in register]
+    if in_registers != list(circuit.clbits):
+        return [circuit.num_clbits] if circuit.num_clbits else []
+    return [len(register) for register in circuit.cregs if len(register)]
+
+
+def _join(bits: str, sizes: list[int]) -> str:
+    # counts list the registers last to first, separated by spaces
+    if len(sizes) < 2:
+        return bits
+    parts = []
+    end = len(bits)
+    for size in sizes:
+        parts.append(bits[end - size : end])
+        end -= size
+    return " ".join(reversed(parts))
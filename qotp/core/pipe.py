@@ -1,55 +1,58 @@
-from qiskit.visualization import plot_histogram
 from qiskit import ClassicalRegister, QuantumCircuit
-from rich.traceback import install
-from copy import deepcopy
-import os
 
-from util import two_qubit_adder, to_standard, get_result_geneva
+from util import (
+    draper_adder,
+    to_standard,
+    get_result_geneva,
+    get_results_geneva,
+    get_result_exact,
+    span,
+)
 
+from .artifacts import ArtifactSink, get_sink
+from .ciphertext import Ciphertext
 from .client import Client
+from .keys import KeyState
 from .server import Server
+from .template import EncryptedTemplate
 
-install()
 
+def encrypt_inputs(
+    cl: Client, sv: Server, a: int, b: int
+) -> tuple[Ciphertext, Ciphertext]:
+    """
+    Encrypts a and b, each on half of the server qubits, b after a.
+    """
+    width = sv.get_num_qubits() // 2
+    cipher_x = cl.encrypt(a, sv, width=width)
+    offset = cipher_x.circuit.num_qubits
+    cipher_y = cl.encrypt(b, sv, offset, width=width)
+    return cipher_x, cipher_y
 
-def adder_pipe(a: int, b: int, debug_mode: bool = False):
-    if not os.path.exists("./images"):
-        os.makedirs("./images")
-    # create server with two_qubit_adder, and client
-    sv = Server(two_qubit_adder())
-    cl = Client()
-
-    # convert and store server circuit to standard
-    filename = "./images/original_circuit.png"
-    sv.circuit.draw("mpl", filename=filename, fold=-1)
-    print(f"Circuit saved at {filename}")
-
-    sv.circuit = to_standard(sv.circuit)
-
-    filename = "./images/standardized_circuit.png"
-    sv.circuit.draw("mpl", filename=filename, fold=-1)
-    print(f"Circuit saved at {filename}")
 
-    # encrypt x and y
-    cipher_x = cl.encrypt(a, sv)
+def merge_keys(cipher_x: Ciphertext, cipher_y: Ciphertext) -> KeyState:
+    """
+    Keys of both inputs in one key state, the keys of y after those of x.
+    """
     offset = cipher_x.circuit.num_qubits
-    cipher_y = cl.encrypt(b, sv, offset)
-
-    # merge keys using the offset
-    merged_keys = {}
-    for i in range(cipher_x.circuit.num_qubits):
-        merged_keys[i] = cipher_x.keys[i]
-    for i in range(cipher_y.circuit.num_qubits):
-        merged_keys[i + offset] = cipher_y.keys[i + offset]
+    merged_keys = KeyState(offset + cipher_y.circuit.num_qubits)
+    merged_keys.assign(cipher_x.keys, 0, offset)
+    merged_keys.assign(cipher_y.keys, offset, offset + cipher_y.circuit.num_qubits)
+    return merged_keys
 
-    # update client's keys
-    cl.keys = deepcopy(merged_keys)
 
+def assemble_circuit(
+    sv: Server, cipher_x: Ciphertext, cipher_y: Ciphertext, dummy: bool = True
+) -> tuple[QuantumCircuit, ClassicalRegister]:
+    """
+    Circuit holding the encrypted inputs, the registers of the server
+    circuit, a dummy ancilla right after the inputs (unless `dummy` is
+    False) and the measurement register of y.
+    """
     # add encrypted x,y states and the classical registers to the server circuit
     total_qubits = cipher_x.circuit.num_qubits + cipher_y.circuit.num_qubits
 
-    final_circuit = QuantumCircuit(total_qubits + 1)  # +1 for dummy ancilla
-    dummy_idx = total_qubits
+    final_circuit = QuantumCircuit(total_qubits + dummy)  # +1 for dummy ancilla
 
     custom_gate = cipher_y.circuit ^ cipher_x.circuit
     # NOTE: is this necessary?
@@ -81,19 +84,54 @@ def adder_pipe(a: int, b: int, debug_mode: bool = False):
     # creating and adding the measurement register to the final circuit
     meas_reg = ClassicalRegister(cipher_y.circuit.num_qubits, "meas")
     final_circuit.add_register(meas_reg)
+    return final_circuit, meas_reg
 
-    final_circuit.compose(
-        sv.circuit,
-        qubits=[k for k in range(total_qubits)],  # ancilla qubit omitted
-        inplace=True,
-    )
+
+def encrypted_adder_circuit(
+    cl: Client,
+    sv: Server,
+    a: int,
+    b: int,
+    debug_mode: bool = False,
+    correction: str = "dummy",
+) -> tuple[QuantumCircuit, int]:
+    """
+    Encrypts a and b for the server circuit of `sv` and returns the corrected
+    circuit, measured on the register of b, with the offset of that register.
+    Each input gets half of the server qubits.
+    The client's keys are left updated for decryption.
+    With the "recycle" correction strategy, the dummy ancilla is only added
+    if the circuit has no spare qubit for some correction (see `update_key`).
+    """
+    # encrypt x and y
+    with span("encrypt"):
+        cipher_x, cipher_y = encrypt_inputs(cl, sv, a, b)
+    offset = cipher_x.circuit.num_qubits
+
+    # merge keys using the offset
+    with span("merge_keys"):
+        merged_keys = merge_keys(cipher_x, cipher_y)
+
+    # update client's keys
+    cl.keys = merged_keys.copy()
+
+    dummy = sv.get_plan().needs_dummy(correction)
+    with span("assemble"):
+        final_circuit, meas_reg = assemble_circuit(sv, cipher_x, cipher_y, dummy)
+    dummy_idx = offset + cipher_y.circuit.num_qubits if dummy else None
 
     if debug_mode:
         print(f"\nBefore update: {merged_keys}")
 
-    # update keys routine according to the circuit in the server
+    # update keys routine according to the circuit in the server,
+    # the corrected server circuit is appended after the input gate
     corrected_circuit = cl.update_key(
-        server_qc=final_circuit, dummy_qubit_idx=dummy_idx, debug_mode=debug_mode
+        server_qc=sv.circuit,
+        dummy_qubit_idx=dummy_idx,  # ancilla qubit omitted by the server circuit
+        debug_mode=debug_mode,
+        plan=sv.get_plan(),
+        target=final_circuit,
+        correction=correction,
     )
 
     if debug_mode:
@@ -104,20 +142,154 @@ def adder_pipe(a: int, b: int, debug_mode: bool = False):
         [k for k in range(offset, cipher_y.circuit.num_qubits + offset)], meas_reg
     )
 
-    filename = "./images/final_circuit.png"
-    corrected_circuit.draw("mpl", filename=filename, fold=-1)
-    print(f"Circuit saved at {filename}")
+    return corrected_circuit, offset
+
+
+def adder_pipe(
+    a: int,
+    b: int,
+    debug_mode: bool = False,
+    sink: ArtifactSink | str = "background",
+    n_bits: int = 2,
+    correction: str = "dummy",
+):
+    """
+    Computes (a + b) mod 2^n_bits on encrypted inputs.
+
+    Circuits and the histogram go to an artifact sink ("none", "deferred",
+    "background" or an `ArtifactSink`) instead of being drawn inline.
+    `correction` is the correction strategy of `Client.update_key`.
+    """
+    if isinstance(sink, str):
+        sink = get_sink(sink)
+    # create server with an n-bit adder, and client
+    sv = Server(draper_adder(n_bits))
+    cl = Client()
+
+    # convert and store server circuit to standard
+    sink.circuit("original_circuit", sv.circuit)
+
+    with span("to_standard"):
+        sv.circuit = to_standard(sv.circuit)
+
+    sink.circuit("standardized_circuit", sv.circuit)
+
+    corrected_circuit, offset = encrypted_adder_circuit(
+        cl, sv, a, b, debug_mode, correction
+    )
+
+    sink.circuit("final_circuit", corrected_circuit)
 
     # fetch and decrypt measured result(s)
-    result_counts = get_result_geneva(corrected_circuit)
-    decrypted_counts = {}
+    with span("simulate"):
+        result_counts = get_result_geneva(corrected_circuit)
     if debug_mode:
         print("counts:", result_counts)
-    for bitstring, count in result_counts.items():
-        decrypted_key = cl.decrypt(bitstring, offset=offset)
-        decrypted_counts[decrypted_key] = count
-    fig = plot_histogram(decrypted_counts)
-    filename = "./images/histogram.png"
-    fig.savefig(filename)
-    print(f"Histogram saved at {filename}")
+    with span("decrypt"):
+        decrypted_counts = cl.decrypt_counts(result_counts, offset)
+    sink.histogram("histogram", decrypted_counts)
     return decrypted_counts
+
+
+def adder_probabilities(
+    a: int, b: int, n_bits: int = 2, backend: str = "aer", correction: str = "dummy"
+):
+    """
+    Exact decrypted distribution of (a + b) mod 2^n_bits, without shot noise:
+    probabilities[v] is the probability of reading v (see `get_result_exact`).
+    """
+    sv = Server(to_standard(draper_adder(n_bits)))
+    cl = Client()
+    corrected_circuit, offset = encrypted_adder_circuit(
+        cl, sv, a, b, correction=correction
+    )
+    with span("simulate"):
+        probabilities = get_result_exact(corrected_circuit, backend=backend)
+    with span("decrypt"):
+        return cl.decrypt_probabilities(probabilities, offset)
+
+
+def adder_pipe_batch(
+    pairs: list[tuple[int, int]],
+    debug_mode: bool = False,
+    shots: int = 1024,
+    n_bits: int = 2,
+    correction: str = "dummy",
+) -> list[dict]:
+    """
+    Runs `adder_pipe` over many (a, b) pairs.
+    The server circuit is standardized and its key update plan compiled once,
+    every encrypted circuit is built with its own client and keys, and all of
+    them are submitted as a single multi-experiment job. Nothing is drawn.
+
+    Returns the decrypted counts of each pair, in the order of `pairs`.
+    """
+    with span("to_standard"):
+        sv = Server(to_standard(draper_adder(n_bits)))
+    clients = []
+    circuits = []
+    offsets = []
+    for a, b in pairs:
+        cl = Client()
+        corrected_circuit, offset = encrypted_adder_circuit(
+            cl, sv, a, b, debug_mode, correction
+        )
+        clients.append(cl)
+        circuits.append(corrected_circuit)
+        offsets.append(offset)
+
+    with span("simulate", circuits=len(circuits)):
+        results = get_results_geneva(circuits, shots=shots)
+    if debug_mode:
+        print("counts:", results)
+    with span("decrypt", circuits=len(circuits)):
+        return [
+            cl.decrypt_counts(result_counts, offset)
+            for cl, result_counts, offset in zip(clients, results, offsets)
+        ]
+
+
+_adder_templates = {}
+
+
+def adder_template(n_bits: int = 2) -> EncryptedTemplate:
+    """
+    Returns the transpiled template of the encrypted n-bit adder,
+    built on first use.
+    """
+    if n_bits not in _adder_templates:
+        sv = Server(to_standard(draper_adder(n_bits)))
+        _adder_templates[n_bits] = EncryptedTemplate(
+            sv, input_widths=[n_bits, n_bits], measured=1
+        )
+    return _adder_templates[n_bits]
+
+
+def adder_pipe_template(
+    pairs: list[tuple[int, int]],
+    shots: int = 1024,
+    template: EncryptedTemplate | None = None,
+    n_bits: int = 2,
+) -> list[dict]:
+    """
+    Same as `adder_pipe_batch`, but binds every pair and its fresh pad into
+    an already transpiled template instead of building, transpiling and
+    running one circuit per pair.
+    """
+    if template is None:
+        template = adder_template(n_bits)
+    clients = []
+    bindings = []
+    for a, b in pairs:
+        cl = Client()
+        pad = cl.new_pad(template.num_inputs)
+        cl.keys = pad.copy()
+        corrections = template.plan.apply(cl.keys)
+        clients.append(cl)
+        bindings.append(template.bindings([a, b], pad, corrections))
+
+    results = template.run(bindings, shots=shots)
+    return [
+        cl.decrypt_counts(result_counts, template.measured_offset)
+        for cl, result_counts in zip(clients, results)
+    ]
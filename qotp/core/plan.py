@@ -0,0 +1,633 @@
+from qiskit import QuantumCircuit
+from qiskit.circuit import CircuitInstruction
+from bisect import bisect_left, bisect_right
+from itertools import islice
+import numbers
+from qiskit.circuit.library import PhaseGate, SdgGate, SGate
+from qiskit.quantum_info import Operator
+import numpy as np
+
+from util import clifford_rule
+
+from .keys import KeyState
+
+# key update rules of the gates without parameters:
+# ("h",), ("cx",), ("s",), ("pauli",), or
+# ("t", correction gate, correction angle, flips z) for non-Clifford gates.
+# Other Clifford gates get a rule derived from their matrix:
+# ("clifford", ((output column, input columns), ...)), see `derived_rule`
+NAMED_RULES = {
+    "h": ("h",),
+    "cx": ("cx",),
+    "s": ("s",),
+    "sdg": ("s",),  # S_dg = S Z: same rule as S
+    "x": ("pauli",),
+    "y": ("pauli",),
+    "z": ("pauli",),
+    "id": ("pauli",),
+    "t": ("t", "s", np.pi / 2, True),
+    "tdg": ("t", "sdg", -np.pi / 2, True),
+}
+UNVERIFIED = ("unverified",)
+
+CORRECTIONS = {
+    "s": lambda angle: SGate(),
+    "sdg": lambda angle: SdgGate(),
+    "p": PhaseGate,
+}
+
+# where the correction of a non-Clifford gate goes when its X mask is 0:
+# "dummy": an extra ancilla in |0>,
+# "recycle": a qubit of the circuit holding a classical bit at that point,
+# the dummy only if there is none (see `KeyUpdatePlan.spare_qubits`)
+CORRECTION_STRATEGIES = ("dummy", "recycle")
+
+# gates that keep every computational basis state a basis state (up to a
+# phase), so that qubits holding a classical bit keep holding one
+DIAGONAL_GATES = {
+    "id", "z", "s", "sdg", "t", "tdg", "p", "u1", "rz",
+    "cz", "cp", "cu1", "crz", "cs", "csdg", "ccz", "mcphase", "rzz", "barrier",
+}
+BIT_FLIP_GATES = {"x", "y"}
+# controlled flips of their last qubit
+CONTROLLED_FLIP_GATES = {"cx", "cy", "ccx", "mcx"}
+
+# rules of parameterized gates, by (name, rounded parameters)
+_rules = {}
+# the same rules, by exact parameters, to skip the rounding
+_exact_rules = {}
+
+
+def gate_rule(name: str, params: list) -> tuple:
+    """
+    Returns the key update rule of a gate (see NAMED_RULES).
+    Rules of parameterized gates are derived once per (name, parameters).
+    """
+    if not params:
+        return NAMED_RULES.get(name, UNVERIFIED)
+    # only plain numbers are hashed, not e.g. the matrix of a UnitaryGate
+    plain = all(isinstance(p, numbers.Real) for p in params)
+    if plain:
+        rule = _exact_rules.get((name, *params))
+        if rule is not None:
+            return rule
+    try:
+        key = (name, tuple(round(float(p), 10) for p in params))
+    except (TypeError, ValueError):
+        # unbound parameters, or parameters that are not numbers
+        return UNVERIFIED
+    rule = _rules.get(key)
+    if rule is None:
+        rule = _rules[key] = _phase_rule(*key)
+    if plain:
+        _exact_rules[(name, *params)] = rule
+    return rule
+
+
+# largest gate whose rule is derived from its matrix
+MAX_DERIVED_QUBITS = 4
+# derived rules of standard gates, by (name, parameters)
+_derived_rules = {}
+
+
+def derived_rule(instruction: CircuitInstruction) -> tuple:
+    """
+    Returns the key update rule of a Clifford gate without a named rule,
+    derived from its matrix (see `clifford_rule`), or UNVERIFIED.
+    Rules of standard gates are derived once per (name, parameters); other
+    gates (e.g. custom gates sharing a name) are derived every time.
+    """
+    if instruction.is_directive() or instruction.clbits:
+        return UNVERIFIED
+    if not instruction.is_standard_gate():
+        return _derive(instruction)
+    key = (instruction.name, *instruction.params)
+    rule = _derived_rules.get(key)
+    if rule is None:
+        rule = _derived_rules[key] = _derive(instruction)
+    return rule
+
+
+def _derive(instruction: CircuitInstruction) -> tuple:
+    if (
+        len(instruction.qubits) > MAX_DERIVED_QUBITS
+        or instruction.is_parameterized()
+    ):
+        return UNVERIFIED
+    u = instruction.matrix
+    if u is None:
+        try:
+            u = Operator(instruction.operation).data
+        except Exception:
+            # no unitary, e.g. reset or a gate without definition
+            return UNVERIFIED
+    m = clifford_rule(u)
+    if m is None:
+        return UNVERIFIED
+    changed = tuple(
+        (out, tuple(np.flatnonzero(row).tolist()))
+        for out, row in enumerate(m)
+        if np.flatnonzero(row).tolist() != [out]
+    )
+    return ("clifford", changed)
+
+
+def _phase_rule(name: str, params: tuple) -> tuple:
+    if name != "p":
+        return UNVERIFIED
+    theta = params[0]
+    if np.isclose(theta, np.pi / 2) or np.isclose(theta, -np.pi / 2):
+        return ("s",)
+    if np.isclose(theta, np.pi / 4):
+        return NAMED_RULES["t"]
+    if np.isclose(theta, -np.pi / 4):
+        return NAMED_RULES["tdg"]
+    if np.isclose(np.sin(theta), 0):
+        # identity or Z
+        return ("pauli",)
+    return ("t", "p", -2 * theta, False)
+
+
+class KeyUpdatePlan:
+    """
+    Precompiled key update of a server circuit.
+
+    Over GF(2), the key update of a Clifford run is a fixed linear map of
+    the (x, z) masks of the qubits it touches. Each maximal Clifford run
+    between two non-Clifford gates is compiled once into the rows of its
+    binary matrix, so updating a fresh pad costs one parity per changed
+    mask and run, and a batch of pads one matrix-matrix product per run.
+
+    Non-Clifford gates are phase gates and get a correction that depends
+    on the X mask of their qubit:
+    - T/T_dg: an S/S_dg, then the Z mask flips,
+    - any other P(theta): P(theta) X = X P(-theta) up to a global phase,
+      which a P(-2 theta) right after the gate fixes. The masks are unchanged.
+    The correction hits the gate's qubit if its X mask is set, otherwise a
+    qubit where it is only a global phase: a dummy qubit in |0>, or with
+    the "recycle" strategy a qubit of the circuit that holds a classical
+    bit at that point (see `spare_qubits`).
+
+    The plan only depends on the circuit, it can be shared by every client
+    of a server. It follows a growing circuit: `extend` compiles the
+    instructions appended since the last compilation into new steps and
+    leaves the others as they are, `invalidate` drops the steps of an
+    edited suffix (see `KeyCheckpoints`).
+    """
+
+    def __init__(self, circuit: QuantumCircuit):
+        self.circuit = circuit
+        self.num_qubits = circuit.num_qubits
+        # ("clifford", ~mask of the changed rows, ((row bit, row), ...))
+        # or ("t", qubit index, flips z)
+        self.steps = []
+        # number of instructions covered by the steps up to each one
+        self.ends = []
+        # instruction position -> index of its correction in `corrections`
+        self.t_positions = {}
+        # the same positions, in order
+        self._t_order = []
+        # (qubit index, correction gate, correction angle) of every
+        # non-Clifford gate, in order
+        self.t_gates = []
+        self.unverified = []
+        self._instructions = []
+        # dense steps of `apply_batch`, built on first use
+        self._matrices = None
+        # spare qubit of each non-Clifford gate, built on first use, with
+        # the number of instructions seen and the qubits holding a classical bit
+        self._spares = None
+        self._spares_state = (0, (1 << self.num_qubits) - 1)
+        # emit layouts, by target bits, dummy qubit and strategy
+        self._layouts = {}
+        self._compile(0)
+
+    @property
+    def t_count(self) -> int:
+        return len(self.t_gates)
+
+    @property
+    def num_instructions(self) -> int:
+        """
+        Number of instructions of the circuit compiled so far.
+        """
+        return len(self._instructions)
+
+    def emitted_size(self, position: int) -> int:
+        """
+        Number of instructions that `emit` writes for the instructions
+        before `position`: the instructions and their corrections.
+        """
+        return position + bisect_left(self._t_order, position)
+
+    def gate_counts(self) -> dict[str, int]:
+        """
+        Number of gates of each class: clifford (including Paulis), t, tdg,
+        rotation (other non-Clifford phases) and unverified.
+        """
+        corrections = [gate for _, gate, _ in self.t_gates]
+        return {
+            "clifford": len(self._instructions) - self.t_count - len(self.unverified),
+            "t": corrections.count("s"),
+            "tdg": corrections.count("sdg"),
+            "rotation": corrections.count("p"),
+            "unverified": len(self.unverified),
+        }
+
+    def spare_qubits(self) -> list[int | None]:
+        """
+        For every non-Clifford gate, a qubit other than the gate's own that
+        holds a classical bit right after it, or None if there is none.
+
+        A phase correction on such a qubit multiplies every amplitude by the
+        same phase, so it can take the place of the dummy qubit. This
+        assumes the circuit starts from a computational basis state, as the
+        inputs prepared by `Client.encrypt`: a qubit keeps a classical bit
+        through diagonal gates and bit flips, and as the target of a
+        controlled flip whose controls hold classical bits.
+        """
+        if self._spares is None:
+            self._spares = []
+            self._spares_state = (0, (1 << self.num_qubits) - 1)
+        start, classical = self._spares_state
+        if start == len(self._instructions):
+            return self._spares
+        qubit_index = {q: i for i, q in enumerate(self.circuit.qubits)}
+        spares = self._spares
+        for position in range(start, len(self._instructions)):
+            instruction = self._instructions[position]
+            if classical:
+                name = instruction.name
+                qubits = [qubit_index[q] for q in instruction.qubits]
+                if name in DIAGONAL_GATES or name in BIT_FLIP_GATES:
+                    pass
+                elif name in CONTROLLED_FLIP_GATES:
+                    if any(not classical >> c & 1 for c in qubits[:-1]):
+                        classical &= ~(1 << qubits[-1])
+                elif name == "swap":
+                    a, b = qubits
+                    if (classical >> a ^ classical >> b) & 1:
+                        classical ^= (1 << a) | (1 << b)
+                else:
+                    for q in qubits:
+                        classical &= ~(1 << q)
+            if position in self.t_positions:
+                others = classical & ~(1 << self.t_gates[len(spares)][0])
+                spares.append(
+                    (others & -others).bit_length() - 1 if others else None
+                )
+        self._spares_state = (len(self._instructions), classical)
+        return spares
+
+    def needs_dummy(self, correction: str = "dummy") -> bool:
+        """
+        Whether emitting with this correction strategy needs a dummy qubit.
+        """
+        if correction not in CORRECTION_STRATEGIES:
+            raise ValueError(
+                f"unknown correction strategy: {correction},"
+                f" expected one of {list(CORRECTION_STRATEGIES)}"
+            )
+        if correction == "dummy":
+            return self.t_count > 0
+        return None in self.spare_qubits()
+
+    def extend(self) -> int:
+        """
+        Compiles the instructions appended to the circuit since the last
+        compilation. The steps of the previous instructions are kept as
+        they are, so checkpoints taken on them stay valid.
+        Returns the number of new instructions.
+        """
+        start = len(self._instructions)
+        if len(self.circuit.data) == start:
+            return 0
+        if self.circuit.num_qubits != self.num_qubits:
+            raise ValueError(
+                "qubits were added to the circuit, compile a new plan instead"
+            )
+        self._compile(start)
+        return len(self._instructions) - start
+
+    def invalidate(self, position: int) -> None:
+        """
+        Forgets the instructions from `position` on, after that suffix of
+        the circuit was edited in place. Steps covering earlier instructions
+        only are kept; the next `extend` compiles the rest again.
+        """
+        kept = bisect_right(self.ends, position)
+        start = self.ends[kept - 1] if kept else 0
+        del self.steps[kept:]
+        del self.ends[kept:]
+        del self._instructions[start:]
+        self.t_positions = {p: t for p, t in self.t_positions.items() if p < start}
+        del self._t_order[len(self.t_positions) :]
+        del self.t_gates[len(self.t_positions) :]
+        self.unverified = [gate for gate in self.unverified if gate[0] < start]
+        if self._matrices is not None:
+            del self._matrices[kept:]
+        self._spares = None
+        self._layouts.clear()
+
+    def _compile(self, start: int) -> None:
+        """
+        Single pass over the circuit from instruction `start`: each gate is
+        classified through the cached rule table, and Clifford runs are
+        accumulated as rows of their binary matrix, stored as Python ints
+        over the columns x_0..x_{n-1}, z_0..z_{n-1}.
+        """
+        n = self.num_qubits
+        qubit_index = {q: i for i, q in enumerate(self.circuit.qubits)}
+        rows = {}
+        data = self.circuit.data
+        for position in range(start, len(data)):
+            instruction = data[position]
+            self._instructions.append(instruction)
+            params = instruction.params
+            if params:
+                rule = gate_rule(instruction.name, params)
+            else:
+                rule = NAMED_RULES.get(instruction.name, UNVERIFIED)
+            if rule is UNVERIFIED:
+                rule = derived_rule(instruction)
+            kind = rule[0]
+
+            if kind == "h":
+                q = qubit_index[instruction.qubits[0]]
+                rows[q], rows[n + q] = (
+                    rows.get(n + q, 1 << (n + q)),
+                    rows.get(q, 1 << q),
+                )
+            elif kind == "cx":
+                c, t = (qubit_index[q] for q in instruction.qubits)
+                rows[t] = rows.get(t, 1 << t) ^ rows.get(c, 1 << c)
+                rows[n + c] = rows.get(n + c, 1 << (n + c)) ^ rows.get(
+                    n + t, 1 << (n + t)
+                )
+            elif kind == "s":
+                q = qubit_index[instruction.qubits[0]]
+                rows[n + q] = rows.get(n + q, 1 << (n + q)) ^ rows.get(q, 1 << q)
+            elif kind == "clifford":
+                columns = [qubit_index[q] for q in instruction.qubits]
+                columns += [n + c for c in columns]
+                before = [rows.get(c, 1 << c) for c in columns]
+                for out, ins in rule[1]:
+                    row = 0
+                    for i in ins:
+                        row ^= before[i]
+                    rows[columns[out]] = row
+            elif kind == "pauli":
+                # Paulis commute with the pad up to a global phase
+                continue
+            elif kind == "t":
+                self._close_segment(rows, position)
+                rows = {}
+                q = qubit_index[instruction.qubits[0]]
+                _, gate, angle, flips_z = rule
+                self.t_positions[position] = len(self.t_gates)
+                self._t_order.append(position)
+                self.t_gates.append((q, gate, angle))
+                self.steps.append(("t", q, flips_z))
+                self.ends.append(position + 1)
+            else:
+                self.unverified.append(
+                    (position, instruction.name, params[0] if params else 0)
+                )
+        self._close_segment(rows, len(self._instructions))
+
+    def _close_segment(self, rows: dict, end: int) -> None:
+        """
+        Stores a Clifford run ending before instruction `end` as the rows it
+        changes, with the mask of their columns. Rows equal to their own
+        column (untouched) are dropped.
+        """
+        changed = tuple((1 << r, row) for r, row in rows.items() if row != 1 << r)
+        if not changed:
+            return
+        mask = 0
+        for bit, _ in changed:
+            mask |= bit
+        self.steps.append(("clifford", ~mask, changed))
+        self.ends.append(end)
+
+    def _matrix(self, step: tuple) -> tuple:
+        """
+        Dense form of a Clifford step, acting on v = [x[support], z[support]].
+        """
+        n = self.num_qubits
+        rows = {bit.bit_length() - 1: row for bit, row in step[2]}
+        touched = 0
+        for row in rows.values():
+            touched |= row
+        for r in rows:
+            touched |= 1 << r
+        support = sorted(
+            {c if c < n else c - n for c in range(2 * n) if touched >> c & 1}
+        )
+        columns = support + [n + q for q in support]
+        # unpack the selected rows to bits, then keep the selected columns
+        width = (2 * n + 7) // 8
+        packed = b"".join(
+            rows.get(r, 1 << r).to_bytes(width, "little") for r in columns
+        )
+        bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), bitorder="little")
+        m = bits.reshape(len(columns), 8 * width)[:, columns]
+        # float32 products are exact here and go through BLAS
+        return ("clifford", np.array(support), m.astype(np.float32))
+
+    def apply(self, keys: KeyState) -> np.ndarray:
+        """
+        Updates a key state in place.
+        Returns, for every non-Clifford gate, whether its correction hits
+        the gate's qubit (True) or the dummy qubit (False).
+        """
+        corrections = []
+        v = self.run(self.pack(keys), 0, len(self.steps), corrections)
+        self.unpack(v, keys)
+        return np.array(corrections, dtype=bool)
+
+    def pack(self, keys: KeyState) -> int:
+        """
+        Packs the masks of a key state into one integer v: bit i is x_i and
+        bit n + i is z_i, so that a Clifford row is the parity of `row & v`.
+        Qubits without a key (e.g. the dummy) have zero masks.
+        """
+        return int.from_bytes(
+            np.packbits(keys.x, bitorder="little").tobytes(), "little"
+        ) | (
+            int.from_bytes(np.packbits(keys.z, bitorder="little").tobytes(), "little")
+            << self.num_qubits
+        )
+
+    def unpack(self, v: int, keys: KeyState) -> None:
+        """
+        Writes the masks packed in v back to a key state, in place.
+        """
+        n = self.num_qubits
+        k = len(keys)
+        bits = np.unpackbits(
+            np.frombuffer(v.to_bytes((2 * n + 7) // 8, "little"), dtype=np.uint8),
+            count=2 * n,
+            bitorder="little",
+        )
+        keys.x[:] = bits[:k]
+        keys.z[:] = bits[n : n + k]
+
+    def run(self, v: int, start: int, stop: int, corrections: list) -> int:
+        """
+        Runs the steps [start, stop) on packed masks (see `pack`).
+        Appends the correction of every non-Clifford gate to `corrections`
+        and returns the new masks.
+        """
+        n = self.num_qubits
+        for step in self.steps[start:stop]:
+            if step[0] == "clifford":
+                new = 0
+                for bit, row in step[2]:
+                    if (row & v).bit_count() & 1:
+                        new |= bit
+                v = (v & step[1]) | new
+            else:
+                idx = step[1]
+                a = (v >> idx) & 1
+                corrections.append(a)
+                if a and step[2]:
+                    v ^= 1 << (n + idx)
+        return v
+
+    def apply_batch(self, x: np.ndarray, z: np.ndarray) -> np.ndarray:
+        """
+        Batched `apply` over many pads at once.
+        `x` and `z` have shape (num_qubits, batch) and are updated in place.
+        Returns the corrections with shape (t_count, batch).
+        """
+        if self._matrices is None:
+            self._matrices = []
+        # steps compiled since the last call
+        self._matrices.extend(
+            self._matrix(step) if step[0] == "clifford" else step
+            for step in islice(self.steps, len(self._matrices), None)
+        )
+        corrections = np.zeros((self.t_count, x.shape[1]), dtype=bool)
+        t = 0
+        for step in self._matrices:
+            if step[0] == "t":
+                idx = step[1]
+                corrections[t] = x[idx] == 1
+                if step[2]:
+                    z[idx] ^= x[idx]
+                t += 1
+            else:
+                _, support, m = step
+                k = len(support)
+                v = np.concatenate((x[support], z[support]))
+                v = (m @ v) % 2
+                x[support] = v[:k]
+                z[support] = v[k:]
+        return corrections
+
+    def emit(
+        self,
+        corrections: np.ndarray,
+        dummy_qubit_idx: int | None,
+        target: QuantumCircuit | None = None,
+        correction: str = "dummy",
+        start: int = 0,
+        offset: int | None = None,
+    ) -> QuantumCircuit:
+        """
+        Writes the server circuit with its corrections.
+        Operations are appended to `target` (mapping qubits by index) if
+        given, otherwise to an empty copy of the compiled circuit.
+        `correction` is the strategy of `CORRECTION_STRATEGIES`; the dummy
+        qubit may be None if `needs_dummy(correction)` is False.
+
+        Only the instructions from `start` on are written. With `offset`,
+        `target` holds from that index an earlier emit of this circuit with
+        the same corrections before `start`: what follows them is replaced.
+        """
+        if self.needs_dummy(correction) and dummy_qubit_idx is None:
+            raise ValueError(
+                f"the {correction!r} correction strategy needs a dummy qubit here"
+            )
+        if target is None:
+            target = self.circuit.copy_empty_like()
+        base, slots, fixes, _ = self._layout(target, dummy_qubit_idx, correction)
+        first = self.emitted_size(start)
+        if offset is not None:
+            del target.data[offset + first :]
+        out = base[first:]
+        before = first - start
+        for t, corrected in enumerate(corrections[before:].tolist(), before):
+            out[slots[t] - first] = fixes[t][0 if corrected else 1]
+        # the instructions are already mapped onto the bits of `target` and
+        # were checked when added to the server circuit: `_append` skips the
+        # checks and copies of `append`
+        for instruction in out:
+            target._append(instruction)
+        return target
+
+    def _layout(
+        self, target: QuantumCircuit, dummy_qubit_idx: int | None, correction: str
+    ) -> list:
+        """
+        Returns, for a target circuit, the compiled instructions mapped onto
+        its bits with a free slot after each non-Clifford gate, the position
+        of each slot, the two possible corrections of each slot (on the
+        gate's qubit, on the dummy or spare qubit) and the number of
+        instructions mapped. Cached by target bits, dummy qubit and strategy,
+        and extended with the instructions compiled since.
+        """
+        key = (tuple(target.qubits), tuple(target.clbits), dummy_qubit_idx, correction)
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = [[], [], [], 0]
+        base, slots, fixes, done = layout
+        if done == len(self._instructions):
+            return layout
+
+        qubits, clbits = target.qubits, target.clbits
+        same_bits = (
+            qubits[: self.num_qubits] == self.circuit.qubits
+            and clbits[: self.circuit.num_clbits] == self.circuit.clbits
+        )
+        if same_bits:
+            mapped = self._instructions[done:]
+        else:
+            qubit_index = {q: i for i, q in enumerate(self.circuit.qubits)}
+            clbit_index = {c: i for i, c in enumerate(self.circuit.clbits)}
+            mapped = [
+                instruction.replace(
+                    qubits=[qubits[qubit_index[q]] for q in instruction.qubits],
+                    clbits=[clbits[clbit_index[c]] for c in instruction.clbits],
+                )
+                for instruction in islice(self._instructions, done, None)
+            ]
+
+        start = done
+        for position in islice(self.t_positions, len(fixes), None):
+            base.extend(mapped[start - done : position + 1 - done])
+            slots.append(len(base))
+            base.append(None)
+            start = position + 1
+        base.extend(mapped[start - done :])
+
+        if correction == "recycle":
+            spares = [
+                dummy_qubit_idx if spare is None else spare
+                for spare in islice(self.spare_qubits(), len(fixes), None)
+            ]
+        else:
+            spares = [dummy_qubit_idx] * (self.t_count - len(fixes))
+        for (idx, gate, angle), spare in zip(
+            islice(self.t_gates, len(fixes), None), spares
+        ):
+            op = CORRECTIONS[gate](angle)
+            fixes.append(
+                (
+                    CircuitInstruction(op, (qubits[idx],)),
+                    CircuitInstruction(op, (qubits[spare],)),
+                )
+            )
+        layout[3] = len(self._instructions)
+        return layout
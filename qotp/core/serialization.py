@@ -0,0 +1,182 @@
+from qiskit import qpy
+import numpy as np
+import struct
+import mmap
+import io
+
+from .ciphertext import Ciphertext
+from .keys import KeyState
+
+VERSION = 1
+
+# magic, version, number of qubits
+KEYS_HEADER = struct.Struct("<4sBQ")
+KEYS_MAGIC = b"QKEY"
+# magic, version, number of qubits of the keys, then keys and QPY circuit
+CIPHERTEXT_HEADER = struct.Struct("<4sBQ")
+CIPHERTEXT_MAGIC = b"QCTX"
+# magic, version, number of records, offset of the index
+ARCHIVE_HEADER = struct.Struct("<4sBQQ")
+ARCHIVE_MAGIC = b"QCTA"
+
+
+def _check_header(header: struct.Struct, magic: bytes, data, what: str) -> tuple:
+    if len(data) < header.size:
+        raise ValueError(f"truncated {what}")
+    found, version, *fields = header.unpack_from(data)
+    if found != magic:
+        raise ValueError(f"not a {what}: bad magic {found!r}")
+    if version != VERSION:
+        raise ValueError(f"unsupported {what} version: {version}")
+    return tuple(fields)
+
+
+def _packed_size(num_qubits: int) -> int:
+    return (num_qubits + 7) // 8
+
+
+def pack_keys(keys: KeyState) -> bytes:
+    """
+    X masks then Z masks, 8 qubits per byte (little bit order), each
+    padded to a whole byte.
+    """
+    return (
+        np.packbits(keys.x, bitorder="little").tobytes()
+        + np.packbits(keys.z, bitorder="little").tobytes()
+    )
+
+
+def unpack_keys(data, num_qubits: int, start: int = 0, stop: int | None = None) -> KeyState:
+    """
+    Reads the qubits [start, stop) of packed keys. Only the bytes holding
+    them are unpacked, so `data` can be a memory map of a large key file.
+    """
+    stop = num_qubits if stop is None else stop
+    if not 0 <= start <= stop <= num_qubits:
+        raise ValueError(f"qubits [{start}, {stop}) out of range for {num_qubits}")
+    size = _packed_size(num_qubits)
+    first, last = start // 8, _packed_size(stop)
+    shift = start - 8 * first
+    masks = []
+    for base in (0, size):
+        chunk = np.frombuffer(data, dtype=np.uint8, count=last - first, offset=base + first)
+        masks.append(np.unpackbits(chunk, bitorder="little")[shift : shift + stop - start])
+    return KeyState.from_arrays(*masks)
+
+
+def save_keys(path: str, keys: KeyState) -> None:
+    with open(path, "wb") as f:
+        f.write(KEYS_HEADER.pack(KEYS_MAGIC, VERSION, len(keys)))
+        f.write(pack_keys(keys))
+
+
+def load_keys(path: str, start: int = 0, stop: int | None = None) -> KeyState:
+    """
+    Loads the keys of qubits [start, stop) of a key file (all by default).
+    The file is memory-mapped: only the requested range is read.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        (num_qubits,) = _check_header(KEYS_HEADER, KEYS_MAGIC, m, "key file")
+        keys = unpack_keys(
+            memoryview(m)[KEYS_HEADER.size :], num_qubits, start, stop
+        )
+    return keys
+
+
+def dumps_ciphertext(ciphertext: Ciphertext) -> bytes:
+    buffer = io.BytesIO()
+    buffer.write(
+        CIPHERTEXT_HEADER.pack(CIPHERTEXT_MAGIC, VERSION, len(ciphertext.keys))
+    )
+    buffer.write(pack_keys(ciphertext.keys))
+    qpy.dump(ciphertext.circuit, buffer)
+    return buffer.getvalue()
+
+
+def _ciphertext_keys(data) -> tuple[KeyState, int]:
+    (num_qubits,) = _check_header(
+        CIPHERTEXT_HEADER, CIPHERTEXT_MAGIC, data, "ciphertext"
+    )
+    keys = unpack_keys(memoryview(data)[CIPHERTEXT_HEADER.size :], num_qubits)
+    return keys, CIPHERTEXT_HEADER.size + 2 * _packed_size(num_qubits)
+
+
+def loads_ciphertext(data) -> Ciphertext:
+    keys, circuit_offset = _ciphertext_keys(data)
+    circuit = qpy.load(io.BytesIO(memoryview(data)[circuit_offset:]))[0]
+    return Ciphertext(circuit, keys)
+
+
+def save_ciphertexts(path: str, ciphertexts) -> int:
+    """
+    Writes many ciphertexts to one archive: a header, the records, then
+    an index of their offsets for random access (see `CiphertextArchive`).
+    The ciphertexts can be any iterable, they are streamed to the file.
+
+    Returns:
+        int: The number of records written.
+    """
+    offsets = []
+    with open(path, "wb") as f:
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, VERSION, 0, 0))
+        for ciphertext in ciphertexts:
+            offsets.append(f.tell())
+            f.write(dumps_ciphertext(ciphertext))
+        index_offset = f.tell()
+        offsets.append(index_offset)
+        f.write(np.array(offsets, dtype="<u8").tobytes())
+        f.seek(0)
+        f.write(
+            ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, VERSION, len(offsets) - 1, index_offset)
+        )
+    return len(offsets) - 1
+
+
+class CiphertextArchive:
+    """
+    Read-only, memory-mapped view of a file written by `save_ciphertexts`.
+    Records are only decoded when accessed, and `keys(i)` reads the keys
+    of a record without loading its circuit.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        count, index_offset = _check_header(
+            ARCHIVE_HEADER, ARCHIVE_MAGIC, self._map, "ciphertext archive"
+        )
+        self._offsets = np.frombuffer(
+            self._map, dtype="<u8", count=count + 1, offset=index_offset
+        )
+
+    def _record(self, i: int) -> memoryview:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"record {i} out of range for {len(self)}")
+        i %= len(self)
+        return memoryview(self._map)[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+    def keys(self, i: int) -> KeyState:
+        return _ciphertext_keys(self._record(i))[0]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> Ciphertext:
+        return loads_ciphertext(self._record(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self) -> None:
+        # views of the map must be released before closing it
+        self._offsets = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,154 @@
+from concurrent.futures import Future
 from qiskit import QuantumCircuit
 
+from .ciphertext import Ciphertext
+from .jobs import JobPool, JobResult
+from .packing import pack
+from .plan import KeyUpdatePlan
+
+# width of the circuits packed by `Server.submit_packed`: the cost of a
+# noisy Aer simulation grows exponentially with it, past ~10 qubits packing
+# costs more than it saves (see benchmarks.packing)
+PACK_WIDTH = 10
+
+
+def job_circuit(job: QuantumCircuit) -> QuantumCircuit:
+    """
+    The circuit of a job, or a TypeError for a `Ciphertext`, whose circuit
+    is only the unmeasured preparation of an encrypted input.
+    """
+    if isinstance(job, Ciphertext):
+        raise TypeError(
+            "a Ciphertext only prepares an encrypted input: submit the measured"
+            " circuit built from it, e.g. by encrypted_adder_circuit"
+        )
+    return job
+
 
 class Server:
-    def __init__(self, circuit: QuantumCircuit):
+    """
+    Holds the server circuit and runs the encrypted jobs of its clients.
+
+    Args:
+        circuit (QuantumCircuit): Circuit evaluated on encrypted inputs.
+        workers (int): Number of worker processes running jobs, one per
+            core if None. The pool is only started by the first `submit`.
+        backend (str): Simulator of the workers, see `get_simulator`.
+        pack_width (int): Maximum width of the circuits packed by
+            `submit_packed`.
+    """
+
+    def __init__(
+        self,
+        circuit: QuantumCircuit,
+        workers: int | None = None,
+        backend: str = "geneva",
+        pack_width: int = PACK_WIDTH,
+    ):
         self.circuit = circuit
+        self.workers = workers
+        self.backend = backend
+        self.pack_width = pack_width
+        self._pool = None
+
+    @property
+    def circuit(self) -> QuantumCircuit:
+        return self._circuit
+
+    @circuit.setter
+    def circuit(self, circuit: QuantumCircuit) -> None:
+        self._circuit = circuit
         self.num_qubits = circuit.num_qubits
+        self._plan = None
 
     def get_num_qubits(self) -> int:
         return self.num_qubits
+
+    def get_plan(self) -> KeyUpdatePlan:
+        """
+        Returns the key update plan of the server circuit, compiled once
+        and shared by every client. Instructions appended to the circuit
+        since are compiled on the next call.
+        """
+        if self._plan is None:
+            self._plan = KeyUpdatePlan(self.circuit)
+        else:
+            self._plan.extend()
+        return self._plan
+
+    def invalidate(self, position: int) -> None:
+        """
+        Reports an in-place edit of the server circuit from instruction
+        `position` on: the plan compiles that suffix again on next use, and
+        the key checkpoints of the clients before it stay valid.
+        """
+        if self._plan is not None:
+            self._plan.invalidate(position)
+
+    def submit(self, job: QuantumCircuit, shots: int = 1024) -> Future:
+        """
+        Queues an encrypted, measured circuit (e.g. the output of
+        `encrypted_adder_circuit`) on the worker pool.
+        A `Ciphertext` is rejected: it only holds the unmeasured preparation
+        of one input, there is nothing to count.
+
+        Returns:
+            Future: Resolves to a `JobResult`, whose counts are still
+            encrypted and ready for `Client.decrypt`.
+        """
+        circuit = job_circuit(job)
+        return self._get_pool().submit(circuit, shots)
+
+    def submit_packed(
+        self,
+        jobs: list[QuantumCircuit],
+        shots: int = 1024,
+        max_width: int | None = None,
+    ) -> list[Future]:
+        """
+        Queues the jobs of several clients packed side by side into circuits
+        of at most `max_width` qubits (`pack_width` if None), so that each
+        packed circuit is transpiled and simulated once for all its jobs.
+
+        Returns:
+            list[Future]: One per job, in order, resolving to a `JobResult`
+            with the job's own (still encrypted) counts, formatted as if it
+            ran alone, and the timings of the packed run.
+        """
+        circuits = [job_circuit(job) for job in jobs]
+        futures = [Future() for _ in circuits]
+        for packed in pack(circuits, max_width or self.pack_width):
+            results = [futures[i] for i in packed.indices]
+
+            def done(job: Future, packed=packed, results=results) -> None:
+                if job.exception() is not None:
+                    for result in results:
+                        result.set_exception(job.exception())
+                    return
+                run = job.result()
+                for result, counts in zip(results, packed.split(run.counts)):
+                    result.set_result(
+                        JobResult(counts, run.queued_s, run.run_s, run.worker)
+                    )
+
+            self._get_pool().submit(packed.circuit, shots).add_done_callback(done)
+        return futures
+
+    def _get_pool(self) -> JobPool:
+        if self._pool is None:
+            self._pool = JobPool(self.workers, self.backend)
+        return self._pool
+
+    def close(self) -> None:
+        """
+        Waits for the queued jobs and stops the worker pool.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,136 @@
+from qiskit import ClassicalRegister, QuantumCircuit
+from qiskit.circuit import ParameterVector
+from numpy import pi
+import numpy as np
+
+from util import get_geneva_simulator, cached_transpile
+
+from .keys import KeyState
+from .server import Server
+
+
+class EncryptedTemplate:
+    """
+    The encrypted pipeline of a server circuit as one parameterized circuit,
+    transpiled once for the backend.
+
+    Input bits, X/Z pad bits and corrections are parameters:
+    - qubit i is prepared with RX(pi * in[i]) RX(pi * pad_x[i]) RZ(pi * pad_z[i]),
+      i.e. X^in X^a Z^b up to a global phase,
+    - the k-th non-Clifford gate is followed by P(phi * corr[k]) on its qubit
+      and P(phi * (1 - corr[k])) on the dummy qubit, i.e. its correction
+      P(phi) (S/S_dg for a T/T_dg) on either of them.
+    Changing the key or the input only binds values into the laid-out circuit.
+
+    Args:
+        server (Server): Server whose circuit is evaluated.
+        input_widths (list[int]): Width of each input register, in qubit order.
+        measured (int): Index of the input register that is measured.
+        simulator (AerSimulator): Backend to transpile for, FakeGeneva if None.
+    """
+
+    def __init__(
+        self,
+        server: Server,
+        input_widths: list[int],
+        measured: int = -1,
+        simulator=None,
+        seed_transpiler: int = 0,
+    ):
+        self.plan = server.get_plan()
+        self.input_widths = list(input_widths)
+        self.num_inputs = sum(self.input_widths)
+        self.dummy_qubit_idx = self.num_inputs
+        # start of each register: index -1 is the last one, not the end
+        offsets = np.cumsum([0] + self.input_widths)[:-1]
+        self.measured_offset = int(offsets[measured])
+        self.measured_width = self.input_widths[measured]
+        self.simulator = simulator if simulator is not None else get_geneva_simulator()
+
+        self.inputs = ParameterVector("in", self.num_inputs)
+        self.pad_x = ParameterVector("pad_x", self.num_inputs)
+        self.pad_z = ParameterVector("pad_z", self.num_inputs)
+        self.corrections = ParameterVector("corr", self.plan.t_count)
+
+        self.circuit = self._build()
+        # cached on disk: a new process binds into the same layout right away
+        self.transpiled = cached_transpile(
+            self.circuit, self.simulator, seed_transpiler=seed_transpiler
+        )
+        # parameters of the transpiled circuit by name: a cached circuit holds
+        # those of the template that built it. The transpiler may also drop
+        # some, e.g. phases right before a measure
+        self._bound_parameters = {p.name: p for p in self.transpiled.parameters}
+
+    def _build(self) -> QuantumCircuit:
+        qc = QuantumCircuit(self.num_inputs + 1)  # +1 for dummy ancilla
+        meas_reg = ClassicalRegister(self.measured_width, "meas")
+        qc.add_register(meas_reg)
+
+        for i in range(self.num_inputs):
+            qc.rx(pi * self.inputs[i], i)
+            qc.rx(pi * self.pad_x[i], i)
+            qc.rz(pi * self.pad_z[i], i)
+
+        circuit = self.plan.circuit
+        for position, instruction in enumerate(circuit.data):
+            q_indices = [circuit.find_bit(q).index for q in instruction.qubits]
+            qc.append(instruction.operation, q_indices)
+            t = self.plan.t_positions.get(position)
+            if t is not None:
+                idx, _, angle = self.plan.t_gates[t]
+                qc.p(angle * self.corrections[t], idx)
+                qc.p(angle * (1 - self.corrections[t]), self.dummy_qubit_idx)
+
+        qc.measure(
+            range(self.measured_offset, self.measured_offset + self.measured_width),
+            meas_reg,
+        )
+        return qc
+
+    def input_bits(self, values: list[int]) -> list[int]:
+        """
+        Little-endian bits of each input value, concatenated in qubit order.
+        """
+        bits = []
+        for value, width in zip(values, self.input_widths):
+            if value < 0 or value.bit_length() > width:
+                raise ValueError(f"input {value} does not fit in {width} qubits")
+            bits.extend((value >> i) & 1 for i in range(width))
+        return bits
+
+    def bindings(
+        self, values: list[int], pad: KeyState, corrections: np.ndarray
+    ) -> dict:
+        """
+        Parameter values of one run: input values, the pad used to encrypt
+        them, and the corrections returned by the key update of that pad.
+        """
+        binding = {}
+        binding.update(zip(self.inputs, self.input_bits(values)))
+        binding.update(zip(self.pad_x, pad.x[: self.num_inputs].tolist()))
+        binding.update(zip(self.pad_z, pad.z[: self.num_inputs].tolist()))
+        binding.update(zip(self.corrections, corrections.astype(int).tolist()))
+        return {
+            self._bound_parameters[p.name]: v
+            for p, v in binding.items()
+            if p.name in self._bound_parameters
+        }
+
+    def bind(self, binding: dict) -> QuantumCircuit:
+        return self.transpiled.assign_parameters(binding)
+
+    def run(self, bindings: list[dict], shots: int = 1024) -> list[dict]:
+        """
+        Runs the transpiled template once per binding, in a single job.
+
+        Returns:
+            list[dict]: The counts of each binding, in order.
+        """
+        parameter_binds = {
+            p: [binding[p] for binding in bindings] for p in self._bound_parameters.values()
+        }
+        result = self.simulator.run(
+            [self.transpiled], parameter_binds=[parameter_binds], shots=shots
+        ).result()
+        return [result.get_counts(i) for i in range(len(bindings))]
@@ -1,11 +1,26 @@
+import argparse
+
 from core.server import *
 from core.client import *
 from core.ciphertext import *
 from core.pipe import *
+from util import enable_tracing, disable_tracing
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trace", help="write a Chrome trace of the run to this file")
+    args = parser.parse_args()
+
+    from rich.traceback import install
+
+    install()
+
+    if args.trace:
+        enable_tracing()
     adder_pipe(1, 2, debug_mode=False)
+    if args.trace:
+        disable_tracing().export_chrome_trace(args.trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import random
+
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Clifford, Pauli, Statevector
+import numpy as np
+
+from core.client import Client
+from core.keys import KeyState
+
+# gates of the key update rules, by number of qubits
+NAMED_GATES = {1: ["h", "s", "sdg", "x", "y", "z", "t", "tdg"], 2: ["cx"]}
+# the same, with Clifford gates whose rule is derived from their matrix
+CLIFFORD_GATES = {
+    1: NAMED_GATES[1] + ["sx", "sxdg"],
+    2: ["cx", "cz", "cy", "swap", "ecr", "iswap", "dcx"],
+}
+PHASES = [np.pi / 2, -np.pi / 2, np.pi / 4, -np.pi / 4, np.pi, 0.3]
+
+
+def random_circuit(
+    num_qubits: int,
+    num_gates: int,
+    seed: int,
+    gates: dict[int, list[str]] = NAMED_GATES,
+) -> QuantumCircuit:
+    """
+    Random circuit on `num_qubits` qubits plus a dummy one, the last,
+    with gates drawn from `gates` and phase gates P(theta).
+    """
+    rng = random.Random(seed)
+    qc = QuantumCircuit(num_qubits + 1)
+    for _ in range(num_gates):
+        if rng.random() < 0.2:
+            qc.p(rng.choice(PHASES), rng.randrange(num_qubits))
+            continue
+        size = rng.choice([k for k in gates if k <= num_qubits])
+        getattr(qc, rng.choice(gates[size]))(*rng.sample(range(num_qubits), size))
+    return qc
+
+
+def random_pad(num_qubits: int, seed: int) -> KeyState:
+    """
+    Random pad of `num_qubits` qubits plus the dummy one, which has none.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.append(rng.integers(0, 2, num_qubits), 0)
+    z = np.append(rng.integers(0, 2, num_qubits), 0)
+    return KeyState.from_arrays(x, z)
+
+
+def naive_update(qc: QuantumCircuit, keys: KeyState) -> list[bool]:
+    """
+    Gate-by-gate key update through the `KeyState` rules, in place.
+    Returns the correction of every non-Clifford gate.
+    """
+    corrections = []
+    for instruction in qc.data:
+        name = instruction.name
+        qubits = [qc.find_bit(q).index for q in instruction.qubits]
+        if name == "p":
+            theta = instruction.params[0]
+            if np.isclose(abs(theta), np.pi / 2):
+                name = "s"
+            elif np.isclose(abs(theta), np.pi / 4):
+                name = "t"
+            elif np.isclose(np.sin(theta), 0):
+                name = "z"
+            else:
+                # P(theta) X = X P(-theta): a correction, no key change
+                corrections.append(bool(keys.x[qubits[0]]))
+                continue
+        if name == "h":
+            keys.h(*qubits)
+        elif name == "cx":
+            keys.cx(*qubits)
+        elif name in ("s", "sdg"):
+            keys.s(*qubits)
+        elif name in ("t", "tdg"):
+            corrections.append(keys.t_correction(*qubits))
+        elif name not in ("x", "y", "z", "id"):
+            # any other Clifford gate: U X^a Z^b U_dg, through qiskit's tableaux
+            pauli = Pauli((keys.z[qubits].astype(bool), keys.x[qubits].astype(bool)))
+            image = pauli.evolve(Clifford(instruction.operation), frame="s")
+            keys.x[qubits] = image.x
+            keys.z[qubits] = image.z
+    return corrections
+
+
+def assert_decrypts(
+    test,
+    qc: QuantumCircuit,
+    pad: KeyState,
+    value: int,
+    correction: str = "dummy",
+    plan=None,
+) -> Client:
+    """
+    Encrypts `value` with `pad`, runs the corrected circuit of `qc` through
+    `Client.update_key`, decrypts the state with the updated keys and checks
+    it against `qc` on the plain value, up to a global phase.
+    Returns the client, holding the updated keys.
+    """
+    num_qubits = qc.num_qubits - 1
+    plain = QuantumCircuit(qc.num_qubits)
+    encrypted = QuantumCircuit(qc.num_qubits)
+    for i in range(num_qubits):
+        if value >> i & 1:
+            plain.x(i)
+            encrypted.x(i)
+        if pad.x[i]:
+            encrypted.x(i)
+        if pad.z[i]:
+            encrypted.z(i)
+    cl = Client()
+    cl.keys = pad.copy()
+    corrected = cl.update_key(
+        qc, num_qubits, plan=plan, target=encrypted, correction=correction
+    )
+    for i in range(num_qubits):
+        if cl.keys.x[i]:
+            corrected.x(i)
+        if cl.keys.z[i]:
+            corrected.z(i)
+    expected = Statevector(plain.compose(qc))
+    test.assertTrue(Statevector(corrected).equiv(expected))
+    return cl
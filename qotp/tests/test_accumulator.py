@@ -0,0 +1,51 @@
+import unittest
+
+from core.accumulator import (
+    accumulate,
+    accumulate_chained,
+    accumulator_server,
+    encrypted_accumulator_circuit,
+)
+from core.client import Client
+
+VALUES = [[1, 2], [3, 3, 3], [0, 1, 2, 3], [2, 3, 1, 1, 3]]
+
+
+class TestAccumulator(unittest.TestCase):
+
+    def test_sums(self):
+        for correction in ("dummy", "recycle"):
+            for values in VALUES:
+                expected = {format(sum(values) % 4, "02b"): 64}
+                self.assertEqual(
+                    accumulate(values, shots=64, backend="aer", correction=correction),
+                    expected,
+                )
+                self.assertEqual(
+                    accumulate_chained(values, shots=64, backend="aer", correction=correction),
+                    expected,
+                )
+
+    def test_wider_values(self):
+        values = [5, 6, 7]
+        self.assertEqual(accumulate(values, n_bits=3, shots=64, backend="aer"), {"010": 64})
+
+    def test_server_is_shared(self):
+        self.assertIs(accumulator_server(2, 3), accumulator_server(2, 3))
+        self.assertEqual(accumulator_server(2, 3).get_num_qubits(), 6)
+
+    def test_too_few_values(self):
+        for values in ([], [3]):
+            with self.assertRaises(ValueError):
+                accumulate(values, backend="aer")
+            with self.assertRaises(ValueError):
+                accumulate_chained(values, backend="aer")
+
+    def test_values_out_of_range(self):
+        with self.assertRaises(ValueError):
+            accumulate([1, 4], backend="aer")
+        with self.assertRaises(ValueError):
+            accumulate_chained([1, 4], backend="aer")
+        # values that do not split the qubits of the server into registers
+        with self.assertRaises(ValueError):
+            encrypted_accumulator_circuit(Client(), accumulator_server(2, 3), [1, 2, 3, 0])
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from qiskit import QuantumCircuit
+
+from core import artifacts
+from core.artifacts import (
+    MANIFEST,
+    ArtifactSink,
+    BackgroundSink,
+    DeferredSink,
+    get_sink,
+)
+
+
+def bell() -> QuantumCircuit:
+    qc = QuantumCircuit(2)
+    qc.h(0)
+    qc.cx(0, 1)
+    return qc
+
+
+class TestSinks(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, "images")
+
+    def files(self) -> set[str]:
+        if not os.path.exists(self.directory):
+            return set()
+        return set(os.listdir(self.directory))
+
+    def test_none(self):
+        sink = ArtifactSink(self.directory)
+        sink.circuit("circuit", bell())
+        sink.histogram("histogram", {"00": 3})
+        sink.flush()
+        sink.close()
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_deferred_renders_on_flush(self):
+        sink = DeferredSink(self.directory)
+        sink.circuit("circuit", bell())
+        sink.histogram("histogram", {"00": 3, "11": 5})
+        self.assertEqual(self.files(), set())
+        sink.flush()
+        self.assertEqual(self.files(), {"circuit.png", "histogram.png", MANIFEST})
+
+        sink.histogram("later", {"01": 1})
+        self.assertNotIn("later.png", self.files())
+        sink.close()
+        self.assertIn("later.png", self.files())
+
+    def test_background_renders_by_close(self):
+        sink = BackgroundSink(self.directory)
+        sink.circuit("circuit", bell())
+        sink.histogram("histogram", {"00": 3, "11": 5})
+        sink.close()
+        self.assertEqual(self.files(), {"circuit.png", "histogram.png", MANIFEST})
+
+    def test_manifest_skips_rendered(self):
+        first = DeferredSink(self.directory)
+        first.circuit("circuit", bell())
+        first.histogram("histogram", {"00": 3})
+        first.close()
+
+        # a new sink, as in a new run, reads the manifest
+        second = DeferredSink(self.directory)
+        with mock.patch.object(artifacts, "render_artifact") as render:
+            second.circuit("circuit", bell())
+            second.histogram("histogram", {"00": 3})
+            second.close()
+            render.assert_not_called()
+
+            # different content under the same name is rendered again
+            changed = bell()
+            changed.x(1)
+            second.circuit("circuit", changed)
+            second.circuit("circuit", changed)
+            second.flush()
+            render.assert_called_once()
+
+    def test_deleted_file_is_rendered_again(self):
+        sink = DeferredSink(self.directory)
+        sink.circuit("circuit", bell())
+        sink.flush()
+        os.remove(os.path.join(self.directory, "circuit.png"))
+        sink.circuit("circuit", bell())
+        sink.flush()
+        self.assertIn("circuit.png", self.files())
+
+    def test_get_sink(self):
+        self.assertIs(get_sink("none", self.directory), get_sink("none", self.directory))
+        self.assertEqual(get_sink("none", self.directory).mode, "none")
+        with self.assertRaises(ValueError):
+            get_sink("inline", self.directory)
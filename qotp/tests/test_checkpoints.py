@@ -0,0 +1,144 @@
+import unittest
+from unittest import mock
+
+from qiskit import QuantumCircuit
+from qiskit.circuit import Qubit
+
+from core.checkpoints import KeyCheckpoints
+from core.client import Client
+from core.plan import KeyUpdatePlan
+from helpers import CLIFFORD_GATES, random_circuit, random_pad
+
+
+def full_update(qc: QuantumCircuit, pad, correction: str = "dummy", target=None):
+    """
+    Keys, corrections and corrected circuit of a fresh plan of `qc`.
+    """
+    keys = pad.copy()
+    plan = KeyUpdatePlan(qc)
+    corrections = plan.apply(keys)
+    target = target.copy() if target is not None else None
+    dummy = qc.num_qubits - 1
+    return keys, corrections, plan.emit(corrections, dummy, target, correction)
+
+
+def edit_suffix(qc: QuantumCircuit, position: int, seed: int) -> None:
+    """
+    Replaces the instructions of `qc` from `position` on, in place.
+    """
+    suffix = random_circuit(qc.num_qubits - 1, len(qc.data) - position, seed)
+    del qc.data[position:]
+    qc.compose(suffix, inplace=True)
+
+
+class TestKeyCheckpoints(unittest.TestCase):
+
+    def test_resume_after_extend(self):
+        qc = random_circuit(5, 300, seed=0)
+        pad = random_pad(5, seed=0)
+        plan = KeyUpdatePlan(qc)
+        keys = pad.copy()
+        checkpoints = KeyCheckpoints(plan, keys, every=8)
+        checkpoints.update(keys)
+        for seed in range(1, 4):
+            done = len(plan.steps)
+            qc.compose(random_circuit(5, 50, seed), inplace=True)
+            with mock.patch.object(plan, "run", wraps=plan.run) as run:
+                corrections = checkpoints.update(keys)
+            # only the steps of the new instructions ran
+            self.assertEqual(min(call.args[1] for call in run.call_args_list), done)
+            expected_keys, expected, _ = full_update(qc, pad)
+            self.assertEqual(keys, expected_keys)
+            self.assertEqual(corrections.tolist(), expected.tolist())
+
+    def test_resume_after_invalidate(self):
+        qc = random_circuit(5, 300, seed=1)
+        pad = random_pad(5, seed=1)
+        plan = KeyUpdatePlan(qc)
+        keys = pad.copy()
+        checkpoints = KeyCheckpoints(plan, keys, every=8)
+        checkpoints.update(keys)
+        for seed, position in enumerate([250, 120, 299, 0], 2):
+            edit_suffix(qc, position, seed)
+            plan.invalidate(position)
+            corrections = checkpoints.update(keys)
+            expected_keys, expected, _ = full_update(qc, pad)
+            self.assertEqual(keys, expected_keys)
+            self.assertEqual(corrections.tolist(), expected.tolist())
+
+    def test_holds(self):
+        qc = random_circuit(3, 40, seed=2)
+        keys = random_pad(3, seed=2)
+        checkpoints = KeyCheckpoints(KeyUpdatePlan(qc), keys)
+        self.assertFalse(checkpoints.holds(keys))
+        checkpoints.update(keys)
+        self.assertTrue(checkpoints.holds(keys))
+        self.assertFalse(checkpoints.holds(keys.copy()))
+        keys.x[0] ^= 1
+        self.assertFalse(checkpoints.holds(keys))
+
+    def test_extend_with_new_qubits(self):
+        qc = random_circuit(3, 40, seed=3)
+        plan = KeyUpdatePlan(qc)
+        qc.add_bits([Qubit()])
+        qc.h(4)
+        with self.assertRaises(ValueError):
+            plan.extend()
+
+
+class TestGrowingCircuit(unittest.TestCase):
+
+    def test_update_key(self):
+        for correction in ("dummy", "recycle"):
+            qc = random_circuit(4, 200, seed=4, gates=CLIFFORD_GATES)
+            pad = random_pad(4, seed=4)
+            prefix = QuantumCircuit(5)
+            prefix.x(0)
+            cl = Client()
+            cl.keys = pad.copy()
+            plan = KeyUpdatePlan(qc)
+            out = cl.update_key(qc, 4, plan=plan, target=prefix.copy(), correction=correction)
+            for seed in range(5, 11):
+                if seed % 2:
+                    qc.compose(random_circuit(4, 30, seed, gates=CLIFFORD_GATES), inplace=True)
+                else:
+                    position = len(qc.data) - 40
+                    edit_suffix(qc, position, seed)
+                    plan.invalidate(position)
+                written = cl.update_key(
+                    qc, 4, plan=plan, target=out, correction=correction, resume=True
+                )
+                self.assertIs(written, out)
+                keys, _, expected = full_update(qc, pad, correction, prefix)
+                self.assertEqual(cl.keys, keys)
+                self.assertEqual(list(out.data), list(expected.data))
+
+    def test_changed_target_is_written_in_full(self):
+        qc = random_circuit(3, 60, seed=12)
+        pad = random_pad(3, seed=12)
+        cl = Client()
+        cl.keys = pad.copy()
+        plan = KeyUpdatePlan(qc)
+        out = cl.update_key(qc, 3, plan=plan)
+        out.barrier()
+        qc.compose(random_circuit(3, 20, seed=13), inplace=True)
+        size = len(out.data)
+        cl.update_key(qc, 3, plan=plan, target=out, resume=True)
+        _, _, expected = full_update(qc, pad)
+        # appended after the barrier, as to any other target
+        self.assertEqual(list(out.data)[size:], list(expected.data))
+
+    def test_update_twice(self):
+        qc = random_circuit(4, 120, seed=14, gates=CLIFFORD_GATES)
+        pad = random_pad(4, seed=14)
+        keys, corrections, _ = full_update(qc.compose(qc), pad)
+        once = KeyUpdatePlan(qc)
+        expected = once.emit(corrections[once.t_count :], 4)
+        for plan in (None, KeyUpdatePlan(qc)):
+            cl = Client()
+            cl.keys = pad.copy()
+            cl.update_key(qc, 4, plan=plan)
+            out = cl.update_key(qc, 4, plan=plan)
+            # the second call runs the keys through the circuit once more
+            self.assertEqual(cl.keys, keys)
+            self.assertEqual(list(out.data), list(expected.data))
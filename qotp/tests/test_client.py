@@ -0,0 +1,95 @@
+import random
+import unittest
+from collections import Counter
+
+from qiskit import QuantumCircuit
+import numpy as np
+
+from core.client import Client
+from core.plan import KeyUpdatePlan
+from helpers import random_pad
+from util import disable_tracing, draper_adder, enable_tracing, to_standard
+
+
+def random_counts(width: int, num_outcomes: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    return {
+        format(rng.getrandbits(width), f"0{width}b"): rng.randint(1, 50)
+        for _ in range(num_outcomes)
+    }
+
+
+class TestDecrypt(unittest.TestCase):
+
+    def naive(self, cl: Client, counts: dict, offset: int) -> dict:
+        out = Counter()
+        for bitstring, count in counts.items():
+            out[cl.decrypt(bitstring, offset)] += count
+        return dict(out)
+
+    def test_counts_match_decrypt(self):
+        # dense and sparse counts, narrow and too wide for an integer
+        for seed, (width, num_outcomes) in enumerate(
+            [(3, 8), (10, 3000), (24, 5), (40, 200), (70, 50)]
+        ):
+            cl = Client()
+            cl.keys = random_pad(width + 2, seed)
+            counts = random_counts(width, num_outcomes, seed)
+            self.assertEqual(cl.decrypt_counts(counts, 1), self.naive(cl, counts, 1))
+
+    def test_memory_counts(self):
+        cl = Client()
+        cl.keys = random_pad(20, seed=1)
+        memory = list(random_counts(20, 30, seed=1)) * 3
+        self.assertEqual(
+            cl.decrypt_memory_counts(memory), self.naive(cl, Counter(memory), 0)
+        )
+        self.assertEqual(cl.decrypt_memory_counts([]), {})
+
+    def test_probabilities_match_decrypt(self):
+        rng = np.random.default_rng(2)
+        for width, offset in [(1, 0), (3, 2), (6, 1)]:
+            cl = Client()
+            cl.keys = random_pad(width + offset, seed=width)
+            probabilities = rng.random(2**width)
+            decrypted = cl.decrypt_probabilities(probabilities, offset)
+            for v, p in enumerate(probabilities):
+                plain = cl.decrypt(format(v, f"0{width}b"), offset)
+                self.assertEqual(decrypted[int(plain, 2)], p)
+
+
+class TestCorrectionCounters(unittest.TestCase):
+
+    def counters(self, correction: str, seed: int) -> tuple[dict, list[bool]]:
+        # the 2-bit adder and a dummy qubit, the last
+        qc = QuantumCircuit(5).compose(to_standard(draper_adder(2)), range(4))
+        cl = Client()
+        cl.keys = random_pad(4, seed)
+        plan = KeyUpdatePlan(qc)
+        tracer = enable_tracing()
+        self.addCleanup(disable_tracing)
+        cl.update_key(qc, 4, plan=plan, correction=correction)
+        corrections = [bool(c) for c in cl.checkpoints.corrections]
+        prefix = "update_key.corrections."
+        counters = {
+            name[len(prefix) :]: n
+            for name, n in tracer.counters.items()
+            if name.startswith(prefix)
+        }
+        return counters, corrections
+
+    def test_dummy(self):
+        counters, corrections = self.counters("dummy", seed=3)
+        on_qubit = sum(corrections)
+        self.assertEqual(
+            counters, {"qubit": on_qubit, "spare": 0, "dummy": len(corrections) - on_qubit}
+        )
+
+    def test_recycle(self):
+        # the register of a holds classical bits: every other correction is spare
+        counters, corrections = self.counters("recycle", seed=3)
+        on_qubit = sum(corrections)
+        self.assertGreater(len(corrections) - on_qubit, 0)
+        self.assertEqual(
+            counters, {"qubit": on_qubit, "spare": len(corrections) - on_qubit, "dummy": 0}
+        )
@@ -0,0 +1,43 @@
+import unittest
+
+from qiskit import QuantumCircuit
+
+from core.jobs import JobPool
+from util.backends import BACKENDS, register_backend
+
+
+def flipped_aer():
+    """
+    An ideal simulator whose noise model flips every measured bit, so that
+    its results tell it apart from the built-in backends.
+    """
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.noise import NoiseModel, ReadoutError
+
+    noise_model = NoiseModel()
+    noise_model.add_all_qubit_readout_error(ReadoutError([[0, 1], [1, 0]]))
+    return AerSimulator(noise_model=noise_model)
+
+
+class TestJobPool(unittest.TestCase):
+
+    def tearDown(self):
+        BACKENDS.pop("flipped", None)
+        BACKENDS.pop("local", None)
+
+    def test_registered_backend_runs_in_workers(self):
+        register_backend("flipped", flipped_aer)
+        qc = QuantumCircuit(1, 1)
+        qc.measure(0, 0)
+        with JobPool(workers=1, backend="flipped") as pool:
+            result = pool.submit(qc, shots=16).result(timeout=120)
+        self.assertEqual(result.counts, {"1": 16})
+
+    def test_unpicklable_factory(self):
+        register_backend("local", lambda: flipped_aer())
+        with self.assertRaises(ValueError):
+            JobPool(workers=1, backend="local")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            JobPool(workers=1, backend="nowhere")
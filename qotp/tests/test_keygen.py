@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+import os
+
+import numpy as np
+
+from core.client import Client
+from core.keygen import PadGenerator, PadPool
+
+
+class TestPadGenerator(unittest.TestCase):
+
+    def test_seed_needs_test_mode(self):
+        with self.assertRaises(ValueError):
+            PadGenerator(seed=1)
+        self.assertTrue(PadGenerator(seed=1, test_mode=True).test_mode)
+
+    def test_seeded_is_deterministic(self):
+        first = PadGenerator(seed=7, test_mode=True)
+        second = PadGenerator(seed=7, test_mode=True)
+        self.assertEqual(first.pad(13), second.pad(13))
+        self.assertEqual(first.pads(5, 9), second.pads(5, 9))
+        self.assertNotEqual(first.pad(64), PadGenerator(seed=8, test_mode=True).pad(64))
+
+    def test_pad_bits(self):
+        generator = PadGenerator()
+        for num_qubits in (0, 1, 3, 8, 13, 100):
+            keys = generator.pad(num_qubits)
+            self.assertEqual((len(keys.x), len(keys.z)), (num_qubits, num_qubits))
+            self.assertTrue(set(keys.x.tolist() + keys.z.tolist()) <= {0, 1})
+        pads = generator.pads(50, 7)
+        self.assertEqual(len(pads), 50)
+        for keys in pads:
+            self.assertEqual((len(keys.x), len(keys.z)), (7, 7))
+        bits = np.concatenate([np.concatenate([k.x, k.z]) for k in pads])
+        self.assertEqual(set(bits.tolist()), {0, 1})
+
+    def test_os_csprng(self):
+        with mock.patch("core.keygen.os.urandom", wraps=os.urandom) as urandom:
+            PadGenerator().pad(12)
+        # 24 bits in 3 bytes
+        urandom.assert_called_once_with(3)
+
+
+class TestPadPool(unittest.TestCase):
+
+    def test_refill(self):
+        generator = PadGenerator(seed=3, test_mode=True)
+        pool = PadPool(6, size=4, generator=generator)
+        self.assertEqual(len(pool), 0)
+        with mock.patch.object(pool, "refill", wraps=pool.refill) as refill:
+            pads = [pool.pad() for _ in range(10)]
+        # empty at first, then after 4 and 8 pads
+        self.assertEqual(refill.call_count, 3)
+        self.assertEqual(len(pool), 2)
+        expected = PadGenerator(seed=3, test_mode=True)
+        self.assertEqual(pads, [p for _ in range(3) for p in expected.pads(4, 6)][:10])
+
+    def test_handed_out_pads_are_zeroed(self):
+        pool = PadPool(64, size=3, generator=PadGenerator(seed=4, test_mode=True))
+        pool.refill()
+        taken = [pool.pad() for _ in range(2)]
+        self.assertFalse(pool._bits[:2].any())
+        self.assertTrue(pool._bits[2].any())
+        # the pads given out are copies, not views of the zeroed rows
+        self.assertTrue(any(keys.x.any() or keys.z.any() for keys in taken))
+
+    def test_width_mismatch(self):
+        pool = PadPool(4, size=2)
+        self.assertEqual(len(pool.pad(4)), 4)
+        with self.assertRaises(ValueError):
+            pool.pad(5)
+
+    def test_client_pool(self):
+        cl = Client(PadPool(4, size=2))
+        self.assertEqual(len(cl.new_pad(4)), 4)
+        with self.assertRaises(ValueError):
+            cl.new_pad(3)
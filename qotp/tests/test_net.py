@@ -0,0 +1,120 @@
+import asyncio
+import json
+import unittest
+
+from qiskit import QuantumCircuit
+
+from core.client import Client
+from core.jobs import JobResult
+from core.net import (
+    QOTPClient,
+    QOTPServer,
+    RemoteError,
+    read_frame,
+    write_frame,
+)
+from core.pipe import encrypted_adder_circuit
+from core.server import Server
+from util import draper_adder, to_standard
+
+# a lost response makes the request hang: fail instead
+TIMEOUT = 60
+
+
+class TestLocalhost(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(to_standard(draper_adder(2)), workers=2, backend="aer")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    async def asyncSetUp(self):
+        self.listener = QOTPServer(self.server)
+        await self.listener.start()
+        self.remote = await QOTPClient(port=self.listener.port).connect()
+
+    async def asyncTearDown(self):
+        await self.remote.close()
+        await self.listener.close()
+
+    async def add(self, a: int, b: int) -> dict:
+        cl = Client()
+        circuit, offset = encrypted_adder_circuit(cl, Server(self.server.circuit), a, b)
+        job = await self.remote.run(circuit, shots=32)
+        return cl.decrypt_counts(job.counts, offset)
+
+    async def test_round_trip(self):
+        self.assertEqual(await self.add(2, 3), {"01": 32})
+
+    async def test_pipelined(self):
+        pairs = [(a, b) for a in range(4) for b in range(4)]
+        results = await asyncio.gather(*(self.add(a, b) for a, b in pairs))
+        for (a, b), counts in zip(pairs, results):
+            self.assertEqual(counts, {format((a + b) % 4, "02b"): 32})
+
+    async def test_server_error(self):
+        # no measurement, hence no counts
+        failing = self.remote.run(QuantumCircuit(1), shots=8)
+        results = await asyncio.gather(failing, self.add(1, 1), return_exceptions=True)
+        self.assertIsInstance(results[0], RemoteError)
+        self.assertEqual(results[1], {"10": 32})
+
+    async def test_ciphertext_rejected(self):
+        cipher = Client().encrypt(1, Server(self.server.circuit), width=2)
+        with self.assertRaises(TypeError):
+            await self.remote.run(cipher)
+
+    async def test_abandoned_request(self):
+        cl = Client()
+        circuit, _ = encrypted_adder_circuit(cl, Server(self.server.circuit), 1, 2)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.remote.run(circuit, shots=32), 1e-4)
+        # its response arrives later and is dropped
+        self.assertEqual(await asyncio.wait_for(self.add(3, 3), TIMEOUT), {"10": 32})
+
+
+class TestConnection(unittest.IsolatedAsyncioTestCase):
+    """
+    Responses that a `QOTPServer` would not send, from a raw server.
+    """
+
+    async def serve(self, handle) -> QOTPClient:
+        listener = await asyncio.start_server(handle, "127.0.0.1", 0)
+        self.addAsyncCleanup(listener.wait_closed)
+        self.addCleanup(listener.close)
+        port = listener.sockets[0].getsockname()[1]
+        remote = await QOTPClient(port=port).connect()
+        self.addAsyncCleanup(remote.close)
+        return remote
+
+    async def test_bad_responses(self):
+        async def handle(reader, writer):
+            while True:
+                request_id, _ = await read_frame(reader)
+                if request_id == 0:
+                    write_frame(writer, 999, b"{}")
+                    write_frame(writer, request_id, b"not json")
+                else:
+                    response = {"counts": {"1": 1}, "queued_s": 0, "run_s": 0, "worker": 0}
+                    write_frame(writer, request_id, json.dumps(response).encode())
+                await writer.drain()
+
+        remote = await self.serve(handle)
+        with self.assertRaises(RemoteError):
+            await asyncio.wait_for(remote.run(QuantumCircuit(1)), TIMEOUT)
+        job = await asyncio.wait_for(remote.run(QuantumCircuit(1)), TIMEOUT)
+        self.assertIsInstance(job, JobResult)
+        self.assertEqual(job.counts, {"1": 1})
+
+    async def test_connection_lost(self):
+        async def handle(reader, writer):
+            await read_frame(reader)
+            writer.close()
+
+        remote = await self.serve(handle)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(remote.run(QuantumCircuit(1)), TIMEOUT)
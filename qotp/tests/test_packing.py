@@ -0,0 +1,95 @@
+import unittest
+
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister, transpile
+
+from core.client import Client
+from core.packing import PackedCircuit, pack
+from core.server import Server
+from util import get_simulator
+
+
+def basis_state(bits: str, sizes: list[int]) -> QuantumCircuit:
+    """
+    Prepares `bits` (qubit 0 last) and measures it into registers of
+    `sizes`, clbit i from qubit i.
+    """
+    num_qubits = len(bits)
+    qc = QuantumCircuit(QuantumRegister(num_qubits, "q"))
+    for i, size in enumerate(sizes):
+        qc.add_register(ClassicalRegister(size, f"c{i}"))
+    for i, bit in enumerate(reversed(bits)):
+        if bit == "1":
+            qc.x(i)
+    qc.measure(range(sum(sizes)), range(sum(sizes)))
+    return qc
+
+
+def run(qc: QuantumCircuit) -> dict:
+    simulator = get_simulator("aer")
+    return simulator.run(transpile(qc, simulator), shots=16).result().get_counts()
+
+
+# 1 and 2 classical registers, of different widths
+CIRCUITS = [
+    basis_state("01", [2]),
+    basis_state("110", [1, 2]),
+    basis_state("1", [1]),
+    basis_state("1011", [3, 1]),
+    basis_state("0110", [4]),
+    basis_state("10", [1, 1]),
+]
+# at most 10 qubits: the third job fills the pack of the first
+UNEVEN = [
+    basis_state("101010", [6]),
+    basis_state("000111", [6]),
+    basis_state("1111", [4]),
+]
+
+
+class TestPacking(unittest.TestCase):
+
+    def test_split_matches_alone(self):
+        alone = [run(qc) for qc in CIRCUITS]
+        self.assertEqual(alone[1], {"11 0": 16})
+        # one circuit per pack, first fit, all in one
+        for max_width in (1, 4, 7, 100):
+            packs = pack(CIRCUITS, max_width)
+            split = {}
+            for packed in packs:
+                self.assertTrue(
+                    packed.circuit.num_qubits <= max_width or len(packed.circuits) == 1
+                )
+                for qc, counts in zip(packed.circuits, packed.split(run(packed.circuit))):
+                    split[id(qc)] = counts
+            self.assertEqual([split[id(qc)] for qc in CIRCUITS], alone)
+
+    def test_split_mixed_outcomes(self):
+        packed = PackedCircuit([basis_state("01", [2]), basis_state("110", [1, 2])])
+        # second circuit first (its clbits are the highest), registers spaced
+        counts = {"10 1 01": 3, "11 0 01": 2, "10 1 10": 5}
+        first, second = packed.split(counts)
+        self.assertEqual(first, {"01": 5, "10": 5})
+        self.assertEqual(second, {"10 1": 8, "11 0": 2})
+
+    def test_back_fill(self):
+        packs = pack(UNEVEN, 10)
+        self.assertEqual([packed.indices for packed in packs], [[0, 2], [1]])
+
+    def test_submit_packed(self):
+        server = Server(QuantumCircuit(1), workers=1, backend="aer")
+        self.addCleanup(server.close)
+        for circuits, max_width in [(CIRCUITS, 5), (UNEVEN, 10), (CIRCUITS + UNEVEN, 10)]:
+            futures = server.submit_packed(circuits, shots=16, max_width=max_width)
+            results = [future.result(timeout=120).counts for future in futures]
+            self.assertEqual(results, [run(qc) for qc in circuits])
+
+    def test_ciphertext_rejected(self):
+        # its circuit only prepares the input, it is never measured
+        server = Server(QuantumCircuit(4), workers=1, backend="aer")
+        self.addCleanup(server.close)
+        cipher = Client().encrypt(1, server, width=2)
+        with self.assertRaises(TypeError):
+            server.submit(cipher)
+        with self.assertRaises(TypeError):
+            server.submit_packed([CIRCUITS[0], cipher])
+        self.assertIsNone(server._pool)
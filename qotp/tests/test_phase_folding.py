@@ -0,0 +1,86 @@
+import random
+import unittest
+
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Operator
+import numpy as np
+
+from util import draper_adder, phase_fold, t_count, to_standard
+
+PHASE_GATES = ["t", "tdg", "s", "sdg", "z"]
+# t_count only sees P(+-pi/4): other angles with a T part (3pi/4, or RZ(pi/4))
+# would be counted after folding and not before
+P_ANGLES = [np.pi / 4, -np.pi / 4, np.pi / 2, -np.pi / 2, 0.3]
+RZ_ANGLES = [np.pi / 2, np.pi, 0.3]
+
+
+def random_clifford_t(num_qubits: int, num_gates: int, seed: int) -> QuantumCircuit:
+    rng = random.Random(seed)
+    qc = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        a, b = rng.sample(range(num_qubits), 2)
+        g = rng.random()
+        if g < 0.15:
+            qc.h(a)
+        elif g < 0.45:
+            qc.cx(a, b)
+        elif g < 0.5:
+            qc.x(a)
+        elif g < 0.8:
+            getattr(qc, rng.choice(PHASE_GATES))(a)
+        elif g < 0.9:
+            qc.p(rng.choice(P_ANGLES), a)
+        else:
+            qc.rz(rng.choice(RZ_ANGLES), a)
+    return qc
+
+
+class TestPhaseFold(unittest.TestCase):
+
+    def test_random_circuits(self):
+        for seed in range(40):
+            qc = random_clifford_t(3 + seed % 2, 40, seed)
+            folded = phase_fold(qc)
+            self.assertEqual(Operator(folded), Operator(qc))
+            self.assertLessEqual(t_count(folded), t_count(qc))
+
+    def test_folds_a_parity(self):
+        qc = QuantumCircuit(2)
+        qc.t(0)
+        qc.cx(0, 1)
+        qc.cx(0, 1)
+        qc.t(0)
+        folded = phase_fold(qc)
+        self.assertEqual(t_count(qc), 2)
+        self.assertEqual(t_count(folded), 0)
+        self.assertEqual(Operator(folded), Operator(qc))
+
+    def test_other_angles(self):
+        qc = QuantumCircuit(2)
+        qc.p(3 * np.pi / 4, 0)
+        qc.rz(np.pi / 4, 1)
+        qc.cx(0, 1)
+        qc.p(0.2, 1)
+        qc.cx(0, 1)
+        qc.rz(-0.2, 1)
+        self.assertEqual(Operator(phase_fold(qc)), Operator(qc))
+
+    def test_h_starts_a_new_variable(self):
+        qc = QuantumCircuit(1)
+        qc.t(0)
+        qc.h(0)
+        qc.t(0)
+        self.assertEqual(t_count(phase_fold(qc)), 2)
+
+    def test_adders(self):
+        for n_bits in (2, 3, 4):
+            standard = to_standard(draper_adder(n_bits))
+            folded = phase_fold(standard)
+            self.assertTrue(Operator(folded).equiv(Operator(draper_adder(n_bits))))
+            self.assertLess(t_count(folded), t_count(standard))
+
+    def test_to_standard_reports_t_count(self):
+        qc = to_standard(draper_adder(3), optimize_t=True, verify=True)
+        before = t_count(to_standard(draper_adder(3)))
+        self.assertEqual(qc.metadata["t_count"], {"before": before, "after": t_count(qc)})
+        self.assertLess(t_count(qc), before)
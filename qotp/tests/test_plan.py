@@ -0,0 +1,312 @@
+import unittest
+
+from qiskit import QuantumCircuit
+from qiskit.circuit import Gate
+from qiskit.circuit.library import (
+    CHGate,
+    PauliEvolutionGate,
+    RXGate,
+    SwapGate,
+    UnitaryGate,
+)
+from qiskit.quantum_info import (
+    Clifford,
+    Operator,
+    Pauli,
+    SparsePauliOp,
+    random_clifford,
+)
+import numpy as np
+
+from core.plan import UNVERIFIED, KeyUpdatePlan, derived_rule, gate_rule
+from helpers import (
+    CLIFFORD_GATES,
+    assert_decrypts,
+    naive_update,
+    random_circuit,
+    random_pad,
+)
+from util.quantum_tools import clifford_rule
+
+
+class TestKeyUpdatePlan(unittest.TestCase):
+
+    def test_apply_matches_naive_rule(self):
+        for seed in range(20):
+            qc = random_circuit(5, 120, seed)
+            pad = random_pad(5, seed)
+            keys = pad.copy()
+            corrections = KeyUpdatePlan(qc).apply(keys)
+            expected = pad.copy()
+            self.assertEqual(corrections.tolist(), naive_update(qc, expected))
+            self.assertEqual(keys, expected)
+
+    def test_run_in_chunks(self):
+        qc = random_circuit(5, 200, seed=1)
+        plan = KeyUpdatePlan(qc)
+        pad = random_pad(5, seed=1)
+        whole = []
+        v = plan.run(plan.pack(pad), 0, len(plan.steps), whole)
+        chunks = []
+        w = plan.pack(pad)
+        for start in range(0, len(plan.steps), 7):
+            w = plan.run(w, start, min(start + 7, len(plan.steps)), chunks)
+        self.assertEqual(v, w)
+        self.assertEqual(whole, chunks)
+
+    def test_pack_unpack(self):
+        qc = random_circuit(9, 10, seed=2)
+        plan = KeyUpdatePlan(qc)
+        pad = random_pad(9, seed=2)
+        keys = random_pad(9, seed=3)
+        plan.unpack(plan.pack(pad), keys)
+        self.assertEqual(keys, pad)
+
+    def test_apply_batch_matches_apply(self):
+        qc = random_circuit(5, 150, seed=4)
+        plan = KeyUpdatePlan(qc)
+        pads = [random_pad(5, seed) for seed in range(16)]
+        x = np.stack([pad.x for pad in pads], axis=1)
+        z = np.stack([pad.z for pad in pads], axis=1)
+        corrections = plan.apply_batch(x, z)
+        for i, pad in enumerate(pads):
+            keys = pad.copy()
+            self.assertEqual(plan.apply(keys).tolist(), corrections[:, i].tolist())
+            self.assertEqual(keys.x.tolist(), x[:, i].tolist())
+            self.assertEqual(keys.z.tolist(), z[:, i].tolist())
+
+    def test_no_non_clifford_gate(self):
+        qc = random_circuit(4, 60, seed=5, gates={1: ["h", "s", "x"], 2: ["cx"]})
+        qc.data = [i for i in qc.data if i.name != "p"]
+        plan = KeyUpdatePlan(qc)
+        self.assertEqual(plan.t_count, 0)
+        self.assertFalse(plan.needs_dummy())
+        self.assertEqual(plan.apply(random_pad(4, seed=5)).tolist(), [])
+
+
+class TestCorrectedCircuit(unittest.TestCase):
+
+    def test_decrypts(self):
+        for seed in range(12):
+            qc = random_circuit(4, 60, seed)
+            assert_decrypts(self, qc, random_pad(4, seed), value=seed % 16)
+
+    def test_shared_plan(self):
+        qc = random_circuit(4, 60, seed=6)
+        plan = KeyUpdatePlan(qc)
+        for seed in range(4):
+            assert_decrypts(self, qc, random_pad(4, seed), value=seed, plan=plan)
+
+
+def rewrite(qc: QuantumCircuit, corrections: list[bool]) -> list[tuple]:
+    """
+    The corrected circuit written gate by gate: every non-Clifford phase
+    is followed by its correction, on its qubit or on the dummy (the last).
+    """
+    dummy = qc.num_qubits - 1
+    corrections = iter(corrections)
+    out = []
+    for instruction in qc.data:
+        qubits = tuple(qc.find_bit(q).index for q in instruction.qubits)
+        out.append((instruction.name, qubits, tuple(instruction.params)))
+        theta = {"t": np.pi / 4, "tdg": -np.pi / 4}.get(
+            instruction.name, instruction.params[0] if instruction.name == "p" else 0
+        )
+        if np.isclose(np.sin(2 * theta), 0):
+            continue
+        qubit = qubits[0] if next(corrections) else dummy
+        if np.isclose(theta, np.pi / 4):
+            out.append(("s", (qubit,), ()))
+        elif np.isclose(theta, -np.pi / 4):
+            out.append(("sdg", (qubit,), ()))
+        else:
+            out.append(("p", (qubit,), (-2 * theta,)))
+    return out
+
+
+def written(qc: QuantumCircuit) -> list[tuple]:
+    return [
+        (
+            instruction.name,
+            tuple(qc.find_bit(q).index for q in instruction.qubits),
+            tuple(float(p) for p in instruction.params),
+        )
+        for instruction in qc.data
+    ]
+
+
+class TestEmit(unittest.TestCase):
+
+    def test_matches_gate_by_gate_rewrite(self):
+        for seed in range(10):
+            qc = random_circuit(5, 150, seed)
+            plan = KeyUpdatePlan(qc)
+            corrections = plan.apply(random_pad(5, seed))
+            emitted = plan.emit(corrections, dummy_qubit_idx=5)
+            expected = rewrite(qc, naive_update(qc, random_pad(5, seed)))
+            self.assertEqual(len(emitted.data), len(expected))
+            for got, want in zip(written(emitted), expected):
+                self.assertEqual(got[:2], want[:2])
+                np.testing.assert_allclose(got[2], want[2])
+
+    def test_emit_into_target_bits(self):
+        qc = random_circuit(3, 40, seed=1)
+        plan = KeyUpdatePlan(qc)
+        corrections = plan.apply(random_pad(3, seed=1))
+        target = QuantumCircuit(4, 2)
+        target.x(0)
+        plan.emit(corrections, 3, target)
+        self.assertEqual(target.data[0].name, "x")
+        self.assertEqual(written(target)[1:], written(plan.emit(corrections, 3)))
+
+    def test_needs_dummy(self):
+        qc = random_circuit(3, 40, seed=2)
+        plan = KeyUpdatePlan(qc)
+        with self.assertRaises(ValueError):
+            plan.emit(plan.apply(random_pad(3, seed=2)), None)
+
+    def test_unverified_gates_pass_through(self):
+        qc = QuantumCircuit(3)
+        qc.h(0)
+        qc.rx(0.3, 1)
+        qc.reset(2)
+        plan = KeyUpdatePlan(qc)
+        self.assertEqual([name for _, name, _ in plan.unverified], ["rx", "reset"])
+        self.assertEqual(written(plan.emit(plan.apply(random_pad(2, 0)), 2)), written(qc))
+
+    def test_matrix_parameters(self):
+        # parameters that cannot be hashed or turned into a float
+        rx = RXGate(0.3).to_matrix()
+        qc = QuantumCircuit(3)
+        qc.h(0)
+        qc.append(UnitaryGate(rx), [1])
+        qc.append(PauliEvolutionGate(SparsePauliOp("ZZ"), time=0.3), [0, 1])
+        plan = KeyUpdatePlan(qc)
+        self.assertEqual([name for _, name, _ in plan.unverified], ["unitary", "PauliEvolution"])
+        out = plan.emit(plan.apply(random_pad(2, 0)), 2)
+        self.assertEqual([i.name for i in out.data], [i.name for i in qc.data])
+        self.assertIs(gate_rule("unitary", [rx]), UNVERIFIED)
+
+    def test_clifford_unitary_gate(self):
+        # a Clifford given as a matrix gets its derived rule
+        qc = random_circuit(3, 30, seed=5)
+        qc.append(UnitaryGate(random_clifford(2, seed=5).to_operator()), [0, 2])
+        qc.compose(random_circuit(3, 30, seed=6), inplace=True)
+        self.assertEqual(KeyUpdatePlan(qc).unverified, [])
+        assert_decrypts(self, qc, random_pad(3, seed=5), 5)
+
+    def test_rules_are_cached(self):
+        self.assertIs(gate_rule("p", [np.pi / 4]), gate_rule("p", [np.pi / 4]))
+        self.assertIs(gate_rule("p", [0.3]), gate_rule("p", [0.3 + 1e-13]))
+        self.assertEqual(gate_rule("p", [np.pi / 2]), ("s",))
+
+
+class TestDerivedRules(unittest.TestCase):
+
+    def test_apply_matches_pauli_evolution(self):
+        for seed in range(20):
+            qc = random_circuit(5, 120, seed, gates=CLIFFORD_GATES)
+            pad = random_pad(5, seed)
+            keys = pad.copy()
+            plan = KeyUpdatePlan(qc)
+            self.assertEqual(plan.unverified, [])
+            corrections = plan.apply(keys)
+            expected = pad.copy()
+            self.assertEqual(corrections.tolist(), naive_update(qc, expected))
+            self.assertEqual(keys, expected)
+
+    def test_decrypts(self):
+        for seed in range(8):
+            qc = random_circuit(4, 60, seed, gates=CLIFFORD_GATES)
+            assert_decrypts(self, qc, random_pad(4, seed), value=seed)
+
+    def test_random_three_qubit_clifford(self):
+        for seed in range(5):
+            gate = random_clifford(3, seed=seed).to_circuit().to_gate()
+            m = clifford_rule(Operator(gate).data)
+            for j in range(6):
+                # column j is the image of X_j, then Z_{j-3}
+                v = np.zeros(6, dtype=bool)
+                v[j] = True
+                image = Pauli((v[3:], v[:3])).evolve(Clifford(gate), frame="s")
+                self.assertEqual(m[:, j].tolist(), [*image.x, *image.z])
+            qc = QuantumCircuit(4)
+            qc.h(0)
+            qc.append(gate, [2, 0, 1])
+            qc.t(1)
+            assert_decrypts(self, qc, random_pad(3, seed), value=seed)
+
+    def test_non_clifford(self):
+        self.assertIsNone(clifford_rule(CHGate().to_matrix()))
+        qc = QuantumCircuit(2)
+        qc.ch(0, 1)
+        self.assertEqual(derived_rule(qc.data[0]), UNVERIFIED)
+
+    def test_custom_gate_with_standard_name(self):
+        definition = QuantumCircuit(2)
+        definition.cx(0, 1)
+        gate = Gate("swap", 2, [])
+        gate.definition = definition
+        qc = QuantumCircuit(2)
+        qc.append(gate, [0, 1])
+        qc.swap(0, 1)
+        qc.cx(0, 1)
+        custom, standard, cx = (derived_rule(instruction) for instruction in qc.data)
+        # derived from its own matrix, not served from the cache of swap
+        self.assertEqual(custom, cx)
+        self.assertNotEqual(custom, standard)
+        self.assertIs(derived_rule(qc.data[1]), standard)
+        # X on qubit 0 of a swap goes to qubit 1
+        self.assertEqual(clifford_rule(SwapGate().to_matrix())[:, 0].tolist(), [0, 1, 0, 0])
+
+
+# gates that keep most qubits classical, so that spares exist
+CLASSICAL_GATES = {1: ["x", "s", "t", "tdg", "z"], 2: ["cx", "cz", "swap"]}
+
+
+class TestRecycle(unittest.TestCase):
+
+    def test_decrypts(self):
+        for seed in range(12):
+            gates = CLASSICAL_GATES if seed % 2 else CLIFFORD_GATES
+            qc = random_circuit(4, 50, seed, gates=gates)
+            if seed % 3 == 0:
+                qc.h(seed % 4)
+                qc.t(seed % 4)
+            assert_decrypts(self, qc, random_pad(4, seed), value=seed, correction="recycle")
+
+    def test_spares_hold_classical_bits(self):
+        qc = QuantumCircuit(4)
+        qc.h(0)
+        qc.t(0)  # qubits 1 to 3 are classical
+        qc.h(1)
+        qc.cx(1, 2)  # 2 is no longer classical
+        qc.t(1)
+        qc.h(3)
+        qc.t(3)  # every qubit is in superposition: no spare
+        plan = KeyUpdatePlan(qc)
+        self.assertEqual(plan.spare_qubits(), [1, 3, None])
+        self.assertTrue(plan.needs_dummy("recycle"))
+
+    def test_without_dummy(self):
+        qc = QuantumCircuit(4)
+        qc.h(0)
+        qc.t(0)
+        qc.cx(0, 1)
+        qc.tdg(1)
+        qc.p(0.3, 0)
+        plan = KeyUpdatePlan(qc)
+        self.assertEqual(plan.spare_qubits(), [1, 2, 2])
+        self.assertFalse(plan.needs_dummy("recycle"))
+        self.assertTrue(plan.needs_dummy("dummy"))
+        corrections = plan.apply(random_pad(3, seed=1))
+        corrected = plan.emit(corrections, None, correction="recycle")
+        # qubit 3, free for a dummy, is never used
+        used = {corrected.find_bit(q).index for i in corrected.data for q in i.qubits}
+        self.assertEqual(used, {0, 1, 2})
+        for seed in range(4):
+            assert_decrypts(self, qc, random_pad(3, seed), value=seed, correction="recycle")
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            KeyUpdatePlan(random_circuit(2, 10, seed=0)).needs_dummy("reuse")
@@ -0,0 +1,39 @@
+import unittest
+
+from qiskit.circuit.library import CXGate, HGate, SwapGate
+import numpy as np
+
+from util.quantum_tools import clifford_matrix
+
+X = np.array([[0, 1], [1, 0]])
+Z = np.diag([1, -1])
+I = np.eye(2)
+
+
+class TestCliffordMatrix(unittest.TestCase):
+
+    def test_one_qubit(self):
+        images = clifford_matrix(HGate().to_matrix())
+        np.testing.assert_allclose(images["x_result"], Z, atol=1e-12)
+        np.testing.assert_allclose(images["z_result"], X, atol=1e-12)
+
+    def test_default_is_most_significant_qubit(self):
+        u = CXGate().to_matrix()
+        default = clifford_matrix(u)
+        for key, value in clifford_matrix(u, qubit=1).items():
+            np.testing.assert_allclose(default[key], value)
+        u_dg = u.conj().T
+        np.testing.assert_allclose(default["x_result"], u @ np.kron(X, I) @ u_dg)
+        np.testing.assert_allclose(default["z_result"], u @ np.kron(Z, I) @ u_dg)
+
+    def test_qubit(self):
+        # qubit 0 of a swap goes to qubit 1
+        images = clifford_matrix(SwapGate().to_matrix(), qubit=0)
+        np.testing.assert_allclose(images["x_result"], np.kron(X, I))
+        np.testing.assert_allclose(images["z_result"], np.kron(Z, I))
+
+    def test_bad_qubit(self):
+        with self.assertRaises(ValueError):
+            clifford_matrix(HGate().to_matrix(), qubit=1)
+        with self.assertRaises(ValueError):
+            clifford_matrix(np.eye(3))
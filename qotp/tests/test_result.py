@@ -0,0 +1,126 @@
+import unittest
+
+from qiskit import QuantumCircuit
+import numpy as np
+
+from core.pipe import adder_probabilities
+from util import (
+    choose_method,
+    draper_adder,
+    get_result_auto,
+    get_result_exact,
+    to_standard,
+)
+
+
+def adder(a: int, b: int, n_bits: int = 2) -> QuantumCircuit:
+    """
+    Plain n-bit adder on a and b, measuring the register of b.
+    """
+    qc = QuantumCircuit(2 * n_bits, n_bits)
+    for i in range(n_bits):
+        if a >> i & 1:
+            qc.x(i)
+        if b >> i & 1:
+            qc.x(n_bits + i)
+    qc.compose(to_standard(draper_adder(n_bits)), inplace=True)
+    qc.measure(range(n_bits, 2 * n_bits), range(n_bits))
+    return qc
+
+
+class TestGetResultAuto(unittest.TestCase):
+
+    def test_methods(self):
+        clifford = QuantumCircuit(2, 2)
+        clifford.h(0)
+        clifford.cy(0, 1)
+        clifford.measure([0, 1], [0, 1])
+        self.assertEqual(choose_method(clifford)[:2], ("stabilizer", 0))
+
+        method, t_count, _ = choose_method(adder(1, 2))
+        self.assertEqual(method, "extended_stabilizer")
+        self.assertGreater(t_count, 0)
+        self.assertEqual(choose_method(adder(1, 2), t_threshold=t_count - 1)[0], "statevector")
+
+        rotation = QuantumCircuit(1, 1)
+        rotation.rx(0.3, 0)
+        self.assertEqual(choose_method(rotation)[:2], ("statevector", -1))
+
+    def test_adder_on_every_method(self):
+        # the 1-bit adder is Clifford (H and CZ), wider ones need T gates
+        for n_bits, method in [(1, "stabilizer"), (2, "extended_stabilizer")]:
+            for a in range(2**n_bits):
+                for b in range(2**n_bits):
+                    qc = adder(a, b, n_bits)
+                    # statevector probabilities: a single outcome, a + b
+                    probabilities = get_result_exact(qc)
+                    self.assertAlmostEqual(probabilities[(a + b) % 2**n_bits], 1)
+                    bits = format((a + b) % 2**n_bits, f"0{n_bits}b")
+
+                    counts, report = get_result_auto(qc, shots=256, seed_simulator=1)
+                    self.assertEqual(report["method"], method)
+                    if method == "stabilizer":
+                        self.assertEqual(counts, {bits: 256})
+                    else:
+                        # sampled from an approximation of the state
+                        self.assertGreaterEqual(counts.get(bits, 0), 240)
+                        counts, report = get_result_auto(qc, shots=256, t_threshold=0, seed_simulator=1)
+                        self.assertEqual(report["method"], "statevector")
+                        self.assertEqual(counts, {bits: 256})
+
+    def test_clifford_t_with_cy(self):
+        qc = QuantumCircuit(2, 2)
+        qc.x(0)
+        qc.t(0)
+        qc.cy(0, 1)
+        qc.tdg(1)
+        qc.measure([0, 1], [0, 1])
+        # failed on the extended stabilizer, which has no cy gate
+        counts, report = get_result_auto(qc, shots=256, seed_simulator=1)
+        self.assertEqual(report["method"], "extended_stabilizer")
+        self.assertGreaterEqual(counts.get("11", 0), 240)
+
+    def test_stabilizer_distribution(self):
+        qc = QuantumCircuit(2, 2)
+        qc.h(0)
+        qc.cy(0, 1)
+        qc.measure([0, 1], [0, 1])
+        counts, report = get_result_auto(qc, shots=512)
+        self.assertEqual(report, {"method": "stabilizer", "t_count": 0, "num_qubits": 2})
+        self.assertEqual(set(counts), {"00", "11"})
+
+
+class TestGetResultExact(unittest.TestCase):
+
+    def test_outcome_order(self):
+        # measured qubits out of order and apart: clbit i is bit i of the index
+        qc = QuantumCircuit(5, 3)
+        qc.x(4)
+        qc.h(0)
+        qc.cx(0, 2)
+        qc.cx(1, 3)
+        qc.cx(2, 4)
+        qc.cx(0, 4)
+        qc.measure([4, 0, 2], [0, 1, 2])
+        expected = np.zeros(8)
+        expected[[0b001, 0b111]] = 0.5
+        np.testing.assert_allclose(get_result_exact(qc), expected, atol=1e-9)
+        # laid out on other physical qubits of FakeGeneva, with its noise
+        np.testing.assert_allclose(get_result_exact(qc, backend="geneva"), expected, atol=0.05)
+
+    def test_invalid_circuits(self):
+        with self.assertRaises(ValueError):
+            get_result_exact(QuantumCircuit(2, 2))
+        qc = QuantumCircuit(2, 2)
+        qc.measure(0, 0)
+        qc.x(1)
+        qc.measure(1, 1)
+        with self.assertRaises(ValueError):
+            get_result_exact(qc)
+
+    def test_adder_probabilities(self):
+        for n_bits in (1, 2, 3):
+            for a, b in [(0, 0), (1, 2 ** n_bits - 1), (2 ** n_bits - 1, 2 ** n_bits - 1)]:
+                probabilities = adder_probabilities(a, b, n_bits)
+                self.assertEqual(len(probabilities), 2**n_bits)
+                self.assertAlmostEqual(probabilities[(a + b) % 2**n_bits], 1)
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+
+from qiskit import QuantumCircuit
+import numpy as np
+
+from core.ciphertext import Ciphertext
+from core.keys import KeyState
+from core.serialization import (
+    CiphertextArchive,
+    dumps_ciphertext,
+    load_keys,
+    loads_ciphertext,
+    pack_keys,
+    save_ciphertexts,
+    save_keys,
+    unpack_keys,
+)
+
+WIDTHS = [0, 1, 7, 8, 9, 13, 64, 67]
+
+
+def random_keys(num_qubits: int, seed: int) -> KeyState:
+    rng = np.random.default_rng(seed)
+    return KeyState.from_arrays(
+        rng.integers(0, 2, num_qubits), rng.integers(0, 2, num_qubits)
+    )
+
+
+def random_ciphertext(num_qubits: int, seed: int) -> Ciphertext:
+    keys = random_keys(num_qubits, seed)
+    circuit = QuantumCircuit(num_qubits)
+    for i in range(num_qubits):
+        if keys.x[i]:
+            circuit.x(i)
+        if keys.z[i]:
+            circuit.z(i)
+    return Ciphertext(circuit, keys)
+
+
+def ranges(num_qubits: int):
+    """
+    Every [start, stop) of a register, on and off byte boundaries.
+    """
+    for start in range(num_qubits + 1):
+        for stop in range(start, num_qubits + 1):
+            yield start, stop
+
+
+class TestKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_pack_round_trip(self):
+        for seed, width in enumerate(WIDTHS):
+            keys = random_keys(width, seed)
+            data = pack_keys(keys)
+            self.assertEqual(len(data), 2 * ((width + 7) // 8))
+            self.assertEqual(unpack_keys(data, width), keys)
+
+    def test_sub_ranges(self):
+        for seed, width in enumerate([9, 13, 17, 24]):
+            keys = random_keys(width, seed)
+            data = pack_keys(keys)
+            for start, stop in ranges(width):
+                part = unpack_keys(data, width, start, stop)
+                self.assertEqual(part.x.tolist(), keys.x[start:stop].tolist())
+                self.assertEqual(part.z.tolist(), keys.z[start:stop].tolist())
+
+    def test_out_of_range(self):
+        data = pack_keys(random_keys(9, 0))
+        for start, stop in [(-1, 3), (4, 3), (0, 10)]:
+            with self.assertRaises(ValueError):
+                unpack_keys(data, 9, start, stop)
+
+    def test_file_round_trip(self):
+        for seed, width in enumerate(WIDTHS):
+            keys = random_keys(width, seed)
+            path = os.path.join(self.tmp.name, f"{width}.qkey")
+            save_keys(path, keys)
+            self.assertEqual(load_keys(path), keys)
+            for start, stop in [(0, width), (width // 3, width), (width // 3, 2 * width // 3)]:
+                part = load_keys(path, start, stop)
+                self.assertEqual(part.x.tolist(), keys.x[start:stop].tolist())
+                self.assertEqual(part.z.tolist(), keys.z[start:stop].tolist())
+
+    def test_bad_file(self):
+        path = os.path.join(self.tmp.name, "bad.qkey")
+        with open(path, "wb") as f:
+            f.write(b"QCTX" + bytes(16))
+        with self.assertRaises(ValueError):
+            load_keys(path)
+
+
+class TestCiphertexts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def assert_same(self, ciphertext: Ciphertext, expected: Ciphertext) -> None:
+        self.assertEqual(ciphertext.keys, expected.keys)
+        self.assertEqual(ciphertext.circuit, expected.circuit)
+
+    def test_round_trip(self):
+        for seed, width in enumerate([1, 9, 13]):
+            ciphertext = random_ciphertext(width, seed)
+            self.assert_same(loads_ciphertext(dumps_ciphertext(ciphertext)), ciphertext)
+
+    def test_archive(self):
+        for count in (0, 1, 12):
+            ciphertexts = [random_ciphertext(1 + i % 11, i) for i in range(count)]
+            path = os.path.join(self.tmp.name, f"{count}.qcta")
+            # any iterable is streamed to the file
+            self.assertEqual(save_ciphertexts(path, iter(ciphertexts)), count)
+            with CiphertextArchive(path) as archive:
+                self.assertEqual(len(archive), count)
+                for i, expected in enumerate(ciphertexts):
+                    self.assert_same(archive[i], expected)
+                    self.assert_same(archive[i - count], expected)
+                    self.assertEqual(archive.keys(i), expected.keys)
+                    self.assertEqual(archive.keys(i - count), expected.keys)
+                for ciphertext, expected in zip(archive, ciphertexts, strict=True):
+                    self.assert_same(ciphertext, expected)
+                for i in (count, -count - 1):
+                    with self.assertRaises(IndexError):
+                        archive[i]
+                    with self.assertRaises(IndexError):
+                        archive.keys(i)
+
+    def test_close_with_records_alive(self):
+        ciphertexts = [random_ciphertext(5, i) for i in range(3)]
+        path = os.path.join(self.tmp.name, "alive.qcta")
+        save_ciphertexts(path, ciphertexts)
+        archive = CiphertextArchive(path)
+        first = archive[0]
+        keys = archive.keys(-1)
+        records = iter(archive)
+        next(records)
+        archive.close()
+        # what was read does not point into the closed map
+        self.assert_same(first, ciphertexts[0])
+        self.assertEqual(keys, ciphertexts[-1].keys)
@@ -0,0 +1,52 @@
+import unittest
+
+from core.pipe import adder_pipe_batch, adder_pipe_template
+from core.server import Server
+from core.template import EncryptedTemplate
+from util import draper_adder, get_simulator, to_standard
+
+PAIRS = [(a, b) for a in range(4) for b in range(4)]
+
+
+def most_likely(counts: dict) -> int:
+    return int(max(counts, key=counts.get), 2)
+
+
+def ideal_template(measured: int = -1) -> EncryptedTemplate:
+    sv = Server(to_standard(draper_adder(2)))
+    return EncryptedTemplate(sv, [2, 2], measured=measured, simulator=get_simulator("aer"))
+
+
+class TestEncryptedTemplate(unittest.TestCase):
+
+    def assert_sums(self, template: EncryptedTemplate) -> None:
+        results = adder_pipe_template(PAIRS, shots=64, template=template)
+        for (a, b), counts in zip(PAIRS, results):
+            self.assertEqual(counts, {format((a + b) % 4, "02b"): 64})
+
+    def test_default_measures_last_register(self):
+        template = ideal_template()
+        self.assertEqual((template.measured_offset, template.measured_width), (2, 2))
+        self.assert_sums(template)
+
+    def test_measured_register(self):
+        for measured, offset in [(0, 0), (1, 2), (-2, 0)]:
+            self.assertEqual(ideal_template(measured).measured_offset, offset)
+
+    def test_bind_by_name(self):
+        # the second template gets the transpiled circuit cached by the first,
+        # which holds the parameters of the first
+        first = ideal_template()
+        second = ideal_template()
+        parameters = set(second.transpiled.parameters)
+        self.assertLessEqual(parameters, set(first.circuit.parameters))
+        self.assertTrue(parameters.isdisjoint(second.circuit.parameters))
+        self.assert_sums(second)
+
+    def test_matches_batch(self):
+        from_template = adder_pipe_template(PAIRS, shots=2048)
+        from_batch = adder_pipe_batch(PAIRS, shots=2048)
+        for (a, b), template_counts, batch_counts in zip(PAIRS, from_template, from_batch):
+            self.assertEqual(sum(template_counts.values()), 2048)
+            self.assertEqual(most_likely(template_counts), most_likely(batch_counts))
+            self.assertEqual(most_likely(template_counts), (a + b) % 4)
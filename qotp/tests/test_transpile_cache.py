@@ -0,0 +1,87 @@
+import unittest
+import warnings
+import os
+
+from qiskit import QuantumCircuit
+from qiskit.circuit import Gate
+
+from util import TranspileCache, circuit_digest, draper_adder, get_simulator
+from util.transpile_cache import default_directory, target_fingerprint
+
+
+def conditioned_x(value: int, clbit: int = 0) -> QuantumCircuit:
+    qc = QuantumCircuit(2, 2)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        qc.x(0).c_if(clbit, value)
+    return qc
+
+
+def if_test(gate: str) -> QuantumCircuit:
+    qc = QuantumCircuit(2, 2)
+    with qc.if_test((qc.clbits[1], 1)):
+        getattr(qc, gate)(1)
+    return qc
+
+
+class TestCircuitDigest(unittest.TestCase):
+
+    def test_same_structure(self):
+        self.assertEqual(circuit_digest(draper_adder(2)), circuit_digest(draper_adder(2)))
+        self.assertNotEqual(circuit_digest(draper_adder(2)), circuit_digest(draper_adder(3)))
+
+    def test_condition(self):
+        self.assertEqual(circuit_digest(conditioned_x(1)), circuit_digest(conditioned_x(1)))
+        self.assertNotEqual(circuit_digest(conditioned_x(1)), circuit_digest(conditioned_x(0)))
+        self.assertNotEqual(circuit_digest(conditioned_x(1)), circuit_digest(conditioned_x(1, 1)))
+        unconditioned = QuantumCircuit(2, 2)
+        unconditioned.x(0)
+        self.assertNotEqual(circuit_digest(conditioned_x(1)), circuit_digest(unconditioned))
+
+    def test_control_flow_blocks(self):
+        self.assertEqual(circuit_digest(if_test("h")), circuit_digest(if_test("h")))
+        self.assertNotEqual(circuit_digest(if_test("h")), circuit_digest(if_test("x")))
+
+    def test_custom_gate_with_standard_name(self):
+        definition = QuantumCircuit(1)
+        definition.x(0)
+        gate = Gate("h", 1, [])
+        gate.definition = definition
+        custom = QuantumCircuit(1)
+        custom.append(gate, [0])
+        standard = QuantumCircuit(1)
+        standard.h(0)
+        self.assertNotEqual(circuit_digest(custom), circuit_digest(standard))
+
+
+class TestTranspileCache(unittest.TestCase):
+
+    def test_conditions_do_not_share_entries(self):
+        cache = TranspileCache()
+        self.assertNotEqual(
+            cache.key(conditioned_x(1), "transpile"), cache.key(conditioned_x(0), "transpile")
+        )
+
+    def test_copies_in_and_out(self):
+        cache = TranspileCache()
+        key = cache.key(draper_adder(2), "transpile")
+        cache.put(key, draper_adder(2))
+        cache.get(key).x(0)
+        self.assertEqual(circuit_digest(cache.get(key)), circuit_digest(draper_adder(2)))
+        self.assertEqual(cache.hits["memory"], 2)
+
+    def test_memory_only_by_default(self):
+        previous = os.environ.pop("QOTP_CACHE_DIR", None)
+        try:
+            self.assertIsNone(default_directory())
+        finally:
+            if previous is not None:
+                os.environ["QOTP_CACHE_DIR"] = previous
+
+    def test_target_is_part_of_the_key(self):
+        self.assertNotEqual(
+            target_fingerprint(get_simulator("aer")), target_fingerprint(get_simulator("geneva"))
+        )
+        self.assertEqual(
+            target_fingerprint(get_simulator("geneva")), target_fingerprint(get_simulator("geneva"))
+        )
@@ -1,3 +1,26 @@
-from .algorithms import two_qubit_adder
-from .quantum_tools import init_gate, to_standard, is_t_gate, is_t_dg
-from .result import get_result_geneva
+from .algorithms import two_qubit_adder, draper_adder, draper_accumulator
+from .quantum_tools import (
+    init_gate,
+    to_standard,
+    is_t_gate,
+    is_t_dg,
+    circuit_digest,
+    clifford_rule,
+)
+from .phase_folding import phase_fold, t_count
+from .backends import get_simulator, register_backend, clear_simulators
+from .result import (
+    get_geneva_simulator,
+    get_result_geneva,
+    get_results_geneva,
+    get_result_auto,
+    get_result_exact,
+    choose_method,
+)
+from .tracing import span, enable_tracing, disable_tracing, get_tracer
+from .transpile_cache import (
+    TranspileCache,
+    cached_transpile,
+    get_transpile_cache,
+    set_transpile_cache,
+)
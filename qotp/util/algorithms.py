@@ -60,19 +60,68 @@ def qft(n, swap=True, inverse=False) -> QuantumCircuit:
     return qc
 
 
-def two_qubit_adder() -> QuantumCircuit:
-    # TODO: universalize the function to take n odd and even.
-    n = 4
-    qc = QuantumCircuit(4)
-    # qc.append(x, [0, 1])
-    # qc.append(y, [2, 3])
-    qc.append(qft(2, inverse=True, swap=False), [2, 3])
+def draper_adder(n: int) -> QuantumCircuit:
+    """
+    Build an n-bit QFT (Draper) adder.
+
+    Qubits [0, n) hold x and qubits [n, 2n) hold y, both little-endian.
+    The circuit maps |x>|y> to |x>|(x + y) mod 2^n>.
+
+    Args:
+        n (int): Number of qubits of each input register.
+
+    Returns:
+        QuantumCircuit: The adder on 2n qubits.
+    """
+    if n < 1:
+        raise ValueError("an adder needs at least one qubit per input")
+    qc = QuantumCircuit(2 * n)
+    qc.name = f"{n}-bit adder"
+    qc.append(qft(n, inverse=True, swap=False), range(n, 2 * n))
 
     for i in range(n):
-        for j in range(i + 2, n):
-            theta = 2 ** (i) * pi / (2 ** (j - (n // 2)))
+        for j in range(i + n, 2 * n):
+            theta = 2 ** (i) * pi / (2 ** (j - n))
             qc.cp(theta=theta, control_qubit=i, target_qubit=j)
-    qc.append(qft(2, inverse=False, swap=False), [2, 3])
+    qc.append(qft(n, inverse=False, swap=False), range(n, 2 * n))
+
+    return qc
+
+
+def draper_accumulator(n: int, k: int) -> QuantumCircuit:
+    """
+    Build an n-bit QFT accumulator of k values.
+
+    Qubits [i*n, (i+1)*n) hold the i-th value, little-endian, and the last
+    register is the accumulator. The circuit maps |x_0>...|x_{k-2}>|y> to
+    |x_0>...|x_{k-2}>|(y + x_0 + ... + x_{k-2}) mod 2^n>: the k-1 phase
+    additions of `draper_adder` share one QFT and one inverse QFT.
+
+    Args:
+        n (int): Number of qubits of each register.
+        k (int): Number of values, the accumulator included.
+
+    Returns:
+        QuantumCircuit: The accumulator on k*n qubits.
+    """
+    if n < 1:
+        raise ValueError("an accumulator needs at least one qubit per value")
+    if k < 2:
+        raise ValueError("an accumulator needs at least two values")
+    acc = (k - 1) * n
+    qc = QuantumCircuit(k * n)
+    qc.name = f"{n}-bit accumulator of {k}"
+    qc.append(qft(n, inverse=True, swap=False), range(acc, acc + n))
+
+    for r in range(k - 1):
+        for i in range(n):
+            for j in range(i, n):
+                theta = 2 ** (i) * pi / (2 ** (j))
+                qc.cp(theta=theta, control_qubit=r * n + i, target_qubit=acc + j)
+    qc.append(qft(n, inverse=False, swap=False), range(acc, acc + n))
 
-    # qc.measure([2, 3], [0, 1])
     return qc
+
+
+def two_qubit_adder() -> QuantumCircuit:
+    return draper_adder(2)
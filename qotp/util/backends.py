@@ -0,0 +1,88 @@
+import threading
+
+# simulators of this process, by (backend name, sorted options)
+_simulators = {}
+_lock = threading.Lock()
+
+
+def _aer():
+    from qiskit_aer import AerSimulator
+
+    return AerSimulator()
+
+
+def _geneva():
+    # the fake provider pulls in most of qiskit_ibm_runtime: import it on first use
+    from qiskit_aer import AerSimulator
+    from qiskit_ibm_runtime.fake_provider import FakeGeneva
+
+    return AerSimulator.from_backend(FakeGeneva())
+
+
+def _depolarizing():
+    from qiskit_aer import AerSimulator
+    from qiskit_aer.noise import NoiseModel, depolarizing_error
+
+    # https://quantum.cloud.ibm.com/docs/en/guides/build-noise-models
+    error = depolarizing_error(1e-3, 1)  # (errreur qubit,nombre de qubit impacté)
+    noise_model = NoiseModel()
+    noise_model.add_all_qubit_quantum_error(error, ["x", "h", "z"])
+    return AerSimulator(noise_model=noise_model)
+
+
+# backend name -> function building its simulator
+BACKENDS = {
+    "aer": _aer,
+    "geneva": _geneva,
+    "depolarizing": _depolarizing,
+}
+
+
+def register_backend(name: str, factory) -> None:
+    """
+    Adds a backend to the registry. `factory()` returns a new simulator.
+    """
+    BACKENDS[name] = factory
+
+
+def get_simulator(backend: str = "aer", **options):
+    """
+    Returns the simulator of a backend, built once per process and per set
+    of Aer options, then shared by every caller.
+
+    Backends: "aer" (ideal), "geneva" (FakeGeneva noise model and coupling
+    map), "depolarizing" (1e-3 depolarizing noise on x, h and z), or any
+    registered one. Options are Aer run options, e.g. `method`,
+    `max_parallel_threads`, `max_parallel_experiments`, `max_parallel_shots`
+    or `seed_simulator`.
+
+    The simulator is shared: set options through this function, not with
+    `set_options` on the returned object.
+
+    Example:
+        >>> sim = get_simulator("geneva", seed_simulator=42)
+        >>> sim is get_simulator("geneva", seed_simulator=42)
+        True
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {backend}, expected one of {list(BACKENDS)}")
+    key = (backend, tuple(sorted(options.items())))
+    simulator = _simulators.get(key)
+    if simulator is None:
+        with _lock:
+            simulator = _simulators.get(key)
+            if simulator is None:
+                simulator = BACKENDS[backend]()
+                if options:
+                    simulator.set_options(**options)
+                _simulators[key] = simulator
+    return simulator
+
+
+def clear_simulators() -> None:
+    """
+    Drops the simulators built so far, e.g. after registering a backend
+    again under the same name.
+    """
+    with _lock:
+        _simulators.clear()
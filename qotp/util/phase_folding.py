@@ -0,0 +1,137 @@
+from qiskit import QuantumCircuit
+from qiskit.circuit import CircuitInstruction
+import numpy as np
+
+from .quantum_tools import is_t_gate, is_t_dg
+
+# phase gates and their angle, RZ and U1 up to a global phase
+PHASE_ANGLES = {
+    "z": np.pi,
+    "s": np.pi / 2,
+    "sdg": -np.pi / 2,
+    "t": np.pi / 4,
+    "tdg": -np.pi / 4,
+}
+PARAMETRIC_PHASES = {"p", "u1", "rz"}
+
+
+def t_count(qc: QuantumCircuit) -> int:
+    """
+    Number of T/T_dg gates (named, or as P(+-pi/4)) of a circuit.
+    """
+    return sum(is_t_gate(i.operation) or is_t_dg(i.operation) for i in qc.data)
+
+
+def _phase_angle(op) -> float | None:
+    if op.name in PHASE_ANGLES:
+        return PHASE_ANGLES[op.name]
+    if op.name in PARAMETRIC_PHASES and not op.is_parameterized():
+        return float(op.params[0])
+    return None
+
+
+def _split_phase(angle: float) -> list[float]:
+    """
+    Writes a phase as at most one Clifford P(k * pi/2) and one T/T_dg,
+    so that the T-count of P(3pi/4) is 1. Other angles are left as is.
+    """
+    angle = (angle + np.pi) % (2 * np.pi) - np.pi
+    if np.isclose(angle, -np.pi):
+        angle = np.pi
+    if np.isclose(angle, 0):
+        return []
+    k = angle / (np.pi / 4)
+    if not np.isclose(k, round(k)) or abs(round(k)) in (1, 2, 4):
+        return [angle]
+    sign = 1 if k > 0 else -1
+    return [sign * np.pi / 2, sign * np.pi / 4]
+
+
+def phase_fold(qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Merges the phase gates that act on the same parity of the circuit's
+    path variables (phase folding).
+
+    Each qubit carries an affine parity (mask, constant) of the path
+    variables: CX and X update it, H and any other gate start a fresh
+    variable. All phase gates applied to the same mask add up; the sum is
+    placed where that mask first appears and the other gates are removed.
+    The unitary is unchanged, up to a global phase that is kept in
+    `global_phase`.
+    """
+    state = {}
+    next_var = 0
+
+    def fresh(q):
+        nonlocal next_var
+        state[q] = (1 << next_var, 0)
+        next_var += 1
+
+    for q in qc.qubits:
+        fresh(q)
+
+    global_phase = float(qc.global_phase) if not qc.parameters else 0.0
+    totals = {}
+    placed = set()
+    # instructions, or (qubit, mask, constant) placeholders for phase gates
+    program = []
+
+    for instruction in qc.data:
+        op = instruction.operation
+        qubits = instruction.qubits
+        if getattr(op, "condition", None) is not None:
+            # classically controlled: the gate may or may not happen
+            for q in qubits:
+                fresh(q)
+            program.append(instruction)
+            continue
+        angle = _phase_angle(op) if len(qubits) == 1 else None
+        if angle is not None:
+            if op.name == "rz":
+                global_phase -= angle / 2
+            mask, const = state[qubits[0]]
+            if mask == 0:
+                global_phase += angle * const
+                continue
+            # on a wire holding mask ^ 1, P(angle) = e^(i angle) P(-angle) on mask
+            if const:
+                global_phase += angle
+                angle = -angle
+            totals[mask] = totals.get(mask, 0.0) + angle
+            program.append((qubits[0], mask, const))
+        elif op.name == "cx":
+            c, t = qubits
+            state[t] = (state[t][0] ^ state[c][0], state[t][1] ^ state[c][1])
+            program.append(instruction)
+        elif op.name == "x":
+            mask, const = state[qubits[0]]
+            state[qubits[0]] = (mask, const ^ 1)
+            program.append(instruction)
+        elif op.name == "swap":
+            a, b = qubits
+            state[a], state[b] = state[b], state[a]
+            program.append(instruction)
+        elif op.name in ("barrier", "id"):
+            program.append(instruction)
+        else:
+            for q in qubits:
+                fresh(q)
+            program.append(instruction)
+
+    folded = QuantumCircuit(*qc.qregs, *qc.cregs, name=qc.name)
+    for entry in program:
+        if isinstance(entry, CircuitInstruction):
+            folded.append(entry.operation, entry.qubits, entry.clbits)
+            continue
+        qubit, mask, const = entry
+        if mask in placed:
+            continue
+        placed.add(mask)
+        angle = totals[mask]
+        if const:
+            global_phase += angle
+            angle = -angle
+        for part in _split_phase(angle):
+            folded.p(part, qubit)
+    folded.global_phase = global_phase
+    return folded
@@ -1,6 +1,11 @@
 from typing import Tuple
-from qiskit import QuantumCircuit, transpile
+from qiskit import ClassicalRegister, QuantumCircuit, transpile
+from qiskit.circuit import ControlFlowOp
+from qiskit.circuit.library import get_standard_gate_name_mapping
+from qiskit.quantum_info import Operator
 from math import pi
+import warnings
+import hashlib
 import numpy as np
 import numpy.typing as npt
 
@@ -37,50 +42,252 @@ def init_gate():
     }
 
 
-init_gate()
+def _gate(name: str) -> npt.NDArray:
+    # GATE is only built when a matrix is first needed
+    if "GATE" not in globals():
+        init_gate()
+    return GATE[name]
 
 
-def clifford_matrix(u) -> dict[str, npt.NDArray]:
+def clifford_matrix(u, qubit: int | None = None) -> dict[str, npt.NDArray]:
     """
-    For 1 qubit matrices only.
-    Returns UXU_dg and UZU_dg.
+    Returns U X_q U_dg and U Z_q U_dg for the qubit q of a unitary
+    on any number of qubits (qubit 0 is the least significant, as in Qiskit).
+    By default q is the most significant qubit, i.e. X (x) I for a 2-qubit
+    gate, as when only 1 and 2-qubit gates were supported.
     If the output matrix is c*P
-    with P in {X,Y,Z,I}
+    with P a tensor product of {X,Y,Z,I}
     and c a constant generally in {i, -i, 1, -1}
     then the matrix is Clifford.
     """
-    u_dg = u.conj().T
-    x_result = 0
-    z_result = 0
-    if len(u) == 2:
-        x_result = u @ GATE["X"] @ u_dg
-        z_result = u @ GATE["Z"] @ u_dg
-
-    elif len(u) == 4:
-        X = np.kron(GATE["X"], GATE["I"])
-        Z = np.kron(GATE["Z"], GATE["I"])
-        x_result = u @ X @ u_dg
-        z_result = u @ Z @ u_dg
-
-    else:
+    num_qubits = int(np.log2(len(u)))
+    if qubit is None:
+        qubit = num_qubits - 1
+    if len(u) != 2**num_qubits or not 0 <= qubit < num_qubits:
         raise ValueError("Unsupported gate size")
+    u_dg = u.conj().T
+    # operators are written most significant qubit first
+    before = np.eye(2 ** (num_qubits - 1 - qubit))
+    after = np.eye(2**qubit)
+    X = np.kron(np.kron(before, _gate("X")), after)
+    Z = np.kron(np.kron(before, _gate("Z")), after)
+    return {"x_result": u @ X @ u_dg, "z_result": u @ Z @ u_dg}
 
-    return {"x_result": x_result, "z_result": z_result}
 
+def _as_pauli(m: npt.NDArray) -> Tuple[int, int] | None:
+    """
+    Bit masks (x, z) such that m = c X^x Z^z, or None if m is not
+    a multiple of a Pauli string.
+    Column e of X^x Z^z is (-1)^(z.e) |x ^ e>.
+    """
+    dim = len(m)
+    x = int(np.argmax(np.abs(m[:, 0])))
+    c = m[x, 0]
+    if np.isclose(c, 0):
+        return None
+    z = 0
+    bit = 1
+    while bit < dim:
+        if np.isclose(m[x ^ bit, bit], -c):
+            z |= bit
+        bit <<= 1
+    e = np.arange(dim)
+    signs = np.array([(-1) ** bin(z & k).count("1") for k in range(dim)])
+    pauli = np.zeros_like(m)
+    pauli[x ^ e, e] = c * signs
+    return (x, z) if np.allclose(m, pauli) else None
+
+
+def clifford_rule(u) -> npt.NDArray | None:
+    """
+    GF(2) key update rule of a gate from its unitary, or None if the gate
+    is not Clifford.
 
-def to_standard(qc: QuantumCircuit) -> QuantumCircuit:
+    A pad X^a Z^b before U is the pad U X^a Z^b U_dg after it, up to a
+    phase. With v = [a_0..a_{k-1}, b_0..b_{k-1}], the new pad is M v mod 2,
+    where column j of M is the image of X_j (j < k) or Z_{j-k} (j >= k).
+    """
+    num_qubits = int(np.log2(len(u)))
+    m = np.zeros((2 * num_qubits, 2 * num_qubits), dtype=np.uint8)
+    for j in range(num_qubits):
+        images = clifford_matrix(u, j)
+        for column, image in ((j, images["x_result"]), (num_qubits + j, images["z_result"])):
+            pauli = _as_pauli(image)
+            if pauli is None:
+                return None
+            x, z = pauli
+            for i in range(num_qubits):
+                m[i, column] = (x >> i) & 1
+                m[num_qubits + i, column] = (z >> i) & 1
+    return m
+
+
+# Clifford gates that the key update handles without decomposition
+HIGH_LEVEL_CLIFFORDS = ["swap", "cz", "cy", "y", "sx", "sxdg", "ecr", "iswap", "dcx"]
+
+
+def to_standard(
+    qc: QuantumCircuit,
+    optimize_t: bool = False,
+    verify: bool = False,
+    keep_cliffords: bool = False,
+) -> QuantumCircuit:
     """
     Transpiles a circuit into a circuit composed of
     only Clifford and T/T_dg gates.
+
+    With `keep_cliffords`, the Clifford gates of HIGH_LEVEL_CLIFFORDS are kept
+    as they are instead of being expanded into H, S and CX: the key update
+    derives their rule from their matrix.
+
+    With `optimize_t`, phase gates are merged by phase folding to reduce the
+    T-count, and the T-count before and after is stored in
+    `metadata["t_count"]`. With `verify`, the result is checked against the
+    unitary of `qc` (small widths only), raising ValueError on a mismatch.
+
+    Results are cached by circuit structure and options (see
+    `TranspileCache`), in memory and on disk.
     """
-    basis_gates = ["h", "s", "sdg", "cx", "x", "z", "t", "tdg", "p", "pdg", "bonsoir"]
-    qc_standard = transpile(
-        qc.decompose(), basis_gates=basis_gates, optimization_level=0
+    from .transpile_cache import get_transpile_cache
+
+    cache = get_transpile_cache()
+    if cache is None:
+        return _to_standard(qc, optimize_t, verify, keep_cliffords)
+    key = cache.key(
+        qc,
+        "to_standard",
+        optimize_t=optimize_t,
+        verify=verify,
+        keep_cliffords=keep_cliffords,
     )
+    qc_standard = cache.get_or_build(
+        key, lambda: _to_standard(qc, optimize_t, verify, keep_cliffords)
+    )
+    # neither is part of the key
+    qc_standard.name = qc.name
+    metadata = dict(qc.metadata or {})
+    if optimize_t:
+        metadata["t_count"] = qc_standard.metadata["t_count"]
+    qc_standard.metadata = metadata
+    return qc_standard
+
+
+def _to_standard(
+    qc: QuantumCircuit, optimize_t: bool, verify: bool, keep_cliffords: bool
+) -> QuantumCircuit:
+    from .phase_folding import phase_fold, t_count
+
+    basis_gates = ["h", "s", "sdg", "cx", "x", "z", "t", "tdg", "p", "pdg", "bonsoir"]
+    if keep_cliffords:
+        basis_gates += HIGH_LEVEL_CLIFFORDS
+        # only expand the gates that are not kept
+        outside = [name for name in qc.count_ops() if name not in basis_gates]
+        decomposed = qc.decompose(gates_to_decompose=outside) if outside else qc
+    else:
+        decomposed = qc.decompose()
+    qc_standard = transpile(decomposed, basis_gates=basis_gates, optimization_level=0)
+    if optimize_t:
+        before = t_count(qc_standard)
+        qc_standard = phase_fold(qc_standard)
+        qc_standard.metadata = {
+            **(qc.metadata or {}),
+            "t_count": {"before": before, "after": t_count(qc_standard)},
+        }
+    if verify:
+        original = Operator(qc.remove_final_measurements(inplace=False))
+        result = Operator(qc_standard.remove_final_measurements(inplace=False))
+        if not original.equiv(result):
+            raise ValueError("standardized circuit is not equivalent to the original")
     # print(qc_standard)
     return qc_standard
 
 
+def circuit_digest(qc: QuantumCircuit) -> str:
+    """
+    Returns a structural hash of a circuit: registers, operations, their
+    parameters (rounded) and the indices of the bits they act on.
+    Custom gates are hashed through their definition, so two identical
+    circuits built independently get the same digest, unlike their QPY bytes.
+    """
+    h = hashlib.sha256()
+    _hash_circuit(qc, h)
+    return h.hexdigest()
+
+
+def _hash_circuit(qc: QuantumCircuit, h) -> None:
+    h.update(repr([(r.name, r.size) for r in qc.qregs]).encode())
+    h.update(repr([(r.name, r.size) for r in qc.cregs]).encode())
+    h.update(repr(float(qc.global_phase)).encode() if not qc.parameters else b"")
+    for instruction in qc.data:
+        op = instruction.operation
+        control_flow = isinstance(op, ControlFlowOp)
+        # the blocks of control flow are hashed below, not as parameters
+        params = [] if control_flow else [_param_key(p) for p in op.params]
+        h.update(
+            repr(
+                (
+                    op.name,
+                    op.num_qubits,
+                    params,
+                    [qc.find_bit(q).index for q in instruction.qubits],
+                    [qc.find_bit(c).index for c in instruction.clbits],
+                    _condition_key(qc, op),
+                )
+            ).encode()
+        )
+        if control_flow:
+            for block in op.blocks:
+                h.update(b"block")
+                _hash_circuit(block, h)
+        elif not _is_standard_gate(op) and op.definition is not None:
+            _hash_circuit(op.definition, h)
+
+
+# standard gates of qiskit by name, built on first use
+_standard_gates = None
+
+
+def _is_standard_gate(op) -> bool:
+    global _standard_gates
+    if _standard_gates is None:
+        _standard_gates = get_standard_gate_name_mapping()
+    # a custom gate may reuse a standard name, not its class
+    standard = _standard_gates.get(op.name)
+    return standard is not None and type(op) is type(standard)
+
+
+def _condition_key(qc: QuantumCircuit, op):
+    if isinstance(op, ControlFlowOp):
+        condition = getattr(op, "condition", None)
+    else:
+        # c_if conditions are deprecated since qiskit 1.3, but still run
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            condition = getattr(op, "condition", None)
+    if condition is None:
+        return None
+    if not isinstance(condition, tuple):
+        # classical expression
+        return str(condition)
+    target, value = condition
+    if isinstance(target, ClassicalRegister):
+        target = ("creg", target.name, target.size)
+    else:
+        target = ("clbit", qc.find_bit(target).index)
+    return target, int(value)
+
+
+def _param_key(p):
+    if isinstance(p, np.ndarray):
+        return hashlib.sha256(np.round(p, 10).tobytes()).hexdigest()
+    if isinstance(p, complex):
+        return round(p.real, 10), round(p.imag, 10)
+    if isinstance(p, (int, float, np.number)):
+        return round(float(p), 10)
+    # parameters and parameter expressions
+    return str(p)
+
+
 # Source - https://stackoverflow.com/questions/12988351/split-a-dictionary-in-half
 # Posted by Blckknght
 # Retrieved 2025-11-06, License - CC BY-SA 3.0
@@ -114,6 +321,8 @@ def is_t_gate(instruction) -> bool:
 
 def is_t_dg(instruction) -> bool:
     gate_theta = 0
+    if instruction.name == "tdg":
+        return True
     if instruction.params:
         gate_theta = instruction.params[0]
     if instruction.name == "p" and np.isclose(gate_theta, -np.pi / 4):
@@ -1,10 +1,24 @@
-from qiskit import transpile
-from qiskit_aer import AerSimulator
-from qiskit_aer.noise import NoiseModel, depolarizing_error
-from qiskit_ibm_runtime.fake_provider import FakeGeneva
+from qiskit import QuantumCircuit, transpile
+import numpy as np
 
+from .backends import get_simulator
+from .transpile_cache import cached_transpile
 
-def get_result(qc, shots=100):
+# gates understood by Aer's stabilizer method
+CLIFFORD_GATES = {
+    "h", "s", "sdg", "x", "y", "z", "cx", "cy", "cz", "swap", "id", "sx", "sxdg"
+}
+T_GATES = {"t", "tdg"}
+NON_UNITARY = {"measure", "barrier", "reset", "delay"}
+# phase gates: P(k * pi/4) as named gates, for k in 0..7
+PHASES = [[], ["t"], ["s"], ["s", "t"], ["z"], ["z", "t"], ["sdg"], ["tdg"]]
+PHASE_GATES = {"p", "u1", "rz"}
+
+# above this many T gates, the extended stabilizer is slower than a statevector
+T_THRESHOLD = 24
+
+
+def get_result(qc, shots=100, **options):
     """
     Simulate a quantum circuit and return its measurement outcomes.
 
@@ -23,33 +37,208 @@ def get_result(qc, shots=100):
     Notes:
         The circuit is transpiled for the AerSimulator backend before execution.
         Adjust 'shots' or backend parameters as needed for higher precision.
+        Other keyword arguments are Aer options (see `get_simulator`).
     """
-    simulator = AerSimulator()
+    simulator = get_simulator("aer", **options)
     compiled = transpile(qc, simulator)
     return simulator.run(compiled, shots=shots).result().get_counts()
 
 
-def get_result_geneva(qc, shots=1024):
-    device_backend = FakeGeneva()
-    sim_geneva = AerSimulator.from_backend(device_backend)
-    tcirc = transpile(qc, sim_geneva)
+def get_geneva_simulator(**options):
+    """
+    Returns the AerSimulator with the noise model and coupling map of
+    FakeGeneva, shared by the whole process (see `get_simulator`).
+    """
+    return get_simulator("geneva", **options)
+
+
+def get_result_geneva(qc, shots=1024, cache=False, **options):
+    """
+    Runs a circuit on the FakeGeneva simulator. With `cache`, its
+    transpilation goes through the transpile cache (see `cached_transpile`):
+    worth it for circuits that are run again, not for encrypted circuits,
+    which differ with every pad.
+    """
+    sim_geneva = get_geneva_simulator(**options)
+    tcirc = cached_transpile(qc, sim_geneva) if cache else transpile(qc, sim_geneva)
     result_noise = sim_geneva.run(tcirc, shots=shots).result()
     counts_noise = result_noise.get_counts(0)
     return counts_noise
 
 
-def get_result_with_noise(qc):
-    # https://quantum.cloud.ibm.com/docs/en/guides/build-noise-models
-    error = depolarizing_error(1e-3, 1)  # (errreur qubit,nombre de qubit impacté)
-    noise_model = NoiseModel()
-    noise_model.add_all_qubit_quantum_error(
-        error,
-        [
-            "x",
-            "h",
-            "z",
-        ],
-    )
-    simulator = AerSimulator(noise_model=noise_model)
+def get_results_geneva(circuits, shots=1024, cache=False, **options):
+    """
+    Batched `get_result_geneva`: transpiles all circuits at once and runs
+    them as a single multi-experiment job.
+
+    Returns:
+        list[dict]: The counts of each circuit, in order.
+    """
+    sim_geneva = get_geneva_simulator(**options)
+    if cache:
+        tcircs = [cached_transpile(qc, sim_geneva) for qc in circuits]
+    else:
+        tcircs = transpile(list(circuits), sim_geneva)
+    result_noise = sim_geneva.run(tcircs, shots=shots).result()
+    return [result_noise.get_counts(i) for i in range(len(tcircs))]
+
+
+def get_result_with_noise(qc, shots=100, **options):
+    simulator = get_simulator("depolarizing", **options)
     compiled = transpile(qc, simulator)
-    return simulator.run(compiled, shots=100).result().get_counts()
+    return simulator.run(compiled, shots=shots).result().get_counts()
+
+
+def get_result_exact(qc, backend="aer", **options):
+    """
+    Exact outcome probabilities of the measured bits of a circuit,
+    without sampling.
+
+    The final measurements are replaced by a `save_probabilities` on the
+    measured qubits. With backend "aer" the state is a statevector; with a
+    noisy backend ("geneva", "depolarizing", ...) the circuit is transpiled
+    for it and simulated as a density matrix, so the noise is included.
+
+    Args:
+        qc (QuantumCircuit): Circuit whose measurements are all at the end.
+        backend (str): Registered backend (see `get_simulator`).
+
+    Returns:
+        np.ndarray: Probability of each outcome, indexed by the integer
+        value of the measured clbits (the lowest clbit is the least
+        significant bit, as in the bitstrings of `get_counts`).
+
+    Example:
+        >>> probs = get_result_exact(corrected_circuit)
+        >>> int(np.argmax(probs))
+        3
+    """
+    measured = {}
+    unitary = qc.copy_empty_like()
+    for instruction in qc.data:
+        if instruction.name == "measure":
+            measured[qc.find_bit(instruction.clbits[0]).index] = instruction.qubits[0]
+        elif measured and instruction.name != "barrier":
+            raise ValueError("get_result_exact needs all measurements at the end")
+        else:
+            unitary._append(instruction)
+    if not measured:
+        raise ValueError("the circuit has no measurement")
+    if backend == "aer":
+        simulator = get_simulator("aer", method="statevector", **options)
+    else:
+        simulator = get_simulator(backend, method="density_matrix", **options)
+    compiled = transpile(unitary, simulator)
+    # the layout moves the virtual qubits onto physical ones
+    layout = (
+        compiled.layout.final_index_layout()
+        if compiled.layout is not None
+        else list(range(qc.num_qubits))
+    )
+    # the first measured clbit is the least significant bit of the index
+    compiled.save_probabilities(
+        [layout[qc.find_bit(measured[c]).index] for c in sorted(measured)]
+    )
+    result = simulator.run(compiled, shots=1).result()
+    return np.asarray(result.data(0)["probabilities"])
+
+
+def to_clifford_t(qc: QuantumCircuit) -> QuantumCircuit | None:
+    """
+    Rewrites a circuit with named Clifford+T gates only: custom gates are
+    expanded, phase gates P/U1/RZ of angle k*pi/4 become z, s, sdg, t, tdg
+    (RZ up to a global phase), and cy becomes sdg, cx, s.
+
+    Returns:
+        QuantumCircuit | None: The rewritten circuit, or None if it contains
+        a gate outside of Clifford+T.
+    """
+    out = QuantumCircuit(*qc.qregs, *qc.cregs)
+    if not _append_clifford_t(qc, out, list(out.qubits), list(out.clbits)):
+        return None
+    return out
+
+
+def _append_clifford_t(qc, out, qubits, clbits) -> bool:
+    for instruction in qc.data:
+        op = instruction.operation
+        q = [qubits[qc.find_bit(b).index] for b in instruction.qubits]
+        c = [clbits[qc.find_bit(b).index] for b in instruction.clbits]
+        if op.name == "cy":
+            # not a gate of the extended stabilizer: sdg, cx, s on the target
+            out.sdg(q[1])
+            out.cx(q[0], q[1])
+            out.s(q[1])
+        elif op.name in CLIFFORD_GATES or op.name in T_GATES or op.name in NON_UNITARY:
+            out.append(op, q, c)
+        elif op.name in PHASE_GATES:
+            k = float(op.params[0]) / (np.pi / 4)
+            if not np.isclose(k, round(k)):
+                return False
+            for name in PHASES[round(k) % 8]:
+                getattr(out, name)(q[0])
+        elif op.definition is not None and op.definition is not qc:
+            if not _append_clifford_t(op.definition, out, q, c):
+                return False
+        else:
+            return False
+    return True
+
+
+def choose_method(qc: QuantumCircuit, t_threshold: int = T_THRESHOLD):
+    """
+    Picks the cheapest Aer method for a circuit. Note that the extended
+    stabilizer samples from an approximation of the state (see Aer's
+    `extended_stabilizer_approximation_error`).
+
+    Returns:
+        tuple[str, int, QuantumCircuit]: The method ("stabilizer",
+        "extended_stabilizer" or "statevector"), the T-count (-1 if the
+        circuit is not Clifford+T) and the circuit to run.
+    """
+    clifford_t = to_clifford_t(qc)
+    if clifford_t is None:
+        return "statevector", -1, qc
+    ops = clifford_t.count_ops()
+    t_count = sum(ops.get(name, 0) for name in T_GATES)
+    if t_count == 0:
+        return "stabilizer", 0, clifford_t
+    if t_count <= t_threshold:
+        return "extended_stabilizer", t_count, clifford_t
+    return "statevector", t_count, qc
+
+
+def get_result_auto(qc, shots=1024, t_threshold=T_THRESHOLD, **options):
+    """
+    Noiseless simulation with the method picked by `choose_method`.
+    Clifford circuits run on the stabilizer method and low T-count
+    circuits on the extended stabilizer, which both scale far past
+    the statevector limit in number of qubits.
+    Other keyword arguments are Aer options (see `get_simulator`).
+
+    Returns:
+        tuple[dict, dict]: The counts, and a report with the chosen
+        "method", the "t_count" and the "num_qubits" of the circuit.
+
+    Example:
+        >>> counts, report = get_result_auto(corrected_circuit)
+        >>> report
+        {'method': 'extended_stabilizer', 't_count': 9, 'num_qubits': 5}
+    """
+    method, t_count, circuit = choose_method(qc, t_threshold)
+    if method == "extended_stabilizer":
+        # the default sampler restarts a Markov chain for every shot,
+        # "metropolis" draws all the shots from a single chain
+        simulator = get_simulator(
+            "aer",
+            method=method,
+            extended_stabilizer_sampling_method="metropolis",
+            **options,
+        )
+    else:
+        simulator = get_simulator("aer", method=method, **options)
+    if method == "statevector":
+        circuit = transpile(circuit, simulator)
+    counts = simulator.run(circuit, shots=shots).result().get_counts()
+    report = {"method": method, "t_count": t_count, "num_qubits": qc.num_qubits}
+    return counts, report
@@ -0,0 +1,117 @@
+from contextlib import nullcontext
+import threading
+import json
+import time
+import os
+
+# the active tracer, None when tracing is disabled
+_tracer = None
+# shared no-op span, so that a disabled span allocates nothing
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Collects timing spans and counters.
+    Spans are exported as Chrome trace "complete" events and counters as
+    "counter" events (open the JSON in chrome://tracing or Perfetto).
+    """
+
+    def __init__(self):
+        self.events = []
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._start) * 1e6
+
+    def span(self, name: str, **args):
+        return _Span(self, name, args)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+        self.events.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": self._now_us(),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {name: self.counters[name]},
+            }
+        )
+
+    def to_chrome_trace(self) -> dict:
+        return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filename: str) -> str:
+        with open(filename, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        print(f"Trace saved at {filename}")
+        return filename
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer._now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.events.append(
+            {
+                "name": self.name,
+                "ph": "X",
+                "ts": self.start,
+                "dur": self.tracer._now_us() - self.start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": self.args,
+            }
+        )
+
+
+def enable_tracing() -> Tracer:
+    """
+    Starts collecting spans and counters in a new tracer, and returns it.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing() -> Tracer | None:
+    """
+    Stops collecting. Returns the tracer that was active, if any.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def span(name: str, **args):
+    """
+    Context manager timing a block when tracing is enabled, a shared
+    no-op otherwise.
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, **args)
+
+
+def count(name: str, n: int = 1) -> None:
+    """
+    Adds `n` to a counter when tracing is enabled.
+    """
+    if _tracer is not None:
+        _tracer.count(name, n)
@@ -0,0 +1,263 @@
+from collections import OrderedDict
+from qiskit import QuantumCircuit
+import threading
+import hashlib
+import json
+import os
+import io
+
+from .quantum_tools import circuit_digest
+
+# maximum size of the QPY files of the disk cache
+MAX_BYTES = 256 * 2**20
+# number of circuits kept in memory
+MEMORY_SIZE = 64
+
+
+def default_directory() -> str | None:
+    """
+    Directory of the disk cache: $QOTP_CACHE_DIR. The cache is kept in
+    memory only if it is unset or empty.
+    """
+    return os.environ.get("QOTP_CACHE_DIR") or None
+
+
+# versions of the packages that transpiled circuits depend on, read once
+_versions = None
+
+
+def _package_versions() -> str:
+    global _versions
+    if _versions is None:
+        from importlib import metadata
+
+        versions = []
+        for package in ("qiskit", "qiskit-aer", "qiskit-ibm-runtime"):
+            try:
+                versions.append(f"{package}={metadata.version(package)}")
+            except metadata.PackageNotFoundError:
+                versions.append(f"{package}=none")
+        _versions = ",".join(versions)
+    return _versions
+
+
+def target_fingerprint(backend) -> str | None:
+    """
+    Hash of the transpilation target of a backend: its instructions, the
+    qubits they act on and their calibrated durations and errors. None if
+    the backend has no target.
+    """
+    target = getattr(backend, "target", None)
+    if target is None:
+        return None
+    items = [target.num_qubits, target.dt]
+    for name in sorted(target.operation_names):
+        for qargs, props in sorted(target[name].items(), key=lambda kv: kv[0] or ()):
+            if props is not None:
+                props = (props.duration, props.error)
+            items.append((name, qargs, props))
+    return hashlib.sha256(repr(items).encode()).hexdigest()
+
+
+class TranspileCache:
+    """
+    Content-addressed cache of transpiled circuits.
+
+    Entries are keyed by the structural hash of the input circuit (see
+    `circuit_digest`), the kind of transpilation, its options and the
+    versions of qiskit, qiskit-aer and qiskit-ibm-runtime. Recently used
+    circuits stay in memory; with a `directory`, all of them are also stored
+    there as QPY files, shared by every process and run, and the least
+    recently used files are removed past `max_bytes`.
+
+    Circuits are copied in and out, so callers may modify what they get.
+
+    Args:
+        directory (str): Directory of the QPY files, memory only if None.
+        max_bytes (int): Size limit of the QPY files.
+        memory_size (int): Number of circuits kept in memory.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_bytes: int = MAX_BYTES,
+        memory_size: int = MEMORY_SIZE,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_size = memory_size
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, qc: QuantumCircuit, kind: str, **options) -> str:
+        """
+        Key of the transpilation `kind` of `qc` with the given options.
+        Options must have a stable repr (names, numbers, lists of them).
+        """
+        options = json.dumps(options, sort_keys=True, default=repr)
+        material = f"{kind}|{options}|{_package_versions()}|{circuit_digest(qc)}"
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key: str) -> QuantumCircuit | None:
+        with self._lock:
+            qc = self._memory.get(key)
+            if qc is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return qc.copy()
+        qc = self._load(key)
+        if qc is None:
+            self.misses += 1
+            return None
+        self.hits["disk"] += 1
+        self._remember(key, qc)
+        return qc.copy()
+
+    def put(self, key: str, qc: QuantumCircuit) -> None:
+        qc = qc.copy()
+        self._remember(key, qc)
+        self._store(key, qc)
+
+    def get_or_build(self, key: str, build) -> QuantumCircuit:
+        """
+        Returns the cached circuit of `key`, or builds it with `build()`
+        and caches it.
+        """
+        qc = self.get(key)
+        if qc is None:
+            qc = build()
+            self.put(key, qc)
+        return qc
+
+    def clear(self) -> None:
+        """
+        Empties the memory and the disk cache.
+        """
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._files():
+            _remove(path)
+
+    def _remember(self, key: str, qc: QuantumCircuit) -> None:
+        with self._lock:
+            self._memory[key] = qc
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.qpy")
+
+    def _load(self, key: str) -> QuantumCircuit | None:
+        if self.directory is None:
+            return None
+        from qiskit import qpy
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                qc = qpy.load(f)[0]
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or unreadable file: drop it
+            _remove(path)
+            return None
+        # the modification time orders the files for the LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return qc
+
+    def _store(self, key: str, qc: QuantumCircuit) -> None:
+        if self.directory is None:
+            return
+        from qiskit import qpy
+
+        buffer = io.BytesIO()
+        qpy.dump(qc, buffer)
+        path = self._path(key)
+        # write then rename, so that other processes never read a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, path)
+        self._evict()
+
+    def _files(self) -> list[tuple[str, float, int]]:
+        if self.directory is None:
+            return []
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".qpy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+    def _evict(self) -> None:
+        files = self._files()
+        total = sum(size for _, _, size in files)
+        for path, _, size in sorted(files, key=lambda f: f[1]):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# the cache of this process, built on first use
+_cache = None
+
+
+def get_transpile_cache() -> TranspileCache | None:
+    """
+    Returns the cache used by `to_standard` and `cached_transpile`, by
+    default in memory, and on disk in `default_directory()` if it is set.
+    None if disabled.
+    """
+    global _cache
+    if _cache is None:
+        _cache = TranspileCache(default_directory())
+    return _cache or None
+
+
+def set_transpile_cache(cache: TranspileCache | None) -> None:
+    """
+    Replaces the transpile cache of this process, or disables it (None).
+    """
+    global _cache
+    _cache = cache if cache is not None else False
+
+
+def cached_transpile(qc: QuantumCircuit, backend, **options) -> QuantumCircuit:
+    """
+    `transpile(qc, backend, **options)` through the transpile cache, keyed
+    by the backend name, its target (see `target_fingerprint`) and the
+    options. A transpilation without a fixed `seed_transpiler` is cached
+    too, so later calls get the same layout.
+    """
+    from qiskit import transpile
+
+    cache = get_transpile_cache()
+    if cache is None:
+        return transpile(qc, backend, **options)
+    name = getattr(backend, "name", None) or repr(backend)
+    key = cache.key(
+        qc, "transpile", backend=name, target=target_fingerprint(backend), **options
+    )
+    return cache.get_or_build(key, lambda: transpile(qc, backend, **options))